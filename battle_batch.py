@@ -0,0 +1,116 @@
+import numpy as np
+
+# Same cap used by risk.Battle, no side can throw more than three dices.
+MAX_TROOPS = 3
+
+
+class BatchBattleResult:
+    """
+    The results of a batch of battles, one position per battle in every array.
+    Attribute names follow the ones of risk.Battle.
+    """
+
+    def __init__(self, attacker_troops_no, defender_troops_no, casualties_attacker, casualties_defender,
+                 defender_lost_country):
+        self.attacker_troops_no = attacker_troops_no
+        self.defender_troops_no = defender_troops_no
+        self.casualties_attacker = casualties_attacker
+        self.casualties_defender = casualties_defender
+        self.defender_lost_country = defender_lost_country
+
+    def __len__(self):
+        return len(self.casualties_attacker)
+
+    def __str__(self):
+        return (f'{len(self)} battles; attackers lost {int(self.casualties_attacker.sum())}'
+                f', defenders lost {int(self.casualties_defender.sum())}'
+                f', {int(self.defender_lost_country.sum())} countries conquered')
+
+
+def troops_in_battle(attacker_troops, defender_armies):
+    """
+    Applies the same caps as risk.Battle to the number of troops on each side.
+
+    :param attacker_troops:
+    Array of integers with the troops the attacker sends to each battle.
+    :param defender_armies:
+    Array of integers with the armies in each defending country.
+    :return:
+    Tuple with two arrays, the number of dices thrown by the attacker and by the defender.
+    """
+    attacker_troops = np.asarray(attacker_troops)
+    defender_armies = np.asarray(defender_armies)
+
+    if attacker_troops.shape != defender_armies.shape:
+        raise Exception('Attacker and defender arrays must have the same shape.')
+    if (attacker_troops < 1).any():
+        raise Exception('Cannot attack with less than one army.')
+    if (defender_armies < 1).any():
+        raise Exception('Cannot attack a country without armies.')
+
+    return np.minimum(attacker_troops, MAX_TROOPS), np.minimum(defender_armies, MAX_TROOPS)
+
+
+def resolve_dices(dices_attacker, dices_defender, attacker_troops, defender_armies):
+    """
+    Decides a batch of battles from dices already thrown, following the rules of risk.Battle.calculate:
+    best dices are compared pair by pair and the defender wins on tied dices.
+
+    :param dices_attacker:
+    Array of shape (N, 3) with the attacker's dices. Only the first ones up to the number
+    of troops in battle are used, the rest are ignored.
+    :param dices_defender:
+    Array of shape (N, 3) with the defender's dices, same considerations as for the attacker.
+    :param attacker_troops:
+    Array with N integers, the troops sent by the attacker.
+    :param defender_armies:
+    Array with N integers, the armies in the defending country.
+    :return:
+    An object of the class BatchBattleResult.
+    """
+    defender_armies = np.asarray(defender_armies)
+    attacker_troops_no, defender_troops_no = troops_in_battle(attacker_troops, defender_armies)
+
+    columns = np.arange(MAX_TROOPS)
+
+    # Dices not thrown are set to zero so they end up last once sorted
+    dices_attacker = np.where(columns < attacker_troops_no[:, None], dices_attacker, 0)
+    dices_defender = np.where(columns < defender_troops_no[:, None], dices_defender, 0)
+
+    # Sort dices high to low
+    dices_attacker = -np.sort(-dices_attacker, axis=1)
+    dices_defender = -np.sort(-dices_defender, axis=1)
+
+    # Determine how many armies are fighting, determined by minimum amount of both sets of dices
+    fighting_armies = np.minimum(attacker_troops_no, defender_troops_no)
+    fighting = columns < fighting_armies[:, None]
+
+    # Defender wins on tied dices
+    casualties_defender = ((dices_attacker > dices_defender) & fighting).sum(axis=1)
+    casualties_attacker = fighting_armies - casualties_defender
+
+    return BatchBattleResult(attacker_troops_no, defender_troops_no, casualties_attacker, casualties_defender,
+                             defender_armies == casualties_defender)
+
+
+def resolve_battles(attacker_troops, defender_armies, rng=None):
+    """
+    Throws the dices and decides a batch of battles at once.
+
+    :param attacker_troops:
+    Array with N integers, the troops sent by the attacker to each battle (more than three are capped to three).
+    :param defender_armies:
+    Array with N integers, the armies in each defending country.
+    :param rng:
+    A numpy Generator. A new one is created if not given.
+    :return:
+    An object of the class BatchBattleResult.
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+
+    battles_no = len(attacker_troops)
+    dices_attacker = rng.integers(1, 7, size=(battles_no, MAX_TROOPS), dtype=np.int8)
+    dices_defender = rng.integers(1, 7, size=(battles_no, MAX_TROOPS), dtype=np.int8)
+
+    return resolve_dices(dices_attacker, dices_defender, attacker_troops, defender_armies)
@@ -0,0 +1,82 @@
+"""
+Compares deciding battles one by one through risk.Battle with the batch resolver.
+
+Run from the repository's root folder:
+
+    python -m benchmarks.battles --battles 1000000
+"""
+import argparse
+import time
+
+import numpy as np
+
+import risk
+import battle_batch
+
+
+def random_battles(battles_no, seed):
+    """
+    Creates a set of battles with random troop numbers, as attacker troops and defender armies.
+    """
+    rng = np.random.default_rng(seed)
+    attacker_troops = rng.integers(1, 4, size=battles_no)
+    defender_armies = rng.integers(1, 6, size=battles_no)
+    return attacker_troops, defender_armies
+
+
+def run_per_object(attacker_troops, defender_armies):
+    """
+    Decides every battle creating a risk.Battle, as the game does.
+    """
+    attacker = risk.Country('Attacker', 1)
+    defender = risk.Country('Defender', 2)
+    attacker.player = risk.Player('Player 1', 'Red')
+    defending_player = risk.Player('Player 2', 'Blue')
+
+    conquered = 0
+    for troops, armies in zip(attacker_troops.tolist(), defender_armies.tolist()):
+        attacker.armies = troops + 1
+        defender.armies = armies
+        # A conquest changes the owner, so it's set again every time
+        defender.player = defending_player
+        b = risk.Battle(attacker, defender, troops)
+        b.roll_dices_attacker()
+        b.roll_dices_defender()
+        b.calculate()
+        if b.defender_lost_country:
+            conquered += 1
+    return conquered
+
+
+def run_batch(attacker_troops, defender_armies, seed):
+    result = battle_batch.resolve_battles(attacker_troops, defender_armies, np.random.default_rng(seed))
+    return int(result.defender_lost_country.sum())
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark of risk.Battle against battle_batch.')
+    parser.add_argument('--battles', type=int, default=200000, help='Number of battles to decide.')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    attacker_troops, defender_armies = random_battles(args.battles, args.seed)
+
+    conquered_object, seconds_object = timed(run_per_object, attacker_troops, defender_armies)
+    conquered_batch, seconds_batch = timed(run_batch, attacker_troops, defender_armies, args.seed)
+
+    print(f'Battles: {args.battles}')
+    print(f'risk.Battle:  {seconds_object:.3f}s ({args.battles / seconds_object:,.0f} battles/s),'
+          f' {conquered_object} conquests')
+    print(f'battle_batch: {seconds_batch:.3f}s ({args.battles / seconds_batch:,.0f} battles/s),'
+          f' {conquered_batch} conquests')
+    print(f'Speedup: {seconds_object / seconds_batch:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""
+Compares the memory needed by many games kept as risk.Game objects and as board.Board copies.
+
+Run from the repository's root folder:
+
+    python -m benchmarks.board_memory --games 1000
+"""
+import argparse
+import time
+import tracemalloc
+
+import board
+import engine
+
+
+def measure(function, *args):
+    """
+    Runs a function and returns its result, the memory it allocated (still in use) and the seconds it took.
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function(*args)
+    seconds = time.perf_counter() - start
+    memory, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, memory, seconds
+
+
+def create_games(games_no, players_no):
+    return [engine.new_game(players_no, seed) for seed in range(games_no)]
+
+
+def create_boards(games_no, reference):
+    return [reference.copy() for x in range(games_no)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Memory of risk.Game objects against board.Board copies.')
+    parser.add_argument('--games', type=int, default=1000, help='Number of games to keep in memory.')
+    parser.add_argument('--players', type=int, default=3)
+    args = parser.parse_args()
+
+    games, games_memory, games_seconds = measure(create_games, args.games, args.players)
+    reference = board.Board.from_game(games[0])
+    boards, boards_memory, boards_seconds = measure(create_boards, args.games, reference)
+
+    print(f'{args.games} games of {len(reference)} countries')
+    print(f'risk.Game:   {games_memory / args.games:,.0f} bytes per game, {games_seconds:.3f}s')
+    print(f'board.Board: {boards_memory / args.games:,.0f} bytes per game, {boards_seconds:.3f}s')
+    print(f'Memory ratio: {games_memory / boards_memory:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
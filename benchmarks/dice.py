@@ -0,0 +1,44 @@
+"""
+Compares the cost of throwing dices with random.randint, dice.RandomDice and dice.BufferedDice.
+
+Run from the repository's root folder:
+
+    python -m benchmarks.dice --throws 1000000
+"""
+import argparse
+import random
+import time
+
+import dice
+
+
+def throw_randint(throws, n):
+    for x in range(throws):
+        [random.randint(1, 6) for y in range(n)]
+
+
+def throw_source(source, throws, n):
+    roll = source.roll
+    for x in range(throws):
+        roll(n)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cost of throwing dices.')
+    parser.add_argument('--throws', type=int, default=300000, help='Number of throws, of three dices each.')
+    args = parser.parse_args()
+
+    candidates = [
+        ('random.randint', lambda: throw_randint(args.throws, 3)),
+        ('RandomDice', lambda: throw_source(dice.RandomDice(1), args.throws, 3)),
+        ('BufferedDice', lambda: throw_source(dice.BufferedDice(1), args.throws, 3)),
+    ]
+    for name, function in candidates:
+        start = time.perf_counter()
+        function()
+        seconds = time.perf_counter() - start
+        print(f'{name:15} {args.throws / seconds:12,.0f} throws/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Checks that the Zobrist hash a game keeps up to date (risk.Game.enable_hashing()) is always the one
+computed from scratch, while scripted bots play and after rolling every game back, and measures how
+much slower games play with hashing enabled.
+
+Run from the repository's root folder:
+
+    python -m benchmarks.hashing --games 20 --players 3
+"""
+import argparse
+import time
+
+import bots
+import engine
+
+
+def check_game(players_no, seed, max_turns):
+    """
+    Plays a game of scripted bots with hashing, checking after every action that the incremental
+    hash is the one computed from scratch, and again after rolling everything back.
+
+    :return:
+    The number of actions played and the number of different positions seen.
+    """
+    game = engine.new_game(players_no, seed)
+    game.enable_hashing()
+    initial_hash = game.board_hash
+    game.start_journal()
+
+    e = engine.Engine(game, max_turns)
+    players_bots = {p: bots.ScriptedBot(seed + n) for n, p in enumerate(game.players)}
+    actions_no = 0
+    positions = set()
+    while not e.finished:
+        e.apply(players_bots[e.current_player].choose_action(e))
+        actions_no += 1
+        if game.board_hash != game.compute_board_hash():
+            raise Exception(f'Incremental hash differs from the computed one after action {actions_no}.')
+        positions.add(e.position_hash())
+
+    game.rollback()
+    if game.board_hash != initial_hash or game.board_hash != game.compute_board_hash():
+        raise Exception('Rolling back did not give back the initial hash.')
+    return actions_no, len(positions)
+
+
+def play_games(games_no, players_no, seed, max_turns, hashing):
+    actions_no = 0
+    for x in range(games_no):
+        game = engine.new_game(players_no, seed + x)
+        if hashing:
+            game.enable_hashing()
+        e = engine.Engine(game, max_turns)
+        players_bots = {p: bots.ScriptedBot(seed + x + n) for n, p in enumerate(game.players)}
+        while not e.finished:
+            e.apply(players_bots[e.current_player].choose_action(e))
+            actions_no += 1
+    return actions_no
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Checks incremental Zobrist hashes and measures what they cost.')
+    parser.add_argument('--games', type=int, default=20)
+    parser.add_argument('--players', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--max-turns', type=int, default=100)
+    args = parser.parse_args()
+
+    actions_no = 0
+    positions_no = 0
+    for x in range(args.games):
+        game_actions, game_positions = check_game(args.players, args.seed + x, args.max_turns)
+        actions_no += game_actions
+        positions_no += game_positions
+    print(f'{args.games} games, {actions_no} actions and {positions_no} different positions: every incremental'
+          f' hash matched, rollbacks included')
+
+    for hashing in (False, True):
+        start = time.perf_counter()
+        played = play_games(args.games, args.players, args.seed, args.max_turns, hashing)
+        seconds = time.perf_counter() - start
+        print(f'{"With" if hashing else "Without"} hashing: {played / seconds:,.0f} actions/s')
+
+
+if __name__ == '__main__':
+    main()
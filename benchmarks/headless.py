@@ -0,0 +1,108 @@
+"""
+Plays main.play(), the interactive game, without a terminal: answers come from a random policy, or from
+a transcript saved with `python main.py --record`, and nothing is shown. Measures how many games per
+second the interactive path can go through, and with --transcript checks that replaying gives the same
+output every time.
+
+Run from the repository's root folder:
+
+    python -m benchmarks.headless --games 1000
+    python -m benchmarks.headless --transcript game.json --games 100
+"""
+import argparse
+import json
+import random
+import time
+
+import helpers
+import main as game_main
+
+
+def headless_policy(rng, max_answers):
+    """
+    Random answers, except that every player is human (bots think for a second per decision) and the
+    game goes on until max_answers answers were given.
+    """
+    random_answer = helpers.random_policy(rng)
+
+    def policy(prompt, choices):
+        if 'played by the computer' in prompt:
+            return 'n'
+        if 'keep playing' in prompt:
+            return 'y' if backend.answers_no < max_answers else 'n'
+        return random_answer(prompt, choices)
+
+    backend = helpers.ScriptedIO(policy=policy)
+    return backend
+
+
+def play_random_games(games_no, seed, max_answers):
+    answers_no = 0
+    previous = helpers.set_io(None)
+    try:
+        for x in range(games_no):
+            backend = headless_policy(random.Random(seed + x), max_answers)
+            helpers.set_io(backend)
+            game_main.seed = seed + x
+            game_main.play()
+            answers_no += backend.answers_no
+    finally:
+        helpers.set_io(previous)
+    return answers_no
+
+
+def replay_transcript(transcript, games_no):
+    """
+    Replays a transcript games_no times.
+
+    :return:
+    The number of answers given, and whether every replay showed exactly the same text.
+    """
+    game_main.seed = transcript['seed']
+    game_main.multi_hop_relocation = transcript['multi_hop_relocation']
+    game_main.computer_iterations = transcript.get('computer_iterations', game_main.computer_iterations)
+    first_output = None
+    same_output = True
+    previous = helpers.set_io(None)
+    try:
+        for x in range(games_no):
+            output = []
+            helpers.set_io(helpers.ScriptedIO(transcript['answers'], output=output))
+            game_main.play()
+            if first_output is None:
+                first_output = output
+            elif output != first_output:
+                same_output = False
+    finally:
+        helpers.set_io(previous)
+    return len(transcript['answers']) * games_no, same_output
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Plays the interactive game headless, as fast as it goes.')
+    parser.add_argument('--games', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--max-answers', type=int, default=200,
+                        help='Answers after which random games stop at the next "keep playing" question.')
+    parser.add_argument('--transcript', default=None, help='JSON file saved with main.py --record to replay.')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.transcript:
+        with open(args.transcript) as transcript_file:
+            answers_no, same_output = replay_transcript(json.load(transcript_file), args.games)
+    else:
+        answers_no = play_random_games(args.games, args.seed, args.max_answers)
+        same_output = None
+    seconds = time.perf_counter() - start
+
+    print(f'Played {args.games} games in {seconds:.2f}s: {args.games / seconds:,.0f} games/s, '
+          f'{answers_no / seconds:,.0f} answers/s')
+    if same_output is not None:
+        print('Every replay showed the same output.' if same_output else 'Replays showed different outputs!')
+        if not same_output:
+            raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Measures how fast the engine generates legal moves (engine.attack_moves, relocation_moves and
+deployment_moves) on synthetic maps made by mapgen, with 1 to 6 armies in each country at random so
+most countries can attack and relocate, like in the middle of a game. Reports moves per second, and
+actions per second once expanded with Moves.actions() like Engine.legal_actions() does.
+
+Multi-hop relocations grow with the square of the countries a player has connected, so they are only
+measured on maps up to --multi-hop-limit countries.
+
+Run from the repository's root folder:
+
+    python -m benchmarks.moves --sizes 1000 10000 100000 --players 2 6
+"""
+import argparse
+import os
+import random
+import tempfile
+
+import engine
+import mapbundle
+import mapgen
+from benchmarks.scaling import best_of
+
+
+def generators(game, player, multi_hop):
+    """
+    The move generators for a player, by name, as functions without arguments.
+    """
+    sources = game.get_countries(player, True)
+    measured = {
+        'attack_moves': lambda: engine.attack_moves(game, player),
+        'relocation_moves': lambda: engine.relocation_moves(game, player, sources),
+        'relocation_moves (multi-hop)': lambda: engine.relocation_moves(game, player, sources, True),
+        'deployment_moves': lambda: engine.deployment_moves(game, player, 3),
+    }
+    if not multi_hop:
+        del measured['relocation_moves (multi-hop)']
+    return measured
+
+
+def measure_map(countries_no, players_options, args, maps_directory):
+    sources = mapgen.write_map(os.path.join(maps_directory, str(countries_no)), countries_no, seed=args.seed)
+    bundle = mapbundle.compiled_map(os.path.join(maps_directory, str(countries_no), 'map.bundle'), sources)
+
+    for players_no in players_options:
+        game = engine.new_game(players_no, args.seed, bundle=bundle)
+        rng = random.Random(args.seed)
+        for c in game.countries:
+            c.armies = rng.randint(1, 6)
+        player = max(game.players, key=lambda p: len(p.countries))
+
+        for name, generate in generators(game, player, countries_no <= args.multi_hop_limit).items():
+            moves = generate()
+            seconds = best_of(args.repeat, generate)
+            expand_seconds = best_of(args.repeat, moves.actions)
+            actions_no = moves.actions_no()
+            print(f'{countries_no:>8} {players_no:>8}  {name:30} {len(moves):>9,} {len(moves) / seconds:>14,.0f}'
+                  f' {actions_no:>10,} {actions_no / (seconds + expand_seconds):>14,.0f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Moves generated per second on maps of different sizes.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000], help='Numbers of countries.')
+    parser.add_argument('--players', type=int, nargs='+', default=[2, 6])
+    parser.add_argument('--repeat', type=int, default=5, help='Runs of each measure, the fastest one is kept.')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--multi-hop-limit', type=int, default=10000,
+                        help='Largest map, in countries, to measure multi-hop relocations on.')
+    args = parser.parse_args()
+
+    print(f'{"countries":>8} {"players":>8}  {"generator":30} {"moves":>9} {"moves/s":>14} {"actions":>10}'
+          f' {"actions/s":>14}')
+    with tempfile.TemporaryDirectory() as maps_directory:
+        for countries_no in args.sizes:
+            measure_map(countries_no, args.players, args, maps_directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,225 @@
+"""
+Benchmarks of the hot paths of the game, from single battles to a full scripted game, compared against
+a baseline so changes that make anything slower show up without profiling by hand.
+
+Timings are the fastest of a few runs, memory is the peak allocated by tracemalloc during one call.
+Save a baseline once, then compare against it; the comparison fails (exit status 1) if any benchmark
+got slower, or used more memory, than the threshold allows. Saving with --only updates just those
+benchmarks in the baseline and keeps the rest.
+
+Run from the repository's root folder:
+
+    python -m benchmarks.regression --save
+    python -m benchmarks.regression --threshold 0.2
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import timeit
+import tracemalloc
+
+import bots
+import engine
+import mapbundle
+import mapgen
+import risk
+
+DEFAULT_BASELINE_FILE = 'benchmarks/baseline.json'
+
+# Benchmarks by name, each one a function that sets up what is measured and returns a function without
+# arguments doing one call of it
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+def first_attack_countries(game):
+    for c in game.get_countries(game.players[0]):
+        for n in c.neighbours:
+            if n.player != c.player:
+                return c, n
+    raise Exception('The first player has no country to attack.')
+
+
+@benchmark('Battle.calculate')
+def setup_battle_calculate(bundle):
+    attacker = risk.Country('Attacker', 1)
+    defender = risk.Country('Defender', 2)
+    attacker.player = risk.Player('Player 1', 'red')
+    defender.player = risk.Player('Player 2', 'blue')
+
+    def run():
+        attacker.armies = 10
+        defender.armies = 5
+        battle = risk.Battle(attacker, defender, 3)
+        battle.dices_attacker = [6, 5, 4]
+        battle.dices_defender = [3, 2, 1]
+        battle.calculate()
+    return run
+
+
+@benchmark('Game.attack')
+def setup_game_attack(bundle):
+    game = engine.new_game(3, 1, bundle=bundle)
+    country_from, country_to = first_attack_countries(game)
+
+    def run():
+        country_from.armies = 10
+        country_to.armies = 5
+        game.attack(country_from, country_to, [6, 5, 4], [3, 2])
+    return run
+
+
+@benchmark('Game.get_countries')
+def setup_get_countries(bundle):
+    game = engine.new_game(3, 1, bundle=bundle)
+    player = game.players[0]
+
+    def run():
+        game.get_countries(player)
+        game.get_countries(player, True)
+    return run
+
+
+@benchmark('Game.check_if_winner')
+def setup_check_if_winner(bundle):
+    game = engine.new_game(3, 1, bundle=bundle)
+    return game.check_if_winner
+
+
+@benchmark('Country.__str__')
+def setup_country_str(bundle):
+    game = engine.new_game(3, 1, bundle=bundle)
+    country = max(game.countries, key=lambda c: len(c.neighbours))
+    return country.__str__
+
+
+@benchmark('scripted game')
+def setup_scripted_game(bundle):
+    def run():
+        game = engine.new_game(3, 1, bundle=bundle)
+        e = engine.Engine(game, max_turns=30)
+        e.play({p: bots.ScriptedBot(n) for n, p in enumerate(game.players)})
+    return run
+
+
+def measure(run, repeat):
+    """
+    :return:
+    A tuple with the seconds per call (fastest of repeat runs) and the peak memory of one call in bytes.
+    """
+    timer = timeit.Timer(run)
+    number, seconds = timer.autorange()
+    seconds = min([seconds] + timer.repeat(repeat - 1, number)) / number
+
+    tracemalloc.start()
+    run()
+    memory, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, peak
+
+
+def run_benchmarks(names, repeat, bundle):
+    results = {}
+    for name in names:
+        seconds, peak = measure(BENCHMARKS[name](bundle), repeat)
+        results[name] = {'seconds': seconds, 'memory_peak': peak}
+        print(f'{name:22} {seconds * 1e6:14,.2f} us {peak:14,} bytes')
+    return results
+
+
+def compare(baseline, results, threshold, memory_threshold):
+    """
+    Prints the changes from the baseline.
+
+    :return:
+    The list of benchmarks over a threshold, as (name, what, change) tuples.
+    """
+    failures = []
+    print(f'\n{"benchmark":22} {"baseline":>14} {"current":>14} {"change":>8}')
+    for name, current in results.items():
+        if name not in baseline:
+            print(f'{name:22} {"(new)":>14}')
+            continue
+        for what, limit, show in (('seconds', threshold, lambda x: f'{x * 1e6:,.2f} us'),
+                                  ('memory_peak', memory_threshold, lambda x: f'{x:,} B')):
+            before = baseline[name][what]
+            after = current[what]
+            change = (after - before) / before if before else 0.0
+            mark = ''
+            if change > limit:
+                failures.append((name, what, change))
+                mark = '  <-- over threshold'
+            print(f'{name if what == "seconds" else "":22} {show(before):>14} {show(after):>14} {change:+8.1%}{mark}')
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks compared against a saved baseline.')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE_FILE, help='JSON file with the baseline.')
+    parser.add_argument('--save', action='store_true', help='Saves the results as the new baseline.')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='Slowdown allowed, 0.25 is 25%% slower than the baseline.')
+    parser.add_argument('--memory-threshold', type=float, default=0.25, help='Memory peak increase allowed.')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--countries', type=int, default=None,
+                        help='Runs on a synthetic map of this size instead of the map in game_data/.')
+    parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS), default=list(BENCHMARKS))
+    args = parser.parse_args()
+
+    settings = {'countries': args.countries, 'python': platform.python_version()}
+
+    with tempfile.TemporaryDirectory() as maps_directory:
+        if args.countries:
+            sources = mapgen.write_map(maps_directory, args.countries, seed=1)
+            bundle = mapbundle.compiled_map(os.path.join(maps_directory, 'map.bundle'), sources)
+        else:
+            bundle = mapbundle.compiled_map()
+        results = run_benchmarks(args.only, args.repeat, bundle)
+
+    if args.save:
+        # Benchmarks that didn't run keep their baseline, so --only doesn't drop them from the comparison
+        saved = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as baseline_file:
+                baseline = json.load(baseline_file)
+            if baseline['settings'] == settings:
+                saved = baseline['results']
+        missing = [name for name in BENCHMARKS if name not in results and name not in saved]
+        if missing:
+            print(f'The baseline would have no results for {", ".join(missing)}, save it without --only.')
+            sys.exit(2)
+        saved.update(results)
+        with open(args.baseline, 'w') as baseline_file:
+            json.dump({'settings': settings, 'results': saved}, baseline_file, indent=2)
+        print(f'Baseline saved to {args.baseline}')
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f'There is no baseline in {args.baseline}, save one first with --save.')
+        sys.exit(2)
+    with open(args.baseline) as baseline_file:
+        baseline = json.load(baseline_file)
+    if baseline['settings'] != settings:
+        print(f'The baseline was taken with other settings ({baseline["settings"]}), save a new one.')
+        sys.exit(2)
+
+    failures = compare(baseline['results'], results, args.threshold, args.memory_threshold)
+    if failures:
+        print(f'\n{len(failures)} over threshold:')
+        for name, what, change in failures:
+            print(f' - {name}: {what} {change:+.1%}')
+        sys.exit(1)
+    print('\nNo regressions.')
+
+
+if __name__ == '__main__':
+    main()
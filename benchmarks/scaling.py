@@ -0,0 +1,165 @@
+"""
+Measures how risk.Game scales with the size of the map and the number of players, on synthetic maps
+made by mapgen. Results are printed and written to a JSON file, so runs can be compared.
+
+Run from the repository's root folder:
+
+    python -m benchmarks.scaling --sizes 100 1000 10000 100000 --players 2 6 --output scaling.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import tempfile
+import time
+
+import bots
+import engine
+import gamesetup
+import mapbundle
+import mapgen
+import risk
+
+
+def best_of(repeat, function, calls=1):
+    """
+    Runs a function a number of times and returns the seconds of the fastest run, divided by the
+    number of calls it does.
+    """
+    best = None
+    for x in range(repeat):
+        start = time.perf_counter()
+        function()
+        seconds = time.perf_counter() - start
+        if best is None or seconds < best:
+            best = seconds
+    return best / calls
+
+
+def load_map_from_file(sources):
+    game = risk.Game()
+    game.load_map_from_file(sources['countries_file'], sources['countries_connections_file'],
+                            sources['continents_file'])
+    return game
+
+
+def game_with_players(bundle, players_no, seed):
+    game = risk.Game(seed=seed)
+    game.load_map_bundle(bundle)
+    game.assign_players([(f'Player {x + 1}', gamesetup.colors[x]) for x in range(players_no)])
+    return game
+
+
+def call_get_countries(game, calls):
+    for x in range(calls):
+        for p in game.players:
+            game.get_countries(p)
+
+
+def call_check_if_winner(game, calls):
+    for x in range(calls):
+        game.check_if_winner()
+
+
+def scan_attack_candidates(game, calls):
+    # What finding the possible attacks costs without any index: every country and its neighbours, giving
+    # the same pairs as get_frontier(p, True)
+    for x in range(calls):
+        for p in game.players:
+            [(c, n) for c in game.countries if c.player is p and c.armies > 1
+             for n in c.neighbours if n.player is not p]
+
+
+def call_get_frontier(game, calls):
+    for x in range(calls):
+        for p in game.players:
+            game.get_frontier(p, True)
+
+
+def play_turns(game, turns, seed):
+    """
+    Plays turns with bots.ScriptedBot, returning the number of turns played (fewer if someone won).
+    """
+    e = engine.Engine(game, max_turns=turns)
+    e.play({p: bots.ScriptedBot(seed + n) for n, p in enumerate(game.players)})
+    return e.turn - 1 if e.winner is None else e.turn
+
+
+def measure_map(countries_no, players_options, args, maps_directory):
+    sources = mapgen.write_map(os.path.join(maps_directory, str(countries_no)), countries_no, seed=args.seed)
+    bundle = mapbundle.compiled_map(os.path.join(maps_directory, str(countries_no), 'map.bundle'), sources)
+    results = []
+
+    def add(benchmark, seconds, players_no=None):
+        results.append({'countries': countries_no, 'players': players_no, 'benchmark': benchmark,
+                        'seconds': seconds})
+        players_text = f'{players_no} players' if players_no else ''
+        print(f'{countries_no:>8} {players_text:>10}  {benchmark:32} {seconds * 1e6:14,.1f} us')
+
+    add('load_map_from_file', best_of(args.repeat, lambda: load_map_from_file(sources)))
+    add('load_map_bundle', best_of(args.repeat, lambda: risk.Game().load_map_bundle(bundle)))
+
+    for players_no in players_options:
+        games = [game_with_players(bundle, players_no, args.seed + x) for x in range(args.repeat)]
+        add('deal_initial_countries_equally',
+            best_of(args.repeat, lambda: games.pop().deal_initial_countries_equally()), players_no)
+        add('new_game', best_of(args.repeat, lambda: engine.new_game(players_no, args.seed, bundle=bundle)),
+            players_no)
+
+        # Armies spread like in the middle of a game, so most countries can attack
+        game = engine.new_game(players_no, args.seed, bundle=bundle)
+        rng = random.Random(args.seed)
+        for c in game.countries:
+            c.armies = rng.randint(1, 6)
+
+        # Scanning every country is slow on big maps, fewer calls are enough to measure it
+        scan_calls = max(1, min(args.calls, 100000 // countries_no))
+
+        add('get_countries (all players)',
+            best_of(args.repeat, lambda: call_get_countries(game, args.calls), args.calls), players_no)
+        add('check_if_winner', best_of(args.repeat, lambda: call_check_if_winner(game, args.calls), args.calls),
+            players_no)
+        add('attack candidates (scan)',
+            best_of(args.repeat, lambda: scan_attack_candidates(game, scan_calls), scan_calls), players_no)
+        add('attack candidates (get_frontier)',
+            best_of(args.repeat, lambda: call_get_frontier(game, args.calls), args.calls), players_no)
+
+        start = time.perf_counter()
+        turns = play_turns(game, args.turns, args.seed)
+        add('turn', (time.perf_counter() - start) / max(turns, 1), players_no)
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='How risk.Game scales with map size and players.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000], help='Numbers of countries.')
+    parser.add_argument('--players', type=int, nargs='+', default=[2, 3, 6])
+    parser.add_argument('--repeat', type=int, default=3, help='Runs of each measure, the fastest one is kept.')
+    parser.add_argument('--calls', type=int, default=100, help='Calls per run of the cheap methods.')
+    parser.add_argument('--turns', type=int, default=5, help='Turns played with scripted bots.')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--maps', default=None, help='Where to write the maps, by default a temporary folder.')
+    parser.add_argument('--output', default='scaling.json', help='JSON file with the results.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temporary_directory:
+        maps_directory = args.maps or temporary_directory
+        results = []
+        for countries_no in args.sizes:
+            results.extend(measure_map(countries_no, args.players, args, maps_directory))
+
+    with open(args.output, 'w') as output_file:
+        json.dump({
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'seed': args.seed,
+            'repeat': args.repeat,
+            'results': results,
+        }, output_file, indent=2)
+    print(f'Results written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
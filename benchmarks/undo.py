@@ -0,0 +1,96 @@
+"""
+Compares ways of trying an attack and going back: copying the whole game, snapshot/restore
+and the undo journal. First checks that rolling back leaves the game's battle history as it was,
+also when the history is full and every battle recorded pushes out an older one.
+
+Run from the repository's root folder:
+
+    python -m benchmarks.undo --tries 10000
+"""
+import argparse
+import copy
+import time
+
+import engine
+import history
+
+
+def first_attack(game):
+    e = engine.Engine(game)
+    for action in e.legal_actions():
+        if action.kind == engine.ATTACK:
+            return e, action
+    raise Exception('The game has no possible attack to try.')
+
+
+def try_with_deepcopy(game, tries):
+    for x in range(tries):
+        game_copy = copy.deepcopy(game)
+        e, action = first_attack(game_copy)
+        e.apply(action)
+
+
+def try_with_snapshot(game, tries):
+    for x in range(tries):
+        snapshot = game.snapshot()
+        e, action = first_attack(game)
+        e.apply(action)
+        game.restore(snapshot)
+
+
+def try_with_journal(game, tries):
+    game.start_journal()
+    for x in range(tries):
+        checkpoint = game.checkpoint()
+        e, action = first_attack(game)
+        e.apply(action)
+        game.rollback(checkpoint)
+    game.stop_journal()
+
+
+def check_history_rollback(seed, capacity=3, tries=10):
+    """
+    Tries attacks with the journal on a game whose history is full, and checks that the battles kept
+    and their stats are back to what they were after each rollback.
+    """
+    game = engine.new_game(3, seed)
+    game.battles = history.BattleHistory(capacity)
+    for c in game.countries:
+        c.armies = 20
+    for x in range(capacity):
+        e, action = first_attack(game)
+        e.apply(action)
+
+    before = list(game.battles)
+    battles_before = game.battles.stats.battles
+    game.start_journal()
+    for x in range(tries):
+        checkpoint = game.checkpoint()
+        for y in range(capacity + 2):
+            e, action = first_attack(game)
+            e.apply(action)
+        game.rollback(checkpoint)
+        if list(game.battles) != before or game.battles.stats.battles != battles_before:
+            raise Exception('Rolling back attacks changed the battle history.')
+    game.stop_journal()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cost of trying an attack and undoing it.')
+    parser.add_argument('--tries', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    check_history_rollback(args.seed)
+
+    for name, function in (('deepcopy', try_with_deepcopy), ('snapshot', try_with_snapshot),
+                           ('journal', try_with_journal)):
+        game = engine.new_game(3, args.seed)
+        start = time.perf_counter()
+        function(game, args.tries)
+        seconds = time.perf_counter() - start
+        print(f'{name:10} {seconds / args.tries * 1e6:8.1f} us per try')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,379 @@
+"""
+Compact board, with the state of every country in arrays instead of one risk.Country object each.
+
+Owners and armies are kept in contiguous integer arrays indexed by country position, and the
+neighbours in CSR form (all neighbours one after another in `indices`, the ones of country i going
+from indptr[i] to indptr[i + 1]). The map topology is shared between copies of a board, so a new
+game only needs two small arrays.
+
+BoardCountry and BoardContinent objects offer the same attributes as risk.Country and risk.Continent for
+code expecting those.
+"""
+
+import numpy as np
+
+import helpers
+
+# Owner of countries without a player
+NO_PLAYER = -1
+
+
+class BoardCountry:
+    """
+    A view of one country of a board, with the same attributes as risk.Country.
+    Reading or changing them reads or changes the board's arrays.
+    """
+    __slots__ = ('board', 'index')
+
+    def __init__(self, board, index):
+        self.board = board
+        self.index = index
+
+    def __eq__(self, other):
+        return isinstance(other, BoardCountry) and other.board is self.board and other.index == self.index
+
+    def __hash__(self):
+        return hash((id(self.board), self.index))
+
+    def __str__(self):
+        text = f'{self.name}'
+
+        if self.player != None:
+            text += f" ({self.player.name}, {self.armies})"
+        else:
+            text += f" ({self.armies})"
+
+        neighbours = self.neighbours
+        if len(neighbours) > 0:
+            text += ' - neighbours: '
+            for sorted_country in sorted(neighbours, key=lambda x: x.armies, reverse=True):
+                text += f'{sorted_country.name} ({sorted_country.armies}), '
+
+        return text
+
+    @property
+    def name(self):
+        return self.board.names[self.index]
+
+    @property
+    def id(self):
+        return int(self.board.country_ids[self.index])
+
+    @property
+    def continent(self):
+        return BoardContinent(self.board, int(self.board.continent[self.index]))
+
+    @property
+    def neighbours(self):
+        return [self.board.country(i) for i in self.board.neighbours(self.index)]
+
+    @property
+    def player(self):
+        owner = self.board.owner[self.index]
+        return None if owner == NO_PLAYER else self.board.players[owner]
+
+    @player.setter
+    def player(self, pl):
+        self.board.owner[self.index] = NO_PLAYER if pl is None else self.board.players.index(pl)
+
+    @property
+    def armies(self):
+        return int(self.board.armies[self.index])
+
+    @armies.setter
+    def armies(self, armies):
+        self.board.armies[self.index] = armies
+
+    def SetPlayer(self, pl):
+        self.player = pl
+
+
+class BoardContinent:
+    """
+    A view of one continent of a board, with the same attributes as risk.Continent.
+    """
+    __slots__ = ('board', 'index')
+
+    def __init__(self, board, index):
+        self.board = board
+        self.index = index
+
+    def __eq__(self, other):
+        return isinstance(other, BoardContinent) and other.board is self.board and other.index == self.index
+
+    def __hash__(self):
+        return hash((id(self.board), self.index))
+
+    def __str__(self):
+        return f"{self.name} ({len(self.countries)} countries)"
+
+    @property
+    def name(self):
+        return self.board.continent_names[self.index]
+
+    @property
+    def army_bonus(self):
+        return int(self.board.continent_bonus[self.index])
+
+    @property
+    def countries(self):
+        return [self.board.country(i) for i in np.flatnonzero(self.board.continent == self.index)]
+
+    def conquered_by_player(self, player):
+        owners = self.board.owner[self.board.continent == self.index]
+        return bool(np.all(owners == self.board.player_position(player)))
+
+
+class Board:
+    """
+    Countries, continents and neighbours of a map, plus the owner and armies of each country.
+    """
+
+    def __init__(self, country_ids, names, continent, continent_names, continent_bonus, indptr, indices):
+        """
+        Use from_files() or from_game() instead of creating the board directly.
+
+        :param country_ids:
+        Array with the ID of each country, as in the map files.
+        :param names:
+        List with the name of each country.
+        :param continent:
+        Array with the position in continent_names of each country's continent.
+        :param continent_names:
+        List with the names of continents.
+        :param continent_bonus:
+        Array with the armies each continent grants to its conqueror.
+        :param indptr:
+        CSR array, the neighbours of country i are indices[indptr[i]:indptr[i + 1]].
+        :param indices:
+        CSR array with the positions of the neighbours of each country, one after another.
+        """
+        # Map topology, shared between copies of the board
+        self.country_ids = country_ids
+        self.names = names
+        self.continent = continent
+        self.continent_names = continent_names
+        self.continent_bonus = continent_bonus
+        self.indptr = indptr
+        self.indices = indices
+
+        # For each neighbour in indices, the country it is neighbour of
+        self.edge_from = np.repeat(np.arange(len(country_ids), dtype=indices.dtype), np.diff(indptr))
+        self.position_by_id = {int(country_id): i for i, country_id in enumerate(country_ids)}
+
+        # Players, owners point to positions in this list
+        self.players = []
+
+        # State of the game
+        self.owner = np.full(len(country_ids), NO_PLAYER, dtype=np.int8)
+        self.armies = np.zeros(len(country_ids), dtype=np.int32)
+
+        # Minimum number of armies a player gets per turn, same as risk.Game
+        self.min_armies_per_turn = 3
+
+    def __len__(self):
+        return len(self.country_ids)
+
+    def __str__(self):
+        return f'Board with {len(self)} countries in {len(self.continent_names)} continents'
+
+    @classmethod
+    def from_files(
+            cls,
+            countries_file='game_data/countries.txt',
+            countries_connections_file='game_data/country_connections.txt',
+            continents_file='game_data/continents.txt'):
+        """
+        Creates a board from the same files used by risk.Game.load_map_from_file.
+        """
+        continent_names = []
+        continent_bonus = []
+        continent_position = {}
+        for file_line in helpers.read_game_data_from_file(continents_file):
+            continent_id, continent_name, continent_army_bonus = file_line.split(';')
+            continent_position[int(continent_id)] = len(continent_names)
+            continent_names.append(continent_name)
+            continent_bonus.append(int(continent_army_bonus))
+
+        country_ids = []
+        names = []
+        continent = []
+        for file_line in helpers.read_game_data_from_file(countries_file):
+            country_id, country_name, continent_id = file_line.split(';')
+            country_ids.append(int(country_id))
+            names.append(country_name)
+            continent.append(continent_position[int(continent_id)])
+
+        position_by_id = {country_id: i for i, country_id in enumerate(country_ids)}
+        connections = []
+        for file_line in helpers.read_game_data_from_file(countries_connections_file):
+            country_id, neighbour_id = file_line.split(';')
+            connections.append((position_by_id[int(country_id)], position_by_id[int(neighbour_id)]))
+
+        indptr, indices = cls.csr_from_connections(len(country_ids), connections)
+
+        return cls(np.array(country_ids, dtype=np.int32), names, np.array(continent, dtype=np.int16),
+                   continent_names, np.array(continent_bonus, dtype=np.int32), indptr, indices)
+
+    @classmethod
+    def from_bundle(cls, bundle):
+        """
+        Creates a board from a compiled map bundle (see the mapbundle module). The topology arrays
+        point straight into the bundle's buffer (its memory map or shared memory), nothing is copied.
+        """
+        def ints(section, count):
+            return np.frombuffer(bundle.buffer, dtype='<i4', count=count, offset=bundle.offsets[section])
+
+        return cls(ints('country_ids', bundle.countries_no), bundle.strings('country_names'),
+                   ints('country_continent', bundle.countries_no), bundle.strings('continent_names'),
+                   ints('continent_bonus', bundle.continents_no), ints('indptr', bundle.countries_no + 1),
+                   ints('indices', bundle.connections_no))
+
+    @classmethod
+    def from_game(cls, game):
+        """
+        Creates a board with the map, players and state of a risk.Game.
+        """
+        continent_position = {cont: i for i, cont in enumerate(game.continents)}
+        position = {c: i for i, c in enumerate(game.countries)}
+        connections = [(position[c], position[n]) for c in game.countries for n in c.neighbours]
+        indptr, indices = cls.csr_from_connections(len(game.countries), connections)
+
+        board = cls(np.array([c.id for c in game.countries], dtype=np.int32),
+                    [c.name for c in game.countries],
+                    np.array([continent_position[c.continent] for c in game.countries], dtype=np.int16),
+                    [cont.name for cont in game.continents],
+                    np.array([cont.army_bonus for cont in game.continents], dtype=np.int32),
+                    indptr, indices)
+        board.min_armies_per_turn = game.min_armies_per_turn
+        board.load_state_from_game(game)
+        return board
+
+    @staticmethod
+    def csr_from_connections(countries_no, connections):
+        """
+        Builds the CSR arrays from a list of (country position, neighbour position) tuples.
+        """
+        connections = np.array(connections, dtype=np.int32).reshape(-1, 2)
+        # Stable sort keeps neighbours in the order they were given
+        connections = connections[np.argsort(connections[:, 0], kind='stable')]
+        indptr = np.zeros(countries_no + 1, dtype=np.int32)
+        np.cumsum(np.bincount(connections[:, 0], minlength=countries_no), out=indptr[1:])
+        return indptr, connections[:, 1].copy()
+
+    def copy(self):
+        """
+        Returns a new board sharing the map with this one, with its own copy of the state.
+        """
+        new_board = Board.__new__(Board)
+        new_board.__dict__.update(self.__dict__)
+        new_board.players = list(self.players)
+        new_board.owner = self.owner.copy()
+        new_board.armies = self.armies.copy()
+        return new_board
+
+    def load_state_from_game(self, game):
+        """
+        Copies players, owners and armies from a risk.Game with the same map.
+        """
+        self.players = list(game.players) if game.players else []
+        player_position = {p: i for i, p in enumerate(self.players)}
+        for c in game.countries:
+            i = self.position_by_id[c.id]
+            self.owner[i] = NO_PLAYER if c.player is None else player_position[c.player]
+            self.armies[i] = c.armies
+
+    def save_state_to_game(self, game):
+        """
+        Copies owners and armies back into a risk.Game with the same map and players.
+        """
+        for c in game.countries:
+            i = self.position_by_id[c.id]
+            owner = self.owner[i]
+            c.player = None if owner == NO_PLAYER else self.players[owner]
+            c.armies = int(self.armies[i])
+
+    def country(self, position):
+        return BoardCountry(self, int(position))
+
+    def country_by_id(self, country_id):
+        return BoardCountry(self, self.position_by_id[country_id])
+
+    @property
+    def countries(self):
+        return [BoardCountry(self, i) for i in range(len(self))]
+
+    @property
+    def continents(self):
+        return [BoardContinent(self, i) for i in range(len(self.continent_names))]
+
+    def neighbours(self, position):
+        """
+        Positions of the neighbours of a country, as an array.
+        """
+        return self.indices[self.indptr[position]:self.indptr[position + 1]]
+
+    def player_position(self, player):
+        return self.players.index(player)
+
+    def get_countries(self, player_position, only_countries_with_more_than_one=False):
+        """
+        Positions of the countries of a player, as an array.
+        """
+        mask = self.owner == player_position
+        if only_countries_with_more_than_one:
+            mask &= self.armies > 1
+        return np.flatnonzero(mask)
+
+    def enemy_edges(self):
+        """
+        Mask over the neighbours in indices, True where the neighbour belongs to another player.
+        """
+        return self.owner[self.edge_from] != self.owner[self.indices]
+
+    def frontier(self, player_position):
+        """
+        Mask of the countries of a player with at least one enemy neighbour.
+        """
+        edges = self.enemy_edges() & (self.owner[self.edge_from] == player_position)
+        return np.bincount(self.edge_from[edges], minlength=len(self)) > 0
+
+    def attack_options(self, player_position):
+        """
+        Every possible attack of a player, as two arrays with the attacking and the attacked countries.
+        """
+        edges = self.enemy_edges() & (self.owner[self.edge_from] == player_position) & (self.armies[self.edge_from] > 1)
+        return self.edge_from[edges], self.indices[edges]
+
+    def threat(self):
+        """
+        For each country, the sum of armies in neighbouring countries of other players.
+        """
+        edges = self.enemy_edges()
+        return np.bincount(self.edge_from[edges], weights=self.armies[self.indices[edges]],
+                           minlength=len(self)).astype(np.int32)
+
+    def countries_per_continent(self):
+        """
+        Matrix with the number of countries of each player (rows) in each continent (columns).
+        """
+        owned = self.owner != NO_PLAYER
+        counts = np.zeros((len(self.players), len(self.continent_names)), dtype=np.int32)
+        np.add.at(counts, (self.owner[owned], self.continent[owned]), 1)
+        return counts
+
+    def reinforcements(self):
+        """
+        Armies each player gets for the next deployment, with the same rule as risk.Game.get_amount_armies_per_turn.
+        """
+        countries_no = np.bincount(self.owner[self.owner != NO_PLAYER], minlength=len(self.players))
+        armies = np.ceil(countries_no / 2).astype(np.int32)
+        armies[armies < 3] = self.min_armies_per_turn
+        return armies
+
+    def nbytes(self):
+        """
+        Memory used by the arrays of this board, topology included.
+        """
+        return sum(a.nbytes for a in (self.country_ids, self.continent, self.continent_bonus, self.indptr,
+                                      self.indices, self.edge_from, self.owner, self.armies))
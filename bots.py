@@ -0,0 +1,57 @@
+"""
+Computer players. A bot only needs a choose_action(engine) method returning one of engine.legal_actions().
+"""
+import random
+
+
+class RandomBot:
+    """
+    Picks any of the legal actions, all with the same chances.
+    """
+
+    def __init__(self, seed=None):
+        self.random = random.Random(seed)
+
+    def __str__(self):
+        return 'Random bot'
+
+    def choose_action(self, engine):
+        return self.random.choice(engine.legal_actions())
+
+
+class ScriptedBot:
+    """
+    Plays a fixed script without listing legal actions, so it keeps up on maps of any size: a few attacks
+    from random countries able to attack, at a random enemy neighbour with as many troops as possible,
+    no relocations, and all new armies into one random country.
+    """
+
+    def __init__(self, seed=None, attacks_per_turn=10):
+        self.random = random.Random(seed)
+        self.attacks_per_turn = attacks_per_turn
+        self.attacks_left = attacks_per_turn
+
+    def __str__(self):
+        return 'Scripted bot'
+
+    def choose_action(self, engine):
+        # Imported here, the engine imports this module
+        import engine as engine_module
+
+        player = engine.current_player
+
+        if engine.phase == engine_module.PHASE_ATTACK:
+            countries = engine.game.get_countries_able_to_attack(player)
+            if self.attacks_left > 0 and countries:
+                self.attacks_left -= 1
+                c = self.random.choice(countries)
+                n = self.random.choice(engine.game.get_enemy_neighbours(c))
+                return engine_module.attack(c.id, n.id, min(c.armies - 1, 3))
+            self.attacks_left = self.attacks_per_turn
+            return engine_module.END_PHASE_ACTION
+
+        elif engine.phase == engine_module.PHASE_DEPLOY:
+            c = self.random.choice(engine.game.get_countries(player))
+            return engine_module.deploy(c.id, engine.armies_to_deploy)
+
+        return engine_module.END_PHASE_ACTION
@@ -0,0 +1,88 @@
+"""
+Sources of dices. Each game has its own, so games can be seeded and reproduced independently of
+each other and of the random module.
+"""
+import random
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class DiceSource:
+    """
+    Base class for sources of dices.
+    """
+
+    def roll(self, n):
+        """
+        Throws dices.
+
+        :param n:
+        Number of dices.
+        :return:
+        List of N integers between 1 and 6.
+        """
+        raise NotImplementedError('Subclass must implement this method.')
+
+    def random(self):
+        """
+        A number between 0 and 1 (not included), for draws that are not dices, like the result of an
+        Assault. By default it's made of dices, 20 of them as base 6 digits, so any source gives it.
+        """
+        value = 0
+        for d in self.roll(20):
+            value = value * 6 + d - 1
+        return value / 6 ** 20
+
+
+class RandomDice(DiceSource):
+    """
+    Throws each dice when asked, with its own generator from the random module.
+    """
+
+    def __init__(self, seed=None):
+        self.generator = random.Random(seed)
+
+    def __str__(self):
+        return 'Random dices'
+
+    def roll(self, n):
+        randint = self.generator.randint
+        return [randint(1, 6) for x in range(n)]
+
+    def random(self):
+        return self.generator.random()
+
+
+class BufferedDice(DiceSource):
+    """
+    Throws large blocks of dices at once with a numpy PCG64 generator and hands them out as asked,
+    which saves the cost of a call to the generator per dice.
+    """
+
+    def __init__(self, seed=None, block_size=65536):
+        if np is None:
+            raise Exception('BufferedDice needs numpy, use RandomDice instead.')
+        self.generator = np.random.Generator(np.random.PCG64(seed))
+        self.block_size = block_size
+        self.block = []
+        self.position = 0
+
+    def __str__(self):
+        return f'Buffered dices (blocks of {self.block_size})'
+
+    def roll(self, n):
+        if self.position + n > len(self.block):
+            # Dices left from the previous block are kept, so no dice is thrown away
+            self.block = self.block[self.position:] + self.generator.integers(
+                1, 7, size=self.block_size, dtype=np.int8).tolist()
+            self.position = 0
+        dices = self.block[self.position:self.position + n]
+        self.position += n
+        return dices
+
+
+# Used by battles that are not part of a game
+default_dice = RandomDice()
@@ -0,0 +1,605 @@
+"""
+Headless game engine, plays risk.Game without any input() so it can be driven by bots at full speed.
+
+The turn phases of main.play() are kept as a state machine: every player attacks and relocates troops
+in turns, and then every player deploys new armies. At any point legal_actions() lists what the
+current player can do, and apply(action) does it and moves the game forward.
+
+Run from the repository's root folder to play games between bots:
+
+    python engine.py --games 100 --players 3
+"""
+import argparse
+import array
+import collections
+import time
+
+import risk
+import gamesetup
+import bots
+import dice
+
+PHASE_ATTACK = 'attack'
+PHASE_RELOCATE = 'relocate'
+PHASE_DEPLOY = 'deploy'
+PHASE_FINISHED = 'finished'
+
+# Kinds of action
+ATTACK = 'attack'
+RELOCATE = 'relocate'
+DEPLOY = 'deploy'
+END_PHASE = 'end_phase'
+
+
+class Action(collections.namedtuple('Action', ['kind', 'country_from', 'country_to', 'armies'])):
+    """
+    Something a player does. Countries are referenced by ID, so actions can be stored and sent around.
+
+    - Attack: from one country to an enemy neighbour, with a number of troops (1 to 3).
+    - Relocate: a number of armies from one country to a neighbour of the same player.
+    - Deploy: a number of new armies into a country, country_from is not used.
+    - End phase: the player passes, no country or armies.
+    """
+    __slots__ = ()
+
+    def __str__(self):
+        if self.kind == ATTACK:
+            return f'Attack from {self.country_from} to {self.country_to} with {self.armies} troops'
+        elif self.kind == RELOCATE:
+            return f'Relocate {self.armies} armies from {self.country_from} to {self.country_to}'
+        elif self.kind == DEPLOY:
+            return f'Deploy {self.armies} armies into {self.country_to}'
+        else:
+            return 'End phase'
+
+
+def attack(country_from, country_to, troops_no):
+    return Action(ATTACK, country_from, country_to, troops_no)
+
+
+def relocate(country_from, country_to, armies):
+    return Action(RELOCATE, country_from, country_to, armies)
+
+
+def deploy(country, armies):
+    return Action(DEPLOY, None, country, armies)
+
+
+END_PHASE_ACTION = Action(END_PHASE, None, None, 0)
+
+
+class Moves:
+    """
+    The legal moves of one kind, as parallel arrays of integers: the country each move goes from and to
+    (by ID, the same country for deployments) and the most armies it can take. A move stands for as many
+    actions as its most armies, with 1 army, 2 armies and so on.
+    """
+    __slots__ = ('kind', 'country_from', 'country_to', 'max_armies')
+
+    def __init__(self, kind, country_from=(), country_to=(), max_armies=()):
+        self.kind = kind
+        self.country_from = array.array('i', country_from)
+        self.country_to = array.array('i', country_to)
+        self.max_armies = array.array('i', max_armies)
+
+    def __len__(self):
+        return len(self.country_from)
+
+    def __str__(self):
+        return f'{len(self)} {self.kind} moves, {self.actions_no()} actions'
+
+    def actions_no(self):
+        return sum(self.max_armies)
+
+    def action(self, position, armies):
+        """
+        The action of one of the moves with a number of armies.
+        """
+        if self.kind == DEPLOY:
+            return deploy(self.country_to[position], armies)
+        return Action(self.kind, self.country_from[position], self.country_to[position], armies)
+
+    def actions(self):
+        """
+        Every action of the moves, as a list of objects of the class Action.
+        """
+        if self.kind == DEPLOY:
+            return [deploy(country_to, armies)
+                    for country_to, max_armies in zip(self.country_to, self.max_armies)
+                    for armies in range(1, max_armies + 1)]
+        kind = self.kind
+        return [Action(kind, country_from, country_to, armies)
+                for country_from, country_to, max_armies in zip(self.country_from, self.country_to, self.max_armies)
+                for armies in range(1, max_armies + 1)]
+
+    def by_source(self):
+        """
+        :return:
+        A dictionary by the ID of the country moves go from, in order, with lists of tuples (ID of the country
+        they go to, most armies).
+        """
+        sources = {}
+        for country_from, country_to, max_armies in zip(self.country_from, self.country_to, self.max_armies):
+            targets = sources.get(country_from)
+            if targets is None:
+                targets = sources[country_from] = []
+            targets.append((country_to, max_armies))
+        return sources
+
+
+def attack_moves(game, player):
+    """
+    Every attack a player can make, from the countries able to attack to their enemy neighbours.
+
+    :return:
+    An object of the class Moves.
+    """
+    country_from = []
+    country_to = []
+    max_armies = []
+    frontier = player.frontier
+    for c in player.countries_able_to_attack:
+        # You cannot attack with more than three armies no matter how many the country has.
+        max_troops = min(c.armies - 1, 3)
+        for n in frontier[c]:
+            country_from.append(c.id)
+            country_to.append(n.id)
+            max_armies.append(max_troops)
+    return Moves(ATTACK, country_from, country_to, max_armies)
+
+
+def relocation_moves(game, player, sources, multi_hop_relocation=False):
+    """
+    Every relocation a player can make.
+
+    :param sources:
+    The countries that can move troops, the ones with armies to spare when the relocation phase started.
+    :param multi_hop_relocation:
+    Whether troops can go to any country reachable through the player's own countries, instead of only
+    to neighbours.
+    :return:
+    An object of the class Moves.
+    """
+    country_from = []
+    country_to = []
+    max_armies = []
+    for c in sources:
+        if c.armies > 1:
+            if multi_hop_relocation:
+                targets = game.get_reachable_countries(c)
+            else:
+                targets = [n for n in c.neighbours if n.player is player]
+            for n in targets:
+                country_from.append(c.id)
+                country_to.append(n.id)
+                max_armies.append(c.armies - 1)
+    return Moves(RELOCATE, country_from, country_to, max_armies)
+
+
+def deployment_moves(game, player, armies):
+    """
+    Every deployment of up to a number of armies a player can make, one move per country.
+
+    :return:
+    An object of the class Moves.
+    """
+    ids = [c.id for c in player.countries]
+    return Moves(DEPLOY, ids, ids, [armies] * len(ids))
+
+
+def new_game(players_no=2, seed=None, dice_source=None, bundle=None):
+    """
+    Creates a game ready to be played, going through the same setup as main.play() but without asking anything.
+
+    :param players_no:
+    Number of players, 2 to 6.
+    :param seed:
+    Seed for the game's generators, to get the same game every time.
+    :param dice_source:
+    Where dices come from, see the dice module. By default the game's own generator is used.
+    :param bundle:
+    The map, a mapbundle.MapBundle. By default the map in game_data/.
+    :return:
+    An object of the class risk.Game
+    """
+    if not 2 <= players_no <= len(gamesetup.colors):
+        raise Exception(f'A game needs between 2 and {len(gamesetup.colors)} players.')
+
+    game = risk.Game(seed=seed, dice_source=dice_source)
+    game.load_map_bundle(bundle)
+    game.initialize_countries_deck()
+
+    game.assign_players([(f'Player {x + 1}', gamesetup.colors[x]) for x in range(players_no)])
+
+    game.deal_initial_countries_equally()
+    gamesetup.demo_deal_rest_countries_dice(game, verbose=False)
+
+    game.load_world_domination_objective(0.6)
+    gamesetup.initialize_objectives(game, verbose=False)
+
+    game.advance_next_player()
+
+    gamesetup.place_initial_armies(game)
+
+    return game
+
+
+class Engine:
+    """
+    Drives a risk.Game through its turn phases.
+    """
+
+    def __init__(self, game, max_turns=None, phase=None, single_phase=False, multi_hop_relocation=False):
+        """
+        :param game:
+        An object of the class risk.Game, with players, countries and objectives already dealt.
+        :param max_turns:
+        If given, the game finishes without a winner after this number of turns.
+        :param phase:
+        To pick up a game already going on, the phase the current player is in. By default the game
+        starts with the attack phase of the first player.
+        :param single_phase:
+        Whether to stop (phase becomes None) once the current phase ends, without moving on to the next
+        one or player. Used when the engine only plays some phases, like in main.py.
+        :param multi_hop_relocation:
+        Whether troops can be relocated to any country reachable through the player's own countries,
+        instead of only to neighbours.
+        """
+        self.game = game
+        self.max_turns = max_turns
+        self.single_phase = single_phase
+        self.multi_hop_relocation = multi_hop_relocation
+
+        # A turn is every player attacking and relocating, and then every player deploying
+        self.turn = 1
+        self.phase = None
+        self.winner = None
+        self.winning_objective = None
+
+        # The battle from the last attack
+        self.last_battle = None
+
+        # Armies still to be placed by the current player in the deployment phase
+        self.armies_to_deploy = 0
+
+        # Countries that had armies to spare when the relocation phase started, only these can move troops
+        self.relocation_sources = None
+
+        # The relocation sources last hashed by position_hash() with their keys, and their hash
+        self.hashed_sources = None
+        self.sources_hash = 0
+
+        # Position in game.players of the player playing the current phase
+        self.player_position = -1
+
+        if phase is None:
+            self._start_players_phase(PHASE_ATTACK)
+        else:
+            self.player_position = game.players.index(game.current_player)
+            self._start_phase(phase)
+
+    def __str__(self):
+        return f'Turn {self.turn}, {self.phase} phase of {self.current_player}'
+
+    @property
+    def current_player(self):
+        return self.game.current_player
+
+    @property
+    def finished(self):
+        return self.phase == PHASE_FINISHED
+
+    def country(self, country_id):
+        return self.game.countries_by_id[country_id]
+
+    def describe(self, action):
+        """
+        Text for an action, with the names of the countries instead of their IDs.
+        """
+        if action.kind == ATTACK:
+            return (f'Attack from {self.country(action.country_from).name} to {self.country(action.country_to).name}'
+                    f' with {action.armies} troops')
+        elif action.kind == RELOCATE:
+            return (f'Relocate {action.armies} armies from {self.country(action.country_from).name}'
+                    f' to {self.country(action.country_to).name}')
+        elif action.kind == DEPLOY:
+            return f'Deploy {action.armies} armies into {self.country(action.country_to).name}'
+        else:
+            return str(action)
+
+    def moves(self):
+        """
+        The legal moves of the current player in the current phase, besides ending the phase (possible in
+        the attack and relocation phases).
+
+        :return:
+        An object of the class Moves, empty once the game or phase finished.
+        """
+        player = self.current_player
+        if self.phase == PHASE_ATTACK:
+            return attack_moves(self.game, player)
+        elif self.phase == PHASE_RELOCATE:
+            return relocation_moves(self.game, player, self.relocation_sources, self.multi_hop_relocation)
+        elif self.phase == PHASE_DEPLOY:
+            return deployment_moves(self.game, player, self.armies_to_deploy)
+        return Moves(None)
+
+    def legal_actions(self):
+        """
+        Lists every action the current player can take.
+
+        :return:
+        A list of objects of the class Action.
+        """
+        if self.phase == PHASE_ATTACK or self.phase == PHASE_RELOCATE:
+            return [END_PHASE_ACTION] + self.moves().actions()
+        elif self.phase == PHASE_DEPLOY:
+            return self.moves().actions()
+        return []
+
+    def position_hash(self):
+        """
+        Zobrist hash of the position: the board, the current player and the phase, plus the armies left to
+        deploy in the deployment phase and the countries that can move troops in the relocation phase, see
+        the zobrist module. Hashing must be enabled in the game, with game.enable_hashing().
+        """
+        keys = self.game.hash_keys
+        position_hash = self.game.position_hash() ^ keys.phase_key(self.phase)
+        if self.phase == PHASE_DEPLOY:
+            position_hash ^= keys.deploy_key(self.armies_to_deploy)
+        elif self.phase == PHASE_RELOCATE:
+            # Sources are a new list every relocation phase and never change, so their hash is kept
+            hashed = self.hashed_sources
+            if hashed is None or hashed[0] is not self.relocation_sources or hashed[1] is not keys:
+                positions = self.game.hash_country_positions
+                self.sources_hash = 0
+                for c in self.relocation_sources:
+                    self.sources_hash ^= keys.source_keys[positions[c]]
+                self.hashed_sources = (self.relocation_sources, keys)
+            position_hash ^= self.sources_hash
+        return position_hash
+
+    def relocation_targets(self, country):
+        """
+        Countries a country of the current player can relocate troops to.
+        """
+        if self.multi_hop_relocation:
+            return self.game.get_reachable_countries(country)
+        return [n for n in country.neighbours if n.player == self.current_player]
+
+    def apply(self, action, dices=None):
+        """
+        Does an action for the current player and moves the game forward.
+
+        :param action:
+        An object of the class Action.
+        :param dices:
+        For attacks, a tuple with the dices of the attacker and the defender to use instead of throwing
+        new ones, e.g. to replay a game.
+        :return:
+        The battle if the action was an attack, otherwise None.
+        """
+        if self.finished:
+            raise Exception('The game is already finished.')
+        if self.phase is None:
+            raise Exception('The phase being played has already finished.')
+
+        if action.kind == END_PHASE:
+            if self.phase == PHASE_DEPLOY:
+                raise Exception('All armies must be deployed before finishing the deployment phase.')
+            self._end_phase()
+            return None
+
+        elif action.kind == ATTACK and self.phase == PHASE_ATTACK:
+            return self._attack(action, dices)
+
+        elif action.kind == RELOCATE and self.phase == PHASE_RELOCATE:
+            self._relocate(action)
+
+        elif action.kind == DEPLOY and self.phase == PHASE_DEPLOY:
+            self._deploy(action)
+
+        else:
+            raise Exception(f'Cannot {action.kind} during the {self.phase} phase.')
+
+        return None
+
+    def save(self):
+        """
+        Returns a point the engine and its game can go back to with undo(). The game's journal must be started.
+        """
+        return (self.game.checkpoint(), self.turn, self.phase, self.winner, self.winning_objective,
+                self.last_battle, self.armies_to_deploy, self.relocation_sources, self.player_position,
+                self.single_phase)
+
+    def undo(self, saved):
+        """
+        Goes back to a point returned by save(), undoing everything done since then.
+        """
+        (checkpoint, self.turn, self.phase, self.winner, self.winning_objective, self.last_battle,
+         self.armies_to_deploy, self.relocation_sources, self.player_position, self.single_phase) = saved
+        self.game.rollback(checkpoint)
+
+    def play(self, players_bots):
+        """
+        Plays until the game finishes.
+
+        :param players_bots:
+        A dictionary with a bot for each player, see the bots module.
+        :return:
+        The winner, or None if the game finished because of max_turns.
+        """
+        while not self.finished:
+            self.apply(players_bots[self.current_player].choose_action(self))
+        return self.winner
+
+    def _attack(self, action, dices=None):
+        player = self.current_player
+        country_from = self.country(action.country_from)
+        country_to = self.country(action.country_to)
+
+        if country_from.player != player:
+            raise Exception(f'{country_from.name} does not belong to {player.name}.')
+        if country_to not in country_from.neighbours:
+            raise Exception(f'{country_to.name} is not a neighbour of {country_from.name}.')
+        if not 1 <= action.armies <= min(country_from.armies - 1, 3):
+            raise Exception(f'{country_from.name} cannot attack with {action.armies} troops.')
+
+        battle = self.game.call_attack(country_from, country_to, action.armies)
+        if dices is None:
+            battle.roll_dices_attacker()
+            battle.roll_dices_defender()
+        else:
+            battle.dices_attacker = list(dices[0])
+            battle.dices_defender = list(dices[1])
+        battle.calculate()
+        self.last_battle = battle
+
+        if battle.defender_lost_country:
+            self._check_winner()
+
+        return battle
+
+    def _relocate(self, action):
+        country_from = self.country(action.country_from)
+        country_to = self.country(action.country_to)
+
+        if country_from not in self.relocation_sources:
+            raise Exception(f'{country_from.name} cannot move troops this round.')
+        if self.multi_hop_relocation:
+            reachable = self.game.reachable(country_from, country_to) and country_to is not country_from
+        else:
+            reachable = country_to.player == self.current_player and country_to in country_from.neighbours
+        if not reachable:
+            raise Exception(f'Cannot move troops from {country_from.name} to {country_to.name}.')
+        if not 1 <= action.armies < country_from.armies:
+            raise Exception(f'{country_from.name} cannot move {action.armies} armies.')
+
+        country_from.armies -= action.armies
+        country_to.armies += action.armies
+
+    def _deploy(self, action):
+        country = self.country(action.country_to)
+
+        if country.player != self.current_player:
+            raise Exception(f'{country.name} does not belong to {self.current_player.name}.')
+        if not 1 <= action.armies <= self.armies_to_deploy:
+            raise Exception(f'Cannot deploy {action.armies} armies, {self.armies_to_deploy} left.')
+
+        country.armies += action.armies
+        self.armies_to_deploy -= action.armies
+
+        if self.armies_to_deploy == 0:
+            self._end_phase()
+
+    def _check_winner(self):
+        winner = self.game.check_if_winner()
+        if winner:
+            self.winner = winner
+            self.winning_objective = self.game.winning_objective
+            self.phase = PHASE_FINISHED
+        return winner
+
+    def _end_phase(self):
+        if self.single_phase:
+            self.phase = None
+        elif self.phase == PHASE_ATTACK:
+            self._start_phase(PHASE_RELOCATE)
+        elif self.phase == PHASE_RELOCATE:
+            if not self._check_winner():
+                self._next_player(PHASE_ATTACK)
+        elif self.phase == PHASE_DEPLOY:
+            self._next_player(PHASE_DEPLOY)
+
+    def _next_player(self, phase):
+        """
+        Passes the phase to the next player still in the game. After the last one, the next phase starts
+        with the first player.
+        """
+        players = self.game.players
+        self.player_position += 1
+        while self.player_position < len(players) and len(self.game.get_countries(players[self.player_position])) == 0:
+            self.player_position += 1
+
+        if self.player_position < len(players):
+            self.game.set_current_player(players[self.player_position])
+            self._start_phase(phase)
+        elif phase == PHASE_ATTACK:
+            self._start_players_phase(PHASE_DEPLOY)
+        else:
+            self.turn += 1
+            if self.max_turns and self.turn > self.max_turns:
+                self.phase = PHASE_FINISHED
+            else:
+                self._start_players_phase(PHASE_ATTACK)
+
+    def _start_players_phase(self, phase):
+        self.player_position = -1
+        self._next_player(phase)
+
+    def _start_phase(self, phase):
+        self.phase = phase
+        player = self.current_player
+
+        if phase == PHASE_RELOCATE:
+            self.relocation_sources = self.game.get_countries(player, True)
+        elif phase == PHASE_DEPLOY:
+            self.armies_to_deploy = self.game.get_amount_armies_per_turn(player)
+
+
+def play_games(games_no, players_no, seed=None, max_turns=None, bot_class=bots.RandomBot, buffered_dice=False):
+    """
+    Plays a number of games between bots.
+
+    :param buffered_dice:
+    Whether to use dice.BufferedDice, which needs numpy, instead of the game's default dices.
+
+    :return:
+    A tuple with a Counter of wins per player name (None for games without a winner), a Counter of
+    the kind of objective fulfilled in each game won and the total number of turns.
+    """
+    wins = collections.Counter()
+    objectives = collections.Counter()
+    total_turns = 0
+
+    for x in range(games_no):
+        game_seed = None if seed is None else seed + x
+        game = new_game(players_no, game_seed, dice.BufferedDice(game_seed) if buffered_dice else None)
+        engine = Engine(game, max_turns)
+        players_bots = {p: bot_class(None if game_seed is None else game_seed + n) for n, p in enumerate(game.players)}
+        winner = engine.play(players_bots)
+        wins[winner.name if winner else None] += 1
+        if winner:
+            objectives[type(engine.winning_objective).__name__] += 1
+        total_turns += engine.turn
+
+    return wins, objectives, total_turns
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description='Plays games between bots and reports how fast they go.')
+    parser.add_argument('--games', type=int, default=100, help='Number of games to play.')
+    parser.add_argument('--players', type=int, default=2, help='Number of players per game (2-6).')
+    parser.add_argument('--seed', type=int, default=None, help='Seed to get the same games every time.')
+    parser.add_argument('--max-turns', type=int, default=200,
+                        help='Games finish without a winner after this number of turns.')
+    parser.add_argument('--buffered-dice', action='store_true',
+                        help='Throw dices in blocks with numpy (see dice.BufferedDice).')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    wins, objectives, total_turns = play_games(args.games, args.players, args.seed, args.max_turns,
+                                               buffered_dice=args.buffered_dice)
+    seconds = time.perf_counter() - start
+
+    print(f'Played {args.games} games between {args.players} players in {seconds:.2f}s'
+          f' ({args.games / seconds:.1f} games/sec, {total_turns / args.games:.1f} turns per game)')
+    for name, wins_no in sorted(wins.items(), key=lambda x: -x[1]):
+        print(f' - {name if name else "No winner"}: {wins_no}')
+    print('Objectives fulfilled:')
+    for objective_type, wins_no in objectives.most_common():
+        print(f' - {objective_type}: {wins_no}')
+
+
+if __name__ == '__main__':
+    main_cli()
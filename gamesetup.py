@@ -0,0 +1,125 @@
+"""
+Setting up a new game: the colors of the players, dealing the countries left after dealing them
+equally, the objectives and the first armies. Shared by main.play() and engine.new_game().
+"""
+import helpers
+import risk
+
+colors = ['Red', 'Blue', 'Green', 'Yellow', 'Black', 'Pink', 'White', 'Grey']
+
+
+def demo_deal_rest_countries_dice(game, verbose=True):
+    free_countries = game.get_unassigned_countries()
+    players_dices = []
+
+    for c in free_countries:
+        max_value = 0
+        for p in game.players:
+            dice = game.dice.roll(1)[0]
+            players_dices.append((p, dice))
+            if dice > max_value:
+                max_value = dice
+                winner = p
+        if verbose:
+            helpers.show(f'Player {winner.name} receives {c.name}.')
+        c.SetPlayer(winner)
+        ### What happens if two people get the same? or three?
+
+
+def initialize_objectives(game, verbose=True):
+    """
+    Creates the game's objectives. These are hardcoded.
+
+    :param verbose:
+    Whether to show each player's objectives once dealt.
+    """
+    objectives = []
+
+    # We create one annihilation objective per player. In the original game there's one card
+    # per player, and if not possible (because player is not player or one is that player) then
+    # the next person in the round should be taken as objective, but it's more logical in a computer
+    # game to just make one objective for each player.
+    for pl in game.players:
+        annhil_objective = risk.AnnihilationObjetive(pl)
+        objectives.append(annhil_objective)
+
+    obj1 = risk.ConquestObjetive([game.continents[0]], None) # One continent
+    obj2 = risk.ConquestObjetive([game.continents[1]],
+                                 [(game.continents[0], 1)]) # One continent plus one country
+    obj3 = risk.ConquestObjetive(game.continents, None) # Person getting this one is doomed
+    obj4 = risk.ConquestObjetive(None,
+                                 [(game.continents[0], 3), (game.continents[1], 3)])
+
+    for o in [obj1, obj2, obj3, obj4]:
+        objectives.append(o)
+
+    objectives_deck_deal = objectives.copy()
+    game.random.shuffle(objectives_deck_deal)
+    for p in game.players:
+        p.add_objective(objectives_deck_deal.pop())
+
+    if verbose:
+        for p in game.players:
+            helpers.show(f"{p.name} has following objectives:")
+            for o in p.objectives:
+                helpers.show(f" - {o}")
+
+    def country_card_after_attacking(game, player):
+        helpers.show(f"{player.name} has conquered at least one country, she/he receives a country card.")
+        game.give_country_card_to_player(player)
+
+    def trad_each_country_card(game, player):
+
+        finished_trading = False
+        while not finished_trading:
+
+            non_used_cards = []
+
+            helpers.show(f"Checking {player.name}'s country cards")
+
+            for card in player.cards:
+                if not card.already_traded and (card.country in player.countries):
+                    non_used_cards.append(card)
+
+            if len(non_used_cards) > 0:
+                helpers.show(f"Following cards can be traded:")
+
+                for num, c in enumerate(non_used_cards):
+                    helpers.show(f" {num} - {c}")
+
+                    card_no = helpers.prompt_int_range(
+                        f'Please choose a card to be claimed (1-{len(non_used_cards)} or 0 to skip): ',
+                        'Wrong input!',
+                        0, len(non_used_cards))
+
+                    if card_no > 0:
+                        selected_card = non_used_cards[card_no-1]
+                        helpers.show(f"Trading {selected_card}")
+                        game.trade_card_posessed_country(selected_card)
+                    else:
+                        finished_trading = True
+
+            else:
+                helpers.show(f"No individual cards to trade for armies.")
+                break
+
+    def trade_country_card_set(game, player):
+        pass
+
+
+def place_initial_armies(game):
+    """
+    Puts one army in every country and then a few more randomly in each player's countries.
+
+    :return:
+    Nothing
+    """
+    game.add_troops_too_all_countries(1)
+    for n in (2, 1):
+        for p in game.players:
+            # print(f'{p} adding now {n} armies.')
+            for x in range(n):
+                p_cs = game.get_countries(p)
+                c = p_cs[game.random.randint(0, len(p_cs) - 1)]
+                # print(f'Adding randomly one army to: {c}')
+                c.armies += 1
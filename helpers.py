@@ -1,8 +1,124 @@
 import os
 import re
 
+
+class ConsoleIO:
+    """
+    Reads answers from the keyboard and shows text in the terminal, as always.
+    """
+
+    def __init__(self, transcript=None):
+        """
+        :param transcript:
+        If given, a list where every answer is appended, to replay the game later with ScriptedIO.
+        """
+        self.transcript = transcript
+
+    def read(self, prompt, choices=None):
+        answer = input(prompt)
+        if self.transcript is not None:
+            self.transcript.append(answer)
+        return answer
+
+    def write(self, text):
+        print(text)
+
+    def clear(self):
+        # for mac and linux(here, os.name is 'posix')
+        if os.name == 'posix':
+            _ = os.system('clear')
+        else:
+            # for windows platform
+            _ = os.system('cls')
+
+
+class ScriptedIO:
+    """
+    Answers from a recorded transcript and then from a policy, without a terminal. Text shown is
+    dropped, or kept in a list, and clearing the screen does nothing.
+    """
+
+    def __init__(self, answers=(), policy=None, output=None):
+        """
+        :param answers:
+        Answers given in order, as strings, before asking the policy.
+        :param policy:
+        Function called as policy(prompt, choices) once the answers run out, returning the answer as a
+        string. choices is a range for numbers, a tuple of strings for fixed answers (like 'y' and 'n')
+        or None for anything (names, pressing a key).
+        :param output:
+        If given, a list where every text shown is appended.
+        """
+        self.answers = iter(answers)
+        self.policy = policy
+        self.output = output
+        self.answers_no = 0
+
+    def read(self, prompt, choices=None):
+        self.answers_no += 1
+        answer = next(self.answers, None)
+        if answer is not None:
+            return answer
+        if self.policy is None:
+            raise Exception(f'The transcript has no more answers, it was asked: {prompt}')
+        return self.policy(prompt, choices)
+
+    def write(self, text):
+        if self.output is not None:
+            self.output.append(text)
+
+    def clear(self):
+        pass
+
+
+def random_policy(rng):
+    """
+    A policy for ScriptedIO answering at random with a random.Random, and with nothing (like pressing
+    enter) when anything goes.
+    """
+    def policy(prompt, choices):
+        if choices is None:
+            return ''
+        return str(rng.choice(choices))
+    return policy
+
+
+# Where answers come from and text goes to, the terminal unless changed with set_io()
+io = ConsoleIO()
+
+
+def set_io(backend):
+    """
+    Changes where answers come from and text goes to, e.g. set_io(ScriptedIO(answers)).
+
+    :return:
+    The previous backend, to put it back afterwards.
+    """
+    global io
+    previous = io
+    io = backend
+    return previous
+
+
+def read_input(prompt='', choices=None):
+    """
+    Asks for an answer, like input().
+
+    :param choices:
+    What makes sense as an answer, for scripted backends: a range, a tuple of strings, or None.
+    """
+    return io.read(prompt, choices)
+
+
+def show(*values, sep=' '):
+    """
+    Shows values, like print().
+    """
+    io.write(sep.join(str(value) for value in values))
+
+
 def press_any_key():
-    input('\nPress any key to continue...\n')
+    read_input('\nPress any key to continue...\n')
 
 
 def lang_enumeration(and_expression='and', *kwarg):
@@ -14,12 +130,7 @@ def lang_enumeration(and_expression='and', *kwarg):
 
 
 def screen_clear():
-   # for mac and linux(here, os.name is 'posix')
-   if os.name == 'posix':
-      _ = os.system('clear')
-   else:
-      # for windows platform
-      _ = os.system('cls')
+    io.clear()
 
 
 def prompt_int(prompt_text, error_text=None):
@@ -29,10 +140,10 @@ def prompt_int(prompt_text, error_text=None):
     have_int = False
     while not have_int:
         try:
-            my_int = int(input(prompt_text))
+            my_int = int(read_input(prompt_text))
             have_int = True
         except ValueError:
-            print(error_text)
+            show(error_text)
     return my_int
 
 
@@ -43,14 +154,14 @@ def prompt_int_range(prompt_text, error_text, min_int, max_int):
         error_text = 'Error: Please provide an integer between {} and {}.'.format(min_int, max_int)
     while not have_int:
         try:
-            my_int = int(input(prompt_text))
+            my_int = int(read_input(prompt_text, range(min_int, max_int + 1)))
             #print(f'Read int {my_int}, max {max_int} and min {min_int}...')
             if max_int >= my_int >= min_int:
                 have_int = True
             else:
-                print(error_text)
+                show(error_text)
         except ValueError:
-            print(error_text)
+            show(error_text)
     return my_int
 
 def read_game_data_from_file(file):
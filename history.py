@@ -0,0 +1,182 @@
+"""
+Where a game keeps its battles. Games can be long, so battles are not kept forever: either the last
+ones are kept in memory, or every battle is written to a file as a fixed-width record. Both keep
+counters of battles, conquests and casualties per player.
+"""
+import collections
+import struct
+
+# Battle number, attacking and defending country IDs, attacking and defending player positions,
+# troops of each side, three dices of each side (0 when not thrown), casualties of each side and
+# whether the defender lost the country.
+RECORD_FORMAT = struct.Struct('<IIIbbBB3B3BHHB')
+
+BattleRecord = collections.namedtuple('BattleRecord', [
+    'number', 'attacking_country_id', 'defending_country_id', 'attacking_player', 'defending_player',
+    'attacker_troops_no', 'defender_troops_no', 'dices_attacker', 'dices_defender',
+    'casualties_attacker', 'casualties_defender', 'defender_lost_country'])
+
+
+class BattleStats:
+    """
+    Counters of the battles fought in a game.
+    """
+
+    def __init__(self):
+        self.battles = 0
+        self.conquests = 0
+
+        # Dictionaries by player
+        self.casualties = collections.Counter()
+        self.conquests_by_player = collections.Counter()
+
+    def __str__(self):
+        return f'{self.battles} battles, {self.conquests} conquests'
+
+    def add(self, battle):
+        self.battles += 1
+        self.casualties[battle.attacking_player] += battle.casualties_attacker
+        self.casualties[battle.defending_player] += battle.casualties_defender
+        if battle.defender_lost_country:
+            self.conquests += 1
+            self.conquests_by_player[battle.attacking_player] += 1
+
+    def remove(self, battle):
+        self.battles -= 1
+        self.casualties[battle.attacking_player] -= battle.casualties_attacker
+        self.casualties[battle.defending_player] -= battle.casualties_defender
+        if battle.defender_lost_country:
+            self.conquests -= 1
+            self.conquests_by_player[battle.attacking_player] -= 1
+
+
+class BattleHistory:
+    """
+    Keeps the last battles in memory, older ones are forgotten but still counted in stats.
+    """
+
+    def __init__(self, capacity=1000):
+        """
+        :param capacity:
+        Number of battles kept, None to keep them all.
+        """
+        self.capacity = capacity
+        self.battles = collections.deque(maxlen=capacity)
+        self.stats = BattleStats()
+
+    def __str__(self):
+        return f'Last {len(self.battles)} battles of {self.stats}'
+
+    def __len__(self):
+        return len(self.battles)
+
+    def __iter__(self):
+        return iter(self.battles)
+
+    def __getitem__(self, index):
+        return self.battles[index]
+
+    def record(self, battle):
+        """
+        :return:
+        The oldest battle, if it was pushed out to make room for this one, otherwise None.
+        """
+        pushed_out = None
+        if self.capacity is not None and len(self.battles) == self.capacity:
+            pushed_out = self.battles[0]
+        self.battles.append(battle)
+        self.stats.add(battle)
+        return pushed_out
+
+    def unrecord(self, battle, pushed_out=None):
+        """
+        Takes out the last battle recorded, used when undoing changes to a game.
+
+        :param pushed_out:
+        What record() returned for the battle, brought back as the oldest one.
+        """
+        self.battles.pop()
+        if pushed_out is not None:
+            self.battles.appendleft(pushed_out)
+        self.stats.remove(battle)
+
+
+class BattleRecordWriter:
+    """
+    Writes every battle to a binary file as a fixed-width record (see RECORD_FORMAT), nothing is kept in memory.
+    Read it back with read_records().
+    """
+
+    def __init__(self, file, players):
+        """
+        :param file:
+        Path of the file, it gets overwritten.
+        :param players:
+        The players of the game, records reference them by position in this list.
+        """
+        self.file = open(file, 'wb')
+        self.player_position = {p: i for i, p in enumerate(players)}
+        self.stats = BattleStats()
+
+    def __str__(self):
+        return f'{self.stats} written to {self.file.name}'
+
+    def __len__(self):
+        return self.stats.battles
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def record(self, battle):
+        self.stats.add(battle)
+        self.file.write(RECORD_FORMAT.pack(
+            self.stats.battles,
+            battle.attacking_country.id,
+            battle.defending_country.id,
+            self.player_position[battle.attacking_player],
+            self.player_position[battle.defending_player],
+            battle.attacker_troops_no,
+            battle.defender_troops_no,
+            *_padded_dices(battle.dices_attacker),
+            *_padded_dices(battle.dices_defender),
+            battle.casualties_attacker,
+            battle.casualties_defender,
+            battle.defender_lost_country))
+
+    def unrecord(self, battle, pushed_out=None):
+        """
+        Takes out the last battle written, used when undoing changes to a game. Nothing is ever pushed out.
+        """
+        self.stats.remove(battle)
+        self.file.seek(-RECORD_FORMAT.size, 2)
+        self.file.truncate()
+
+    def close(self):
+        self.file.close()
+
+
+def _padded_dices(dices):
+    dices = list(dices or [])[:3]
+    return dices + [0] * (3 - len(dices))
+
+
+def read_records(file):
+    """
+    Reads the battles written by a BattleRecordWriter.
+
+    :return:
+    A generator of BattleRecord, dices without the ones not thrown.
+    """
+    with open(file, 'rb') as records_file:
+        while True:
+            data = records_file.read(RECORD_FORMAT.size)
+            if len(data) < RECORD_FORMAT.size:
+                break
+            values = RECORD_FORMAT.unpack(data)
+            yield BattleRecord(*values[:7],
+                               [dice for dice in values[7:10] if dice],
+                               [dice for dice in values[10:13] if dice],
+                               values[13], values[14], bool(values[15]))
@@ -3,21 +3,54 @@
 # Press Shift+F10 to execute it or replace it with your code.
 # Press Double Shift to search everywhere for classes, files, tool windows, actions, and settings.
 
+import argparse
+import contextlib
+import json
 import random
 import risk
 import helpers
+import odds
+import engine
+import gamesetup
+import mcts
 
-colors = ['Red', 'Blue', 'Green', 'Yellow', 'Black', 'Pink', 'White', 'Grey']
+# Players played by the computer, with the bot making their decisions
+computer_players = {}
 
+# Seconds the computer thinks about each decision
+computer_time_budget = 1.0
 
-def throw_dice(n, min=1, max=6):
+# Iterations the computer searches for each decision instead, when the game has a seed, so the same
+# answers give the same game
+computer_iterations = 1000
+
+# Whether troops can be relocated to any country reachable through the player's own countries,
+# instead of only to neighbours
+multi_hop_relocation = False
+
+# Where to write the timings of the game's methods and phases when it finishes, None to not profile.
+# Stats go in JSON to profile_file, the calls themselves to trace_file as a Chrome trace.
+profile_file = None
+trace_file = None
+
+# Seed for the game's dices and shuffles, None for a different game every time. Set it to replay a
+# recorded transcript of answers.
+seed = None
+
+
+def throw_dice(n, min=1, max=6, dice_source=None):
     """
     Simulates throwing dices.
     :param n:
     Number of dices
+    :param dice_source:
+    If given, dices come from it (see the dice module), like the game's own dices.
     :return:
     List of N dices
     """
+    if dice_source is not None:
+        return dice_source.roll(n)
+
     dices = []
 
     for x in range(n):
@@ -46,12 +79,12 @@ def show_dices(dices):
     text = ''
     for dice in sorted(dices):
         text += f'({dice}) '
-    print(text)
+    helpers.show(text)
 
 
 def enumerate_countries_and_pick_one(countries):
     for (idx,c) in enumerate(countries):
-        print(f'{idx + 1} - {c}')
+        helpers.show(f'{idx + 1} - {c}')
 
     max_index = len(countries)
     country_no = helpers.prompt_int_range(
@@ -67,7 +100,7 @@ def load_countries(countries_file='countries.txt', countries_connections_file='c
     countries = []
     countries_dict = {}
 
-    print('Loading countries from the database...')
+    helpers.show('Loading countries from the database...')
 
     # try:
     with open(countries_file, 'r') as countries_fp:
@@ -90,11 +123,11 @@ def load_countries(countries_file='countries.txt', countries_connections_file='c
             countries_dict[country_id].add_neighbour(countries_dict[neighbour_id])
         connections_fp.close()
 
-    print('Loaded following countries:\n')
+    helpers.show('Loaded following countries:\n')
     for c in countries:
-        print(c)
+        helpers.show(c)
 
-    input('\nPress any key to continue...')
+    helpers.read_input('\nPress any key to continue...')
 
     return countries
     # except:
@@ -103,7 +136,7 @@ def load_countries(countries_file='countries.txt', countries_connections_file='c
 
 def show_banner():
     helpers.screen_clear()
-    print("\nWelcome to Patricio's TEG!\n\nLet's play.\n")
+    helpers.show("\nWelcome to Patricio's TEG!\n\nLet's play.\n")
 
 
 def prompt_players(game):
@@ -123,18 +156,33 @@ def prompt_players(game):
 
     number_players = helpers.prompt_int_range('How many players will be playing? ', None, 2, 6)
 
-    print(f"\nAlright, we have {number_players} today!\n")
+    helpers.show(f"\nAlright, we have {number_players} today!\n")
+
+    computer_names = []
+
+    # Colors are shuffled once per game, then they get assigned to players in order
+    available_colors = gamesetup.colors.copy()
+    game.random.shuffle(available_colors)
 
     for x in range(number_players):
-        name = input("Please enter player {}'s name: ".format(x + 1))
-        p_color = colors.pop()
-        print("Player {} is {} with color {}.\n".format(x + 1, name, p_color))
+        name = helpers.read_input("Please enter player {}'s name: ".format(x + 1))
+        if helpers.read_input(f"Is {name} played by the computer? [y/N] ", ('y', 'n')).lower() == 'y':
+            computer_names.append(name)
+        p_color = available_colors.pop()
+        helpers.show("Player {} is {} with color {}.\n".format(x + 1, name, p_color))
         names_and_colors.append((name, p_color))
 
-    print("Because you cannot have people pick colors. You'll have a bunch of guys fighting over who's Mr. Black.\n")
+    helpers.show("Because you cannot have people pick colors. You'll have a bunch of guys fighting over who's Mr. Black.\n")
 
     game.assign_players(names_and_colors)
 
+    for position, p in enumerate(game.players):
+        if p.name in computer_names:
+            if seed is None:
+                computer_players[p] = mcts.MCTSBot(computer_time_budget)
+            else:
+                computer_players[p] = mcts.MCTSBot(seed=seed + position, max_iterations=computer_iterations)
+
     helpers.press_any_key()
 
 
@@ -148,11 +196,11 @@ def deal_initial_countries(game):
     countries_per_player = int(len(game.countries) / len(game.players))
     countries_raffle = len(game.countries) % len(game.players)
 
-    print(f"\nDealing countries to players now...\n")
-    print(f"Total countries: {len(game.countries)}")
-    print(f"Total players: {len(game.players)}")
-    print(f"Countries per player: {countries_per_player}")
-    print(f"Remaining countries after first round of dealing countries: {countries_raffle}")
+    helpers.show(f"\nDealing countries to players now...\n")
+    helpers.show(f"Total countries: {len(game.countries)}")
+    helpers.show(f"Total players: {len(game.players)}")
+    helpers.show(f"Countries per player: {countries_per_player}")
+    helpers.show(f"Remaining countries after first round of dealing countries: {countries_raffle}")
 
     helpers.press_any_key()
 
@@ -160,9 +208,9 @@ def deal_initial_countries(game):
 
     for p in game.players:
         p_c = game.get_countries(p)
-        print(f'\n{p} got {len(p_c)}:')
+        helpers.show(f'\n{p} got {len(p_c)}:')
         for c in game.get_countries(p):
-            print(c)
+            helpers.show(c)
 
     helpers.press_any_key()
 
@@ -172,21 +220,21 @@ def deal_rest_countries_dice(game):
     players_dices = []
     winner = None
 
-    print("\nWe still have to deal {} countries, but we'll use dices for that:".format(len(free_countries)))
+    helpers.show("\nWe still have to deal {} countries, but we'll use dices for that:".format(len(free_countries)))
 
     for c in free_countries:
-        print(f'Dealing country {c.name}:')
+        helpers.show(f'Dealing country {c.name}:')
         max_value = 0
         for p in game.players:
-            input(f"{p.name}, press any key to roll one dice.")
-            dice = throw_dice(1)[0]
+            helpers.read_input(f"{p.name}, press any key to roll one dice.")
+            dice = throw_dice(1, dice_source=game.dice)[0]
             players_dices.append((p, dice))
-            print(f"{p.name} got {dice}.")
+            helpers.show(f"{p.name} got {dice}.")
             if dice > max_value:
                 max_value = dice
                 winner = p
 
-        print(f'Player {winner.name} receives {c.name}.')
+        helpers.show(f'Player {winner.name} receives {c.name}.')
         c.SetPlayer(winner)
         ### What happens if two people get the same? or three?
 
@@ -197,7 +245,7 @@ def demo_load_players(game, n):
     players = []
     if 1 < n < 7:
         for x in range(n):
-            players.append(risk.Player(f'Player {x + 1}', colors.pop()))
+            players.append(risk.Player(f'Player {x + 1}', gamesetup.colors.pop()))
         game.players = players
 
 
@@ -205,51 +253,63 @@ def demo_deal_initial_countries(game):
     game.deal_initial_countries_equally()
 
 
-def demo_deal_rest_countries_dice(game):
-    free_countries = game.get_unassigned_countries()
-    players_dices = []
-
-    for c in free_countries:
-        max_value = 0
-        for p in game.players:
-            dice = throw_dice(1)[0]
-            players_dices.append((p, dice))
-            if dice > max_value:
-                max_value = dice
-                winner = p
-        print(f'Player {winner.name} receives {c.name}.')
-        c.SetPlayer(winner)
-        ### What happens if two people get the same? or three?
-
-    for p in game.players:
-        game.update_player_countries(p)
-
-
 def show_player_countries(player, game):
-    print(f'Countries from {player}:')
+    helpers.show(f'Countries from {player}:')
     x = 0
     for c in game.get_countries(player):
         x += 1
-        print(f'{x} - {c}')
+        helpers.show(f'{x} - {c}')
 
 
 def show_player_countries_which_can_attack(player, game):
-    print(f'\nCountries from {player} that can attack:')
+    helpers.show(f'\nCountries from {player} that can attack:')
     x = 0
-    for c in game.get_countries(player, True):
+    for c in game.get_countries_able_to_attack(player):
         x += 1
-        print(f'{x} - {c}')
+        helpers.show(f'{x} - {c}')
+
+
+def computer_round(player, game, phase):
+    """
+    The computer plays one phase for a player, showing what it does.
+    """
+    bot = computer_players[player]
+
+    # A player who lost every country has nothing to play, nor anywhere to deploy
+    if not player.countries:
+        helpers.show(f'{player.name} has no countries left.')
+        return
+
+    game_engine = engine.Engine(game, phase=phase, single_phase=True, multi_hop_relocation=multi_hop_relocation)
+
+    while game_engine.phase == phase:
+        action = bot.choose_action(game_engine)
+        battle = game_engine.apply(action)
+        if battle:
+            helpers.show(f'{player.name}: {battle}')
+        else:
+            helpers.show(f'{player.name}: {game_engine.describe(action)}')
+
+    # Speed changes from run to run, it's not shown when the game is meant to be replayed
+    if not bot.max_iterations:
+        helpers.show(f'{bot} searched {bot.iterations_per_second:,.0f} iterations/sec so far.')
 
 
 def attack_round(player, game):
 
-    print(f'Current player: {game.current_player}')
+    helpers.show(f'Current player: {game.current_player}')
+
+    if player in computer_players:
+        computer_round(player, game, engine.PHASE_ATTACK)
+        return
 
     finished_attacking = False
     while not finished_attacking:
         show_player_countries_which_can_attack(player, game)
 
-        player_cs = game.get_countries(player, True)
+        # Possible attacks by attacking country
+        attacks = engine.attack_moves(game, player).by_source()
+        player_cs = [game.countries_by_id[country_id] for country_id in attacks]
 
         if len(player_cs) > 0:
 
@@ -261,18 +321,15 @@ def attack_round(player, game):
 
                 attacker_c = player_cs[attacking_country_no - 1]
 
-                enemy_countries = []
-                for c in attacker_c.neighbours:
-                    if c.player != attacker_c.player:
-                        enemy_countries.append(c)
+                enemy_countries = [game.countries_by_id[country_id] for country_id, troops in attacks[attacker_c.id]]
 
                 if len(enemy_countries) > 0:
 
-                    print(f'Country {attacker_c.name} can attack these enemy countries:')
+                    helpers.show(f'Country {attacker_c.name} can attack these enemy countries:')
                     x = 0
                     for n in enemy_countries:
                         x += 1
-                        print(f'{x} - {n}')
+                        helpers.show(f'{x} - {n}')
 
                     attacked_country_no = helpers.prompt_int_range(
                         'Which country do you wish to attack? (Enter number) ',
@@ -281,53 +338,55 @@ def attack_round(player, game):
                         len(enemy_countries))
                     attacked_country_no -= 1
                     attacked_c = enemy_countries[attacked_country_no]
-
-                    max_attack_troops = attacker_c.armies - 1
-
                     # You cannot attack with more than three armies no matter how many the country has.
-                    if max_attack_troops > 3:
-                        max_attack_troops = 3
+                    max_attack_troops = attacks[attacker_c.id][attacked_country_no][1]
 
-                    if max_attack_troops == 1:
-                        print('Only one army available to attack.')
-                        troops_no = 1
+                    assault = odds.assault_odds(attacker_c.armies, attacked_c.armies)
+                    helpers.show(f'Chances of conquering {attacked_c.name} attacking until the end:'
+                          f' {assault.win_probability:.0%}')
+
+                    if attacker_c.armies > 2 and \
+                            helpers.read_input('Attack until the end? [y/N] ', ('y', 'n')).lower() == 'y':
+                        blitz = game.blitz(attacker_c, attacked_c)
+                        helpers.show(f"\nAssault results:\n{blitz}")
+                        helpers.show(f'\nStatus after assault:\n - Attacker {attacker_c}\n - Defender {attacked_c}')
                     else:
-                        troops_no = helpers.prompt_int_range(
-                            f'How many troops are attacking? (1 to {max_attack_troops}) ',None, 1, max_attack_troops)
+                        if max_attack_troops == 1:
+                            helpers.show('Only one army available to attack.')
+                            troops_no = 1
+                        else:
+                            troops_no = helpers.prompt_int_range(
+                                f'How many troops are attacking? (1 to {max_attack_troops}) ',None, 1, max_attack_troops)
 
-                    # game.Attack(attacker_c, attacked_c, dices_attacker, dices_defender)
-                    battle = game.call_attack(attacker_c, attacked_c, troops_no)
+                        # game.Attack(attacker_c, attacked_c, dices_attacker, dices_defender)
+                        battle = game.call_attack(attacker_c, attacked_c, troops_no)
 
-                    print(f"\nFollowing battle will take place:\n{battle}")
+                        helpers.show(f"\nFollowing battle will take place:\n{battle}")
 
-                    input(f'\n{player.name}, press any key to throw {troops_no} dices...')
-                    battle.roll_dices_attacker()
-                    print(f'{player.name} got dices {battle.dices_attacker}')
+                        helpers.read_input(f'\n{player.name}, press any key to throw {troops_no} dices...')
+                        battle.roll_dices_attacker()
+                        helpers.show(f'{player.name} got dices {battle.dices_attacker}')
 
-                    attacker_loses_before_fighting = True
-                    for dice in battle.dices_attacker:
-                        if dice > 1:
-                            attacker_loses_before_fighting = False
+                        attacker_loses_before_fighting = True
+                        for dice in battle.dices_attacker:
+                            if dice > 1:
+                                attacker_loses_before_fighting = False
 
-                    if attacker_loses_before_fighting:
-                        print(f'Ones means that the attacker cannot win, defender does not need to throw dices.')
-                        battle.roll_dices_defender() # Because the object still needs dices to calculate
-                    else:
-                        input(f'\n{attacked_c.player.name}, press any key to throw {attacked_c.armies} dices...')
-                        battle.roll_dices_defender()
-                        print(f'{attacked_c.player.name} got dices {battle.dices_defender}')
+                        if attacker_loses_before_fighting:
+                            helpers.show(f'Ones means that the attacker cannot win, defender does not need to throw dices.')
+                            battle.roll_dices_defender() # Because the object still needs dices to calculate
+                        else:
+                            helpers.read_input(f'\n{attacked_c.player.name}, press any key to throw {attacked_c.armies} dices...')
+                            battle.roll_dices_defender()
+                            helpers.show(f'{attacked_c.player.name} got dices {battle.dices_defender}')
 
-                    battle.calculate()
+                        battle.calculate()
 
-                    if battle.defender_lost_country:
-                        game.update_player_countries(battle.defending_player)
-                        game.update_player_countries(battle.attacking_player)
-
-                    print(f"\nBattle results:\n{battle}")
-                    print(f'\nStatus after battle:\n - Attacker {attacker_c}\n - Defender {attacked_c}')
+                        helpers.show(f"\nBattle results:\n{battle}")
+                        helpers.show(f'\nStatus after battle:\n - Attacker {attacker_c}\n - Defender {attacked_c}')
 
                 else:
-                    print(f'{attacker_c} has no enemy neighbour countries.')
+                    helpers.show(f'{attacker_c} has no enemy neighbour countries.')
 
                 helpers.press_any_key()
 
@@ -335,16 +394,21 @@ def attack_round(player, game):
                 finished_attacking = True
 
         else:
-            print(f'{player.name} has no countries with more than one army that could attack.')
+            helpers.show(f'{player.name} has no countries with more than one army and enemy neighbours to attack.')
             finished_attacking = True
 
             helpers.press_any_key()
 
 
 def movement_round(player, game):
-    print(f'\nMovement round from {player.name}\n')
+    helpers.show(f'\nMovement round from {player.name}\n')
+
+    helpers.show(f'Current player: {game.current_player}')
 
-    print(f'Current player: {game.current_player}')
+    if player in computer_players:
+        computer_round(player, game, engine.PHASE_RELOCATE)
+        game.advance_next_player()
+        return
 
     countries_relocate = game.get_countries(player, True)
 
@@ -352,19 +416,19 @@ def movement_round(player, game):
 
     while not done_moving:
 
-        if len(countries_relocate) > 0:
+        # Possible relocations by country troops move from
+        relocations = engine.relocation_moves(game, player, countries_relocate, multi_hop_relocation).by_source()
 
-            cs_relocate_this_single_time = []
-            for c in countries_relocate:
-                if c.armies > 1:
-                    cs_relocate_this_single_time.append(c)
+        if len(relocations) > 0:
 
-            print(f'Countries that can move troops this round'
+            cs_relocate_this_single_time = [game.countries_by_id[country_id] for country_id in relocations]
+
+            helpers.show(f'Countries that can move troops this round'
                   f' (does not change if other countries have more than one army after relocating once):')
 
             # Determine country from which troops are moving
             for nr,c in enumerate(cs_relocate_this_single_time):
-                print(f'{nr+1} - {c}')
+                helpers.show(f'{nr+1} - {c}')
             relocating_country_no = helpers.prompt_int_range(
                 'Please enter the number of the country to relocate troops (or 0 to pass): ',
                 None, 0, len(cs_relocate_this_single_time))
@@ -375,7 +439,7 @@ def movement_round(player, game):
 
                 # Determine number of troops to move
                 if relocating_country.armies == 2:
-                    print('You can only move one army from this country.')
+                    helpers.show('You can only move one army from this country.')
                     troops_no = 1
                 else:
                     troops_min = 1
@@ -384,33 +448,31 @@ def movement_round(player, game):
                         f'Please enter the number of troops you want to move ({troops_min}-{troops_max}): ',
                         None, troops_min, troops_max)
 
-                # Determine target country
-                possible_target_countries = []
-                for c in relocating_country.neighbours:
-                    if c.player == player:
-                        possible_target_countries.append(c)
-
-                if len(possible_target_countries) > 0:
-                    for nr, c in enumerate(possible_target_countries):
-                        print(f'{nr + 1} - {c}')
-                    target_country_no = helpers.prompt_int_range(
-                        'Please enter the number of target the country (or 0 to pass): ',
-                        None, 0, len(possible_target_countries))
+                # Determine target country, with multi-hop relocation any country connected through the
+                # player's own countries
+                possible_target_countries = [game.countries_by_id[country_id]
+                                             for country_id, armies in relocations[relocating_country.id]]
+
+                for nr, c in enumerate(possible_target_countries):
+                    helpers.show(f'{nr + 1} - {c}')
+                target_country_no = helpers.prompt_int_range(
+                    'Please enter the number of target the country (or 0 to pass): ',
+                    None, 0, len(possible_target_countries))
+
+                if target_country_no != 0:
                     target_country = possible_target_countries[target_country_no - 1]
 
                     relocating_country.armies -= troops_no
                     target_country.armies += troops_no
-                    print(
+                    helpers.show(
                         f'\nMoved armies in following countries:\n - From: {relocating_country}\n - To: {target_country}')
-                else:
-                    print(f'No possible target countries to move!')
 
             else:
-                print(f'{player} has finished moving.')
+                helpers.show(f'{player} has finished moving.')
                 done_moving = True
 
         else:
-            print(f'Player has no countries with more than one troop that could relocate.')
+            helpers.show(f'Player has no countries with more than one troop that could relocate.')
             done_moving = True
 
     game.advance_next_player()
@@ -418,17 +480,24 @@ def movement_round(player, game):
 
 def deployment_round(player, game):
 
-    print(f"\n{player.name}'s deployment of new armies\n")
+    helpers.show(f"\n{player.name}'s deployment of new armies\n")
 
-    print(f'Current player: {game.current_player}')
+    helpers.show(f'Current player: {game.current_player}')
+
+    if player in computer_players:
+        computer_round(player, game, engine.PHASE_DEPLOY)
+        game.advance_next_player()
+        return
 
     armies_no = game.get_amount_armies_per_turn(player)
-    p_countries = game.get_countries(player)
+    deployments = engine.deployment_moves(game, player, armies_no)
+    p_countries = [game.countries_by_id[country_id] for country_id in deployments.country_to]
     p_countries_no = len(p_countries)
-    print(f'{player.name} has {p_countries_no} and thus gets {armies_no} to deploy into the map this round.')
+    helpers.show(f'{player.name} has {p_countries_no} and thus gets {armies_no} to deploy into the map this round.')
 
-    while armies_no > 0:
-        print(f"{player.name}'s countries:")
+    # A player who lost every country has nowhere to deploy
+    while armies_no > 0 and p_countries:
+        helpers.show(f"{player.name}'s countries:")
         country = enumerate_countries_and_pick_one(p_countries)
         if country:
             armies_to_deploy = helpers.prompt_int_range(
@@ -437,7 +506,7 @@ def deployment_round(player, game):
             country.armies += armies_to_deploy
             armies_no -= armies_to_deploy
 
-    print(f'{player.name} has placed all available armies on the map.')
+    helpers.show(f'{player.name} has placed all available armies on the map.')
     show_player_countries(player, game)
 
     game.advance_next_player()
@@ -446,22 +515,21 @@ def deployment_round(player, game):
 def check_if_winner(game):
     winner_player = game.check_if_winner()
     if winner_player:
-        show_winner_banner(winner_player)
+        show_winner_banner(winner_player, game.winning_objective)
         return True
     else:
         return False
 
 
-def show_winner_banner(player):
-    print('\n####################################################')
-    print(f'\nPLAYER {player} WINS!\n\nOne of the following objectives was fulfilled:')
-    for o in player.objectives:
-        print(f' - {o}')
-    print('\n####################################################\n')
+def show_winner_banner(player, objective):
+    helpers.show('\n####################################################')
+    helpers.show(f'\nPLAYER {player} WINS!\n\nFollowing objective was fulfilled:')
+    helpers.show(f' - {objective}')
+    helpers.show('\n####################################################\n')
 
 
 def ask_keep_playing():
-    choice = input('\nDo you want to keep playing? [Y/n] ')
+    choice = helpers.read_input('\nDo you want to keep playing? [Y/n] ', ('y', 'n'))
     if choice.lower() == 'n':
         return False
     else:
@@ -474,92 +542,37 @@ def show_countries_and_players(game):
     :return:
     Nothing.
     """
-    print('\nCurrent status of board\n')
-    print('Countries:')
+    helpers.show('\nCurrent status of board\n')
+    helpers.show('Countries:')
     for c in game.countries:
-        print(f' - {c}')
+        helpers.show(f' - {c}')
 
-    print('\nPlayers:')
+    helpers.show('\nPlayers:')
     for p in game.players:
-        print(f' - {p}')
+        helpers.show(f' - {p}')
 
 
-def initialize_objectives(game):
+def timed_phase(game, name):
     """
-    Creates the game's objectives. These are hardcoded.
+    Times a phase of a turn when the game is being profiled, does nothing otherwise:
 
+        with timed_phase(game, 'attack round'):
+            ...
     """
-    objectives = []
-
-    # We create one annihilation objective per player. In the original game there's one card
-    # per player, and if not possible (because player is not player or one is that player) then
-    # the next person in the round should be taken as objective, but it's more logical in a computer
-    # game to just make one objective for each player.
-    for pl in game.players:
-        annhil_objective = risk.AnnihilationObjetive(pl)
-        objectives.append(annhil_objective)
-
-    obj1 = risk.ConquestObjetive([game.continents[0]], None) # One continent
-    obj2 = risk.ConquestObjetive([game.continents[1]],
-                                 [(game.continents[0], 1)]) # One continent plus one country
-    obj3 = risk.ConquestObjetive(game.continents, None) # Person getting this one is doomed
-    obj4 = risk.ConquestObjetive(None,
-                                 [(game.continents[0], 3), (game.continents[1], 3)])
-
-    for o in [obj1, obj2, obj3, obj4]:
-        objectives.append(o)
-
-    objectives_deck_deal = objectives.copy()
-    random.shuffle(objectives_deck_deal)
-    for p in game.players:
-        p.add_objective(objectives_deck_deal.pop())
-
-    for p in game.players:
-        print(f"{p.name} has following objectives:")
-        for o in p.objectives:
-            print(f" - {o}")
-
-    def country_card_after_attacking(game, player):
-        print(f"{player.name} has conquered at least one country, she/he receives a country card.")
-        game.give_country_card_to_player(player)
-
-    def trad_each_country_card(game, player):
+    if game.profiler is None:
+        return contextlib.nullcontext()
+    return game.profiler.span(name)
 
-        finished_trading = False
-        while not finished_trading:
 
-            non_used_cards = []
-
-            print(f"Checking {player.name}'s country cards")
-
-            for card in player.cards:
-                if not card.already_traded and (card.country in player.countries):
-                    non_used_cards.append(card)
-
-            if len(non_used_cards) > 0:
-                print(f"Following cards can be traded:")
-
-                for num, c in enumerate(non_used_cards):
-                    print(f" {num} - {c}")
-
-                    card_no = helpers.prompt_int_range(
-                        f'Please choose a card to be claimed (1-{len(non_used_cards)} or 0 to skip): ',
-                        'Wrong input!',
-                        0, len(non_used_cards))
-
-                    if card_no > 0:
-                        selected_card = non_used_cards[card_no-1]
-                        print(f"Trading {selected_card}")
-                        game.trade_card_posessed_country(selected_card)
-                    else:
-                        finished_trading = True
-
-            else:
-                print(f"No individual cards to trade for armies.")
-                break
-
-    def trade_country_card_set(game, player):
-        pass
+def save_profile(game):
+    if game.profiler is None:
+        return
+    if profile_file:
+        game.profiler.save_json(profile_file)
+        helpers.show(f'Profiling stats saved to {profile_file}')
+    if trace_file:
+        game.profiler.save_chrome_trace(trace_file)
+        helpers.show(f'Profiling trace saved to {trace_file}')
 
 
 def play():
@@ -572,7 +585,10 @@ def play():
     """
 
     # Initialize a game object
-    game = risk.Game()
+    game = risk.Game(seed=seed)
+    computer_players.clear()
+    if profile_file or trace_file:
+        game.enable_profiling()
 
     # Flag to interrupt the game if desired
     keep_playing = True
@@ -580,16 +596,11 @@ def play():
     # We'll use winner as an identifier to finish the game
     winner = None
 
-    # We shuffle colors once before playing, then they get assigned to players in create_players()
-    random.shuffle(colors)
-
     show_banner()
 
     # Loading map data from files
-    print('Loading map data from files...')
-    game.load_map_from_file()
-
-    game.load_cards()
+    helpers.show('Loading map data from files...')
+    game.load_map_bundle()
 
     game.initialize_countries_deck()
 
@@ -603,24 +614,16 @@ def play():
 
     demo_deal_initial_countries(game)
     # Raffle for the rest of remaining cards if needed
-    demo_deal_rest_countries_dice(game)
+    gamesetup.demo_deal_rest_countries_dice(game)
 
     game.load_world_domination_objective(0.6)
-    print(f'\nWorld domination set to {game.world_objective.amount_countries}.\n')
+    helpers.show(f'\nWorld domination set to {game.world_objective.amount_countries}.\n')
 
-    initialize_objectives(game)
+    gamesetup.initialize_objectives(game)
 
     game.advance_next_player()
 
-    game.add_troops_too_all_countries(1)
-    for n in (2, 1):
-        for p in game.players:
-            # print(f'{p} adding now {n} armies.')
-            for x in range(n):
-                p_cs = game.get_countries(p)
-                c = p_cs[random.randint(0, len(p_cs) - 1)]
-                # print(f'Adding randomly one army to: {c}')
-                c.armies += 1
+    gamesetup.place_initial_armies(game)
 
     show_countries_and_players(game)
 
@@ -628,12 +631,13 @@ def play():
 
     while keep_playing:
 
-        print('\n------------------------------ 1. ATTACK AND RELOCATION ------------------------------\n')
+        helpers.show('\n------------------------------ 1. ATTACK AND RELOCATION ------------------------------\n')
         for p in game.players:
 
             if keep_playing:
-                print(f'{p.name} plays!\n\nATTACK ROUND\n')
-                attack_round(p, game)
+                helpers.show(f'{p.name} plays!\n\nATTACK ROUND\n')
+                with timed_phase(game, 'attack round'):
+                    attack_round(p, game)
 
                 if check_if_winner(game):
                     keep_playing = False
@@ -645,9 +649,10 @@ def play():
                 break
 
             if keep_playing:
-                print(f'\n{p.name} has finished attacking.\n\nRELOCATION ROUND\n')
-                movement_round(p, game)
-                print(f'\n{p.name} has finished relocating troops.')
+                helpers.show(f'\n{p.name} has finished attacking.\n\nRELOCATION ROUND\n')
+                with timed_phase(game, 'relocation round'):
+                    movement_round(p, game)
+                helpers.show(f'\n{p.name} has finished relocating troops.')
                 if check_if_winner(game):
                     keep_playing = False
                     break
@@ -658,18 +663,57 @@ def play():
                 break
 
         if keep_playing:
-            print('\n------------------------------ 2. DEPLOYMENT ROUND ------------------------------\n')
+            helpers.show('\n------------------------------ 2. DEPLOYMENT ROUND ------------------------------\n')
             for p in game.players:
 
-                print(f'{p.name} plays!\n\nTroop deployment round\n')
-                deployment_round(p, game)
-                print(f'\n{p.name} has finished deploying troops.')
+                helpers.show(f'{p.name} plays!\n\nTroop deployment round\n')
+                with timed_phase(game, 'deployment round'):
+                    deployment_round(p, game)
+                helpers.show(f'\n{p.name} has finished deploying troops.')
 
                 if not ask_keep_playing():
                     keep_playing = False
                     break
 
+    save_profile(game)
+
 
 # Press the green button in the gutter to run the script.
 if __name__ == '__main__':
-    play()
+    parser = argparse.ArgumentParser(description='Plays a game in the terminal.')
+    parser.add_argument('--profile', default=None, help='JSON file to save timings of the game to.')
+    parser.add_argument('--trace', default=None, help='Chrome trace file to save the calls of the game to.')
+    parser.add_argument('--multi-hop', action='store_true',
+                        help="Troops can be relocated to any country connected through the player's own countries.")
+    parser.add_argument('--seed', type=int, default=None, help='Seed for dices and shuffles.')
+    parser.add_argument('--record', default=None, help='JSON file to save the answers given to, to replay them.')
+    parser.add_argument('--replay', default=None, help='JSON file with answers saved with --record, played headless.')
+    args = parser.parse_args()
+    multi_hop_relocation = args.multi_hop
+    profile_file = args.profile
+    trace_file = args.trace
+    seed = args.seed
+
+    if args.replay:
+        with open(args.replay) as transcript_file:
+            transcript = json.load(transcript_file)
+        seed = transcript['seed']
+        multi_hop_relocation = transcript['multi_hop_relocation']
+        computer_iterations = transcript.get('computer_iterations', computer_iterations)
+        helpers.set_io(helpers.ScriptedIO(transcript['answers']))
+        play()
+        print(f'Replayed {len(transcript["answers"])} answers.')
+    elif args.record:
+        # A recording needs a seed to replay the same dices
+        if seed is None:
+            seed = random.randrange(2 ** 32)
+        answers = []
+        helpers.set_io(helpers.ConsoleIO(answers))
+        try:
+            play()
+        finally:
+            with open(args.record, 'w') as transcript_file:
+                json.dump({'seed': seed, 'multi_hop_relocation': multi_hop_relocation,
+                           'computer_iterations': computer_iterations, 'answers': answers}, transcript_file)
+    else:
+        play()
@@ -0,0 +1,305 @@
+"""
+Compiled map bundles: the map files of game_data/ (countries, continents, neighbours and card figures)
+compiled into one binary file, loaded through a memory map instead of being parsed line by line.
+
+The bundle remembers the size, modification time and hash of the files it was built from, and
+compiled_map() builds it again when any of them changed.
+
+Layout, all integers little-endian: a header (HEADER_FORMAT) followed by sections of int32 arrays
+and string tables, each starting at an offset multiple of 8, in the order of SECTIONS.
+A string table is an array of n + 1 offsets followed by the UTF-8 text of all strings.
+"""
+import hashlib
+import mmap
+import os
+import struct
+import sys
+
+import helpers
+
+MAGIC = b'GMAP'
+VERSION = 1
+
+# Magic, version, number of countries, continents, neighbour connections, figures and cards,
+# and a SHA-1 hash of the source files
+HEADER_FORMAT = struct.Struct('<4sIIIIII20s')
+
+# Per source file: size and modification time in nanoseconds
+SOURCE_STAMP_FORMAT = struct.Struct('<qq')
+
+SOURCE_KEYS = ['countries_file', 'countries_connections_file', 'continents_file', 'cards_file',
+               'country_figures_file']
+
+DEFAULT_SOURCES = {
+    'countries_file': 'game_data/countries.txt',
+    'countries_connections_file': 'game_data/country_connections.txt',
+    'continents_file': 'game_data/continents.txt',
+    'cards_file': 'game_data/card_figures.txt',
+    'country_figures_file': 'game_data/countries_figures.txt',
+}
+
+DEFAULT_BUNDLE_FILE = 'game_data/map.bundle'
+
+# Sections of the file, with the kind of data and the number of items (as header attribute names)
+SECTIONS = [
+    ('country_ids', 'ints', 'countries_no'),
+    ('country_continent', 'ints', 'countries_no'),
+    ('country_names', 'strings', 'countries_no'),
+    ('continent_ids', 'ints', 'continents_no'),
+    ('continent_bonus', 'ints', 'continents_no'),
+    ('continent_names', 'strings', 'continents_no'),
+    ('indptr', 'ints', 'indptr_no'),
+    ('indices', 'ints', 'connections_no'),
+    ('figure_names', 'strings', 'figures_no'),
+    ('card_country', 'ints', 'cards_no'),
+    ('card_figure', 'ints', 'cards_no'),
+]
+
+
+def _source_files(sources):
+    files = dict(DEFAULT_SOURCES)
+    files.update(sources or {})
+    return [files[key] for key in SOURCE_KEYS]
+
+
+def _stamps(files):
+    stamps = b''
+    for file in files:
+        stat = os.stat(file)
+        stamps += SOURCE_STAMP_FORMAT.pack(stat.st_size, stat.st_mtime_ns)
+    return stamps
+
+
+def _digest(files):
+    digest = hashlib.sha1()
+    for file in files:
+        with open(file, 'rb') as source_file:
+            digest.update(source_file.read())
+        digest.update(b'\0')
+    return digest.digest()
+
+
+def _pack_ints(values):
+    return struct.pack(f'<{len(values)}i', *values)
+
+
+def _pack_strings(strings):
+    encoded = [s.encode('utf-8') for s in strings]
+    offsets = [0]
+    for e in encoded:
+        offsets.append(offsets[-1] + len(e))
+    return _pack_ints(offsets) + b''.join(encoded)
+
+
+def _align(data):
+    return data + b'\0' * (-len(data) % 8)
+
+
+def build_bundle(bundle_file=DEFAULT_BUNDLE_FILE, sources=None):
+    """
+    Compiles the map files into a bundle.
+
+    :param bundle_file:
+    Path of the bundle, it gets overwritten.
+    :param sources:
+    A dictionary with the paths of the map files (keys as in DEFAULT_SOURCES), the defaults are used
+    for the missing ones.
+    """
+    countries_file, connections_file, continents_file, cards_file, country_figures_file = _source_files(sources)
+
+    continent_ids, continent_names, continent_bonus = [], [], []
+    for file_line in helpers.read_game_data_from_file(continents_file):
+        continent_id, continent_name, continent_army_bonus = file_line.split(';')
+        continent_ids.append(int(continent_id))
+        continent_names.append(continent_name)
+        continent_bonus.append(int(continent_army_bonus))
+    continent_position = {continent_id: i for i, continent_id in enumerate(continent_ids)}
+
+    country_ids, country_names, country_continent = [], [], []
+    for file_line in helpers.read_game_data_from_file(countries_file):
+        country_id, country_name, continent_id = file_line.split(';')
+        country_ids.append(int(country_id))
+        country_names.append(country_name)
+        country_continent.append(continent_position[int(continent_id)])
+    country_position = {country_id: i for i, country_id in enumerate(country_ids)}
+
+    # Neighbours in CSR form, keeping the order of the file for each country
+    neighbours = [[] for x in country_ids]
+    for file_line in helpers.read_game_data_from_file(connections_file):
+        country_id, neighbour_id = file_line.split(';')
+        neighbours[country_position[int(country_id)]].append(country_position[int(neighbour_id)])
+    indptr = [0]
+    indices = []
+    for country_neighbours in neighbours:
+        indices.extend(country_neighbours)
+        indptr.append(len(indices))
+
+    figure_position, figure_names = {}, []
+    for file_line in helpers.read_game_data_from_file(cards_file):
+        card_number, card_figure = file_line.split(';')
+        figure_position[int(card_number)] = len(figure_names)
+        figure_names.append(card_figure)
+
+    card_country, card_figure = [], []
+    for file_line in helpers.read_game_data_from_file(country_figures_file):
+        country_number, card_number = file_line.split(';')
+        card_country.append(country_position[int(country_number)])
+        card_figure.append(figure_position[int(card_number)])
+
+    data = {
+        'country_ids': country_ids, 'country_continent': country_continent, 'country_names': country_names,
+        'continent_ids': continent_ids, 'continent_bonus': continent_bonus, 'continent_names': continent_names,
+        'indptr': indptr, 'indices': indices, 'figure_names': figure_names,
+        'card_country': card_country, 'card_figure': card_figure,
+    }
+
+    files = [countries_file, connections_file, continents_file, cards_file, country_figures_file]
+    header = HEADER_FORMAT.pack(MAGIC, VERSION, len(country_ids), len(continent_ids), len(indices),
+                                len(figure_names), len(card_country), _digest(files))
+    sections = [_align(header + _stamps(files))]
+    for name, kind, count in SECTIONS:
+        if kind == 'ints':
+            sections.append(_align(_pack_ints(data[name])))
+        else:
+            sections.append(_align(_pack_strings(data[name])))
+
+    # Written aside and then moved, so a bundle being read is never half written
+    temporary_file = f'{bundle_file}.tmp{os.getpid()}'
+    with open(temporary_file, 'wb') as output_file:
+        output_file.write(b''.join(sections))
+    os.replace(temporary_file, bundle_file)
+
+
+class MapBundle:
+    """
+    A bundle loaded through a memory map. Integer sections are memoryviews over the file,
+    nothing is copied until used.
+    """
+
+    def __init__(self, bundle_file=None, buffer=None):
+        """
+        :param bundle_file:
+        The file of the bundle.
+        :param buffer:
+        Instead of a file, a bundle already in memory, like the buffer of a multiprocessing.shared_memory
+        block where the bytes of another bundle were copied.
+        """
+        self.file = bundle_file
+        self.mmap = None
+        if buffer is None:
+            with open(bundle_file, 'rb') as bundle_fp:
+                self.mmap = mmap.mmap(bundle_fp.fileno(), 0, access=mmap.ACCESS_READ)
+            buffer = self.mmap
+        self.buffer = memoryview(buffer)
+
+        (magic, version, self.countries_no, self.continents_no, self.connections_no, self.figures_no,
+         self.cards_no, self.digest) = HEADER_FORMAT.unpack_from(self.buffer)
+        if magic != MAGIC or version != VERSION:
+            raise Exception(f'{bundle_file or "The buffer"} is not a map bundle this version can read.')
+        self.indptr_no = self.countries_no + 1
+
+        offset = HEADER_FORMAT.size
+        self.stamps = bytes(self.buffer[offset:offset + SOURCE_STAMP_FORMAT.size * len(SOURCE_KEYS)])
+        offset += len(self.stamps)
+        offset += -offset % 8
+
+        # Offsets of each section, to be used with numpy.frombuffer for instance
+        self.offsets = {}
+        for name, kind, count in SECTIONS:
+            count = getattr(self, count)
+            self.offsets[name] = offset
+            if kind == 'ints':
+                setattr(self, name, self._ints(offset, count))
+                offset += 4 * count
+            else:
+                offsets = self._ints(offset, count + 1)
+                offset += 4 * (count + 1)
+                setattr(self, name, (offsets, offset))
+                offset += offsets[-1]
+            offset += -offset % 8
+
+    def __str__(self):
+        return f'Map bundle {self.file} ({self.countries_no} countries, {self.continents_no} continents)'
+
+    def _ints(self, offset, count):
+        ints = self.buffer[offset:offset + 4 * count].cast('i')
+        if sys.byteorder != 'little':
+            ints = [int.from_bytes(self.buffer[offset + 4 * x:offset + 4 * x + 4], 'little', signed=True)
+                    for x in range(count)]
+        return ints
+
+    def string(self, table, position):
+        """
+        One string of a string table, e.g. bundle.string('country_names', 3).
+        """
+        offsets, start = getattr(self, table)
+        return bytes(self.buffer[start + offsets[position]:start + offsets[position + 1]]).decode('utf-8')
+
+    def strings(self, table):
+        offsets, start = getattr(self, table)
+        return [bytes(self.buffer[start + offsets[x]:start + offsets[x + 1]]).decode('utf-8')
+                for x in range(len(offsets) - 1)]
+
+    def neighbours(self, position):
+        return self.indices[self.indptr[position]:self.indptr[position + 1]]
+
+
+def is_stale(bundle_file=DEFAULT_BUNDLE_FILE, sources=None):
+    """
+    Whether a bundle is missing or was built from files that changed since.
+    Sizes and modification times are checked first, the hash only when those differ. If the hash
+    still matches, the bundle gets the new sizes and times.
+    """
+    if not os.path.exists(bundle_file):
+        return True
+
+    files = _source_files(sources)
+    try:
+        with open(bundle_file, 'rb') as bundle_fp:
+            header = bundle_fp.read(HEADER_FORMAT.size + SOURCE_STAMP_FORMAT.size * len(files))
+        magic, version, *counts, digest = HEADER_FORMAT.unpack_from(header)
+    except struct.error:
+        return True
+
+    if magic != MAGIC or version != VERSION:
+        return True
+    stamps = _stamps(files)
+    if header[HEADER_FORMAT.size:] == stamps:
+        return False
+    if digest != _digest(files):
+        return True
+
+    # Same content with new times (e.g. after a checkout), the stamps are updated so that next
+    # checks don't hash the files again
+    try:
+        with open(bundle_file, 'r+b') as bundle_fp:
+            bundle_fp.seek(HEADER_FORMAT.size)
+            bundle_fp.write(stamps)
+    except OSError:
+        pass
+    return False
+
+
+# Bundles already loaded by this process, by path
+_loaded_bundles = {}
+
+
+def compiled_map(bundle_file=DEFAULT_BUNDLE_FILE, sources=None):
+    """
+    Returns the bundle for a set of map files, building it first if stale. Bundles are loaded
+    only once per process, and loaded again only if rebuilt.
+
+    :return:
+    An object of the class MapBundle.
+    """
+    if is_stale(bundle_file, sources):
+        build_bundle(bundle_file, sources)
+        _loaded_bundles.pop(bundle_file, None)
+
+    stat = os.stat(bundle_file)
+    key = (stat.st_size, stat.st_mtime_ns)
+    loaded = _loaded_bundles.get(bundle_file)
+    if loaded is None or loaded[0] != key:
+        loaded = (key, MapBundle(bundle_file))
+        _loaded_bundles[bundle_file] = loaded
+    return loaded[1]
@@ -0,0 +1,143 @@
+"""
+Generates synthetic maps of any size, written in the same formats as the files in game_data/, to see
+how the game behaves with more than a handful of countries.
+
+Countries are laid out on a grid, each one bordering the ones next to it and one of the diagonals of
+every square of the grid, picked at random. That gives a planar map (borders never cross) where
+countries have between 2 and 8 neighbours, like on a real map. Continents are rectangular blocks of
+the grid.
+
+Run from the repository's root folder:
+
+    python mapgen.py maps/10k --countries 10000 --seed 1
+"""
+import argparse
+import math
+import os
+import random
+
+import mapbundle
+
+# Continents smaller than this are merged with the previous one, objectives need a few countries per continent
+MIN_CONTINENT_SIZE = 3
+
+CARD_FIGURES = ['Cannons', 'Balloon', 'Galleon']
+
+
+def generate_map(countries_no, continents_no=None, seed=None):
+    """
+    Generates a map.
+
+    :param countries_no:
+    Number of countries, at least 2 * MIN_CONTINENT_SIZE.
+    :param continents_no:
+    Approximate number of continents, by default one every 40 countries. Never less than 2.
+    :param seed:
+    Seed for the diagonals, the same seed gives the same map.
+    :return:
+    A tuple with three lists: countries as (ID, name, continent ID), connections as (country ID,
+    neighbour ID) in both directions, and continents as (ID, name, army bonus).
+    """
+    if countries_no < 2 * MIN_CONTINENT_SIZE:
+        raise Exception(f'A map needs at least {2 * MIN_CONTINENT_SIZE} countries.')
+    if continents_no is None:
+        continents_no = countries_no // 40
+    continents_no = max(2, min(continents_no, countries_no // MIN_CONTINENT_SIZE))
+
+    rng = random.Random(seed)
+    width = math.ceil(math.sqrt(countries_no))
+    height = math.ceil(countries_no / width)
+
+    # Blocks of the grid for continents, as square as the number of continents allows
+    blocks_across = max(1, round(math.sqrt(continents_no * width / height)))
+    blocks_down = max(1, math.ceil(continents_no / blocks_across))
+    block_width = math.ceil(width / blocks_across)
+    block_height = math.ceil(height / blocks_down)
+
+    block_countries = {}
+    for i in range(countries_no):
+        row, column = divmod(i, width)
+        block_countries.setdefault((row // block_height, column // block_width), []).append(i)
+
+    # Small blocks (e.g. at the end of an unfinished last row) go with the previous one, as long as
+    # there are two continents already
+    continent_of = [0] * countries_no
+    continent_sizes = []
+    for block in sorted(block_countries):
+        countries_in_block = block_countries[block]
+        if len(countries_in_block) < MIN_CONTINENT_SIZE and len(continent_sizes) >= 2:
+            continent_sizes[-1] += len(countries_in_block)
+        else:
+            continent_sizes.append(len(countries_in_block))
+        for i in countries_in_block:
+            continent_of[i] = len(continent_sizes)
+
+    connections = []
+    for i in range(countries_no):
+        row, column = divmod(i, width)
+        right = i + 1 if column + 1 < width and i + 1 < countries_no else None
+        down = i + width if i + width < countries_no else None
+        if right is not None:
+            connections.append((i, right))
+        if down is not None:
+            connections.append((i, down))
+        if right is not None and down is not None and down + 1 < countries_no:
+            if rng.random() < 0.5:
+                connections.append((i, down + 1))
+            else:
+                connections.append((right, down))
+
+    countries = [(i + 1, f'Country {i + 1}', continent_of[i]) for i in range(countries_no)]
+    connections = sorted([(a + 1, b + 1) for a, b in connections] + [(b + 1, a + 1) for a, b in connections])
+    continents = [(x + 1, f'Continent {x + 1}', max(1, size // 2)) for x, size in enumerate(continent_sizes)]
+    return countries, connections, continents
+
+
+def map_sources(directory):
+    """
+    The paths of the map files in a directory, as the sources of mapbundle.
+    """
+    return {key: os.path.join(directory, os.path.basename(path)) for key, path in mapbundle.DEFAULT_SOURCES.items()}
+
+
+def write_map(directory, countries_no, continents_no=None, seed=None):
+    """
+    Generates a map and writes it to a directory, with the same file names as in game_data/.
+    Countries get their card figures in turns.
+
+    :return:
+    The paths of the files written, as returned by map_sources().
+    """
+    countries, connections, continents = generate_map(countries_no, continents_no, seed)
+    sources = map_sources(directory)
+    os.makedirs(directory, exist_ok=True)
+
+    def write_lines(key, lines):
+        with open(sources[key], 'w') as map_file:
+            map_file.writelines(';'.join(str(value) for value in line) + '\n' for line in lines)
+
+    write_lines('countries_file', countries)
+    write_lines('countries_connections_file', connections)
+    write_lines('continents_file', continents)
+    write_lines('cards_file', [(x + 1, figure) for x, figure in enumerate(CARD_FIGURES)])
+    write_lines('country_figures_file', [(country_id, x % len(CARD_FIGURES) + 1)
+                                         for x, (country_id, name, continent_id) in enumerate(countries)])
+    return sources
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description='Writes a synthetic map in the formats of game_data/.')
+    parser.add_argument('directory')
+    parser.add_argument('--countries', type=int, default=1000)
+    parser.add_argument('--continents', type=int, default=None, help='By default one every 40 countries.')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    sources = write_map(args.directory, args.countries, args.continents, args.seed)
+    bundle = mapbundle.compiled_map(os.path.join(args.directory, 'map.bundle'), sources)
+    print(f'Wrote {bundle.countries_no} countries, {bundle.continents_no} continents and '
+          f'{bundle.connections_no // 2} borders to {args.directory}')
+
+
+if __name__ == '__main__':
+    main_cli()
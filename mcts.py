@@ -0,0 +1,294 @@
+"""
+Bot that picks each action with a Monte Carlo Tree Search, within a time budget per decision, or a
+number of iterations for the same choices every time with the same seed.
+
+The search is open loop: nodes are sequences of actions and the game is played again from the
+root in every iteration, with new dices (from the bot's own generator, the game's dices are left as
+they were). Each iteration goes down the tree choosing with UCT, adds
+one action, plays a quick rollout for a few turns and scores the result with the players' objectives.
+Everything is undone through the game's journal before the next iteration.
+
+With a transposition table, positions reached in different ways (e.g. the same relocations in another
+order) share their evaluation: the rewards of the rollouts played from a position are averaged in the
+table by its Zobrist hash, and once there are enough of them they are used instead of more rollouts.
+
+Run from the repository's root folder to play games of this bot against random bots:
+
+    python mcts.py --games 10 --budget 0.1
+    python mcts.py --games 10 --budget 0.1 --table-size 65536
+"""
+import argparse
+import math
+import random
+import time
+
+import engine
+import bots
+import dice
+import zobrist
+
+
+class Node:
+    """
+    One action in the search tree, with the rewards collected by every player after playing it.
+    """
+    __slots__ = ('children', 'visits', 'rewards')
+
+    def __init__(self, players_no):
+        self.children = {}
+        self.visits = 0
+        self.rewards = [0.0] * players_no
+
+
+def score(game):
+    """
+    Reward of each player for the state of a game: the winner gets everything, otherwise rewards
+    are split according to how close each player is to any of her/his objectives.
+
+    :return:
+    A list of floats, one per player, that add up to 1.
+    """
+    winner = game.check_if_winner()
+    if winner:
+        return [1.0 if p is winner else 0.0 for p in game.players]
+
+    progress = [max(o.progress(p) for o in p.objectives) if len(p.countries) > 0 else 0.0 for p in game.players]
+    total = sum(progress)
+    return [x / total for x in progress]
+
+
+def rollout_action(e, rng):
+    """
+    A quick policy for rollouts, without going through every legal action: attacks with the most troops
+    when having more armies than the neighbour, skips relocations and deploys everything into one country.
+    """
+    player = e.current_player
+
+    if e.phase == engine.PHASE_ATTACK:
+        moves = engine.attack_moves(e.game, player)
+        countries = e.game.countries_by_id
+        candidates = [x for x, (country_from, country_to) in enumerate(zip(moves.country_from, moves.country_to))
+                      if countries[country_from].armies > countries[country_to].armies]
+        if candidates and rng.random() > 0.1:
+            x = rng.choice(candidates)
+            return moves.action(x, moves.max_armies[x])
+        return engine.END_PHASE_ACTION
+
+    elif e.phase == engine.PHASE_DEPLOY:
+        c = rng.choice(list(player.countries))
+        return engine.deploy(c.id, e.armies_to_deploy)
+
+    return engine.END_PHASE_ACTION
+
+
+class MCTSBot:
+    """
+    Plays any phase of the game searching for the best action for a while.
+    """
+
+    def __init__(self, time_budget=1.0, seed=None, exploration=1.4, rollout_turns=2, transpositions=None,
+                 table_rollouts=4, max_iterations=None):
+        """
+        :param time_budget:
+        Seconds to search for each decision.
+        :param max_iterations:
+        If given, iterations searched for each decision instead of the time budget, so that with a seed
+        the bot makes the same choices however fast the computer is.
+        :param seed:
+        Seed for the random choices of the search.
+        :param exploration:
+        Constant of the UCT formula, higher values try less visited actions more often.
+        :param rollout_turns:
+        Turns played by each rollout before scoring, unless someone wins before.
+        :param transpositions:
+        A zobrist.TranspositionTable to share evaluations between positions reached in different ways,
+        or the number of entries of a new one. None to play a rollout in every iteration.
+        :param table_rollouts:
+        Rollouts averaged in the table for a position before its evaluation is used instead of a rollout.
+        """
+        self.time_budget = time_budget
+        self.max_iterations = max_iterations
+        self.random = random.Random(seed)
+        self.exploration = exploration
+        self.rollout_turns = rollout_turns
+        if isinstance(transpositions, int):
+            transpositions = zobrist.TranspositionTable(transpositions)
+        self.transpositions = transpositions
+        self.table_rollouts = table_rollouts
+
+        # Evaluations in the table are only valid for the game they were found in, with its objectives
+        self.table_game = None
+
+        # Statistics, to know how fast the search goes
+        self.decisions = 0
+        self.iterations = 0
+        self.search_seconds = 0.0
+        self.last_iterations = 0
+        self.last_iterations_per_second = 0.0
+
+    def __str__(self):
+        if self.max_iterations:
+            return f'MCTS bot ({self.max_iterations} iterations per decision)'
+        return f'MCTS bot ({self.time_budget}s per decision)'
+
+    @property
+    def iterations_per_second(self):
+        return self.iterations / self.search_seconds if self.search_seconds > 0 else 0.0
+
+    def choose_action(self, e):
+        actions = e.legal_actions()
+        if len(actions) == 1:
+            return actions[0]
+
+        game = e.game
+        own_journal = game.journal is None
+        if own_journal:
+            game.start_journal()
+
+        own_hashing = self.transpositions is not None and game.hash_keys is None
+        if own_hashing:
+            game.enable_hashing()
+        if self.transpositions is not None:
+            if self.table_game is not game:
+                self.transpositions.clear()
+                self.table_game = game
+            self.transpositions.new_search()
+
+        # The search plays beyond the current phase even if the engine only plays this one
+        single_phase = e.single_phase
+        e.single_phase = False
+        max_turns = e.max_turns
+        root_saved = e.save()
+
+        # Dices thrown while searching don't come from the game, so its dices stay the same whatever the search does
+        game_dice = game.dice
+        game.dice = dice.RandomDice(self.random.getrandbits(64))
+
+        players_position = {p: i for i, p in enumerate(game.players)}
+        root = Node(len(game.players))
+
+        iterations = 0
+        start = time.perf_counter()
+        deadline = start + self.time_budget
+        try:
+            while iterations == 0 or (iterations < self.max_iterations if self.max_iterations
+                                      else time.perf_counter() < deadline):
+                self._iterate(e, root, players_position)
+                e.undo(root_saved)
+                e.max_turns = max_turns
+                iterations += 1
+        finally:
+            e.undo(root_saved)
+            game.dice = game_dice
+            e.single_phase = single_phase
+            e.max_turns = max_turns
+            if own_journal:
+                game.stop_journal()
+            if own_hashing:
+                game.disable_hashing()
+
+        seconds = time.perf_counter() - start
+        self.decisions += 1
+        self.iterations += iterations
+        self.search_seconds += seconds
+        self.last_iterations = iterations
+        self.last_iterations_per_second = iterations / seconds
+
+        # The most visited action is the most robust choice
+        return max(root.children.items(), key=lambda item: item[1].visits)[0]
+
+    def _iterate(self, e, root, players_position):
+        node = root
+        path = [root]
+
+        # Selection and expansion, only actions legal in this iteration's state are considered
+        while not e.finished:
+            mover = players_position[e.current_player]
+            actions = e.legal_actions()
+            untried = [a for a in actions if a not in node.children]
+            if untried:
+                action = self.random.choice(untried)
+                child = Node(len(root.rewards))
+                node.children[action] = child
+                e.apply(action)
+                path.append(child)
+                break
+
+            log_visits = math.log(sum(node.children[a].visits for a in actions))
+            action = max(actions, key=lambda a: self._uct(node.children[a], mover, log_visits))
+            node = node.children[action]
+            e.apply(action)
+            path.append(node)
+
+        # Evaluation from the table, or rollout
+        table = self.transpositions
+        key = None
+        rewards = None
+        if table is not None and not e.finished:
+            key = e.position_hash()
+            entry = table.get(key)
+            if entry is not None and entry[1] >= self.table_rollouts:
+                rewards = entry[0]
+                key = None
+
+        if rewards is None:
+            if not e.finished:
+                rollout_max_turns = e.turn + self.rollout_turns
+                e.max_turns = rollout_max_turns if e.max_turns is None else min(e.max_turns, rollout_max_turns)
+                while not e.finished:
+                    e.apply(rollout_action(e, self.random))
+            rewards = score(e.game)
+
+        if key is not None:
+            # Running average of the rollouts from this position
+            if entry is None:
+                table.put(key, rewards)
+            else:
+                average, weight = entry
+                table.put(key, [(a * weight + r) / (weight + 1) for a, r in zip(average, rewards)], weight + 1)
+
+        # Backpropagation
+        for n in path:
+            n.visits += 1
+            for i, r in enumerate(rewards):
+                n.rewards[i] += r
+
+    def _uct(self, child, mover, log_visits):
+        return child.rewards[mover] / child.visits + self.exploration * math.sqrt(log_visits / child.visits)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description='Plays games of a MCTS bot against random bots.')
+    parser.add_argument('--games', type=int, default=10, help='Number of games to play.')
+    parser.add_argument('--players', type=int, default=2, help='Number of players per game (2-6).')
+    parser.add_argument('--budget', type=float, default=0.1, help='Seconds of search for each decision.')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--max-turns', type=int, default=100)
+    parser.add_argument('--table-size', type=int, default=0,
+                        help='Entries of a transposition table to share evaluations, 0 for no table.')
+    args = parser.parse_args()
+
+    mcts_bot = MCTSBot(args.budget, args.seed, transpositions=args.table_size or None)
+    mcts_wins = 0
+    for x in range(args.games):
+        game = engine.new_game(args.players, args.seed + x)
+        e = engine.Engine(game, args.max_turns)
+
+        # The MCTS bot plays a different seat each game
+        mcts_player = game.players[x % args.players]
+        players_bots = {p: bots.RandomBot(args.seed + x) for p in game.players}
+        players_bots[mcts_player] = mcts_bot
+
+        winner = e.play(players_bots)
+        if winner is mcts_player:
+            mcts_wins += 1
+        print(f'Game {x + 1}: {winner.name if winner else "no winner"} wins, MCTS bot was {mcts_player.name}')
+
+    print(f'MCTS bot won {mcts_wins} of {args.games} games')
+    print(f'{mcts_bot.decisions} decisions, {mcts_bot.iterations_per_second:,.0f} iterations/sec')
+    if mcts_bot.transpositions is not None:
+        print(mcts_bot.transpositions)
+
+
+if __name__ == '__main__':
+    main_cli()
@@ -0,0 +1,222 @@
+"""
+Exact odds of battles, without throwing any dice.
+
+A single battle only depends on how many dices each side throws, so the loss distribution of each
+(attacker dices, defender dices) pair is calculated once. A full assault (attacking again and again
+until the country is conquered or the attacker cannot attack anymore) is an absorbing Markov chain
+over (attacker armies, defender armies) states, built from those distributions.
+"""
+import bisect
+import functools
+import itertools
+import random
+
+# Same cap used by risk.Battle, no side can throw more than three dices.
+MAX_TROOPS = 3
+
+# How many assaults are kept in memory
+CACHE_SIZE = 4096
+
+
+def _battle_losses(dices_attacker, dices_defender):
+    """
+    Losses of both sides for a set of dices, with the same rules as risk.Battle.calculate.
+    """
+    dices_attacker = sorted(dices_attacker, reverse=True)
+    dices_defender = sorted(dices_defender, reverse=True)
+    losses_attacker = 0
+    losses_defender = 0
+    for x in range(min(len(dices_attacker), len(dices_defender))):
+        # Defender wins on tied dices
+        if dices_attacker[x] > dices_defender[x]:
+            losses_defender += 1
+        else:
+            losses_attacker += 1
+    return losses_attacker, losses_defender
+
+
+def _loss_distribution(attacker_dices_no, defender_dices_no):
+    """
+    Goes through every possible throw of dices and counts how many end with each result.
+
+    :return:
+    A tuple of tuples (losses attacker, losses defender, probability)
+    """
+    counts = {}
+    throws = itertools.product(range(1, 7), repeat=attacker_dices_no + defender_dices_no)
+    for dices in throws:
+        losses = _battle_losses(dices[:attacker_dices_no], dices[attacker_dices_no:])
+        counts[losses] = counts.get(losses, 0) + 1
+
+    total_throws = 6 ** (attacker_dices_no + defender_dices_no)
+    return tuple((losses_a, losses_d, count / total_throws)
+                 for (losses_a, losses_d), count in sorted(counts.items()))
+
+
+# Loss distribution for each pair of (attacker dices, defender dices)
+LOSS_DISTRIBUTIONS = {
+    (a, d): _loss_distribution(a, d)
+    for a in range(1, MAX_TROOPS + 1)
+    for d in range(1, MAX_TROOPS + 1)
+}
+
+
+def battle_losses(attacker_dices_no, defender_dices_no):
+    """
+    Returns the probability of each result of a single battle.
+
+    :param attacker_dices_no:
+    Number of dices thrown by the attacker (1 to 3).
+    :param defender_dices_no:
+    Number of dices thrown by the defender (1 to 3).
+    :return:
+    A tuple of tuples (losses attacker, losses defender, probability).
+    """
+    return LOSS_DISTRIBUTIONS[(attacker_dices_no, defender_dices_no)]
+
+
+class AssaultOdds:
+    """
+    Summary of the outcomes of a full assault.
+    """
+
+    def __init__(self, attacker_armies, defender_armies, win_probability, expected_attacker_armies,
+                 expected_defender_armies):
+        self.attacker_armies = attacker_armies
+        self.defender_armies = defender_armies
+
+        # Probability of conquering the country
+        self.win_probability = win_probability
+
+        # Expected armies left after the assault. For the attacker these are the armies left in
+        # both countries, as the surviving troops move into the conquered one.
+        self.expected_attacker_armies = expected_attacker_armies
+        self.expected_defender_armies = expected_defender_armies
+
+    def __str__(self):
+        return (f'{self.attacker_armies} armies attacking {self.defender_armies}: '
+                f'{self.win_probability:.1%} chances of conquering, '
+                f'attacker expected to keep {self.expected_attacker_armies:.2f} armies, '
+                f'defender {self.expected_defender_armies:.2f}')
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def assault_outcomes(attacker_armies, defender_armies, stop_at=1):
+    """
+    Probability of each final state of an assault, where the attacker keeps attacking with as many
+    dices as possible until conquering the country or having only stop_at armies left.
+
+    The states of the chain are (attacker armies, defender armies), the probabilities are pushed
+    from the starting state to the absorbing ones going through the transient states in order of total armies.
+
+    :param attacker_armies:
+    Armies in the attacking country, including the one that cannot leave it.
+    :param defender_armies:
+    Armies in the defending country.
+    :param stop_at:
+    The attacker stops when having this many armies, 1 to attack until not possible anymore.
+    :return:
+    A tuple of tuples (attacking country armies, defending country armies, conquered, probability).
+    When conquered, the armies in the defending country are the attacker's troops that moved into it.
+    """
+    if stop_at < 1:
+        raise Exception('An attacking country cannot stay with less than one army.')
+
+    outcomes = {}
+
+    # Transient states grouped by their total number of armies
+    levels = [{} for x in range(attacker_armies + defender_armies + 1)]
+    levels[-1][(attacker_armies, defender_armies)] = 1.0
+
+    # Every battle takes away at least one army, so states with more armies cannot be reached
+    # anymore once the ones with less are being expanded
+    for level in reversed(levels):
+        for (a, d), probability in level.items():
+            if d == 0 or a <= stop_at:
+                # Attacker gave up (or never started) with the defender still in place
+                key = (a, d, False)
+                outcomes[key] = outcomes.get(key, 0.0) + probability
+                continue
+
+            attacker_dices_no = min(a - 1, MAX_TROOPS)
+            defender_dices_no = min(d, MAX_TROOPS)
+            for losses_a, losses_d, p in LOSS_DISTRIBUTIONS[(attacker_dices_no, defender_dices_no)]:
+                new_a = a - losses_a
+                new_d = d - losses_d
+                if new_d == 0:
+                    # Remaining troops of the ones fighting move into the conquered country
+                    moved = attacker_dices_no - losses_a
+                    key = (new_a - moved, moved, True)
+                    outcomes[key] = outcomes.get(key, 0.0) + probability * p
+                else:
+                    next_level = levels[new_a + new_d]
+                    next_level[(new_a, new_d)] = next_level.get((new_a, new_d), 0.0) + probability * p
+
+    return tuple((a, d, conquered, p) for (a, d, conquered), p in sorted(outcomes.items()))
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def assault_odds(attacker_armies, defender_armies, stop_at=1):
+    """
+    Chances of conquering a country attacking until the end, and expected armies left on each side.
+
+    :param attacker_armies:
+    Armies in the attacking country, including the one that cannot leave it.
+    :param defender_armies:
+    Armies in the defending country.
+    :param stop_at:
+    The attacker stops when having this many armies, 1 to attack until not possible anymore.
+    :return:
+    An object of the class AssaultOdds.
+    """
+    win_probability = 0.0
+    expected_attacker_armies = 0.0
+    expected_defender_armies = 0.0
+
+    for a, d, conquered, p in assault_outcomes(attacker_armies, defender_armies, stop_at):
+        if conquered:
+            win_probability += p
+            expected_attacker_armies += p * (a + d)
+        else:
+            expected_attacker_armies += p * a
+            expected_defender_armies += p * d
+
+    return AssaultOdds(attacker_armies, defender_armies, win_probability, expected_attacker_armies,
+                       expected_defender_armies)
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def _cumulative_outcomes(attacker_armies, defender_armies, stop_at):
+    outcomes = assault_outcomes(attacker_armies, defender_armies, stop_at)
+    return outcomes, tuple(itertools.accumulate(p for a, d, conquered, p in outcomes))
+
+
+def sample_assault(attacker_armies, defender_armies, stop_at=1, rng=random):
+    """
+    Draws the final state of an assault from its exact distribution, the same as fighting it battle
+    by battle but at the cost of a single random number.
+
+    :param attacker_armies:
+    Armies in the attacking country, including the one that cannot leave it.
+    :param defender_armies:
+    Armies in the defending country.
+    :param stop_at:
+    The attacker stops when having this many armies, 1 to attack until not possible anymore.
+    :param rng:
+    Where the random number comes from, anything with a random() method, e.g. a random.Random or a dice.DiceSource.
+    :return:
+    A tuple (attacking country armies, defending country armies, conquered), as in assault_outcomes().
+    """
+    outcomes, cumulative = _cumulative_outcomes(attacker_armies, defender_armies, stop_at)
+    position = bisect.bisect_right(cumulative, rng.random() * cumulative[-1])
+    a, d, conquered, p = outcomes[min(position, len(outcomes) - 1)]
+    return a, d, conquered
+
+
+def clear_cache():
+    """
+    Empties the memoized assaults.
+    """
+    assault_outcomes.cache_clear()
+    assault_odds.cache_clear()
+    _cumulative_outcomes.cache_clear()
@@ -0,0 +1,182 @@
+"""
+Opt-in timing of a game's methods and phases.
+
+A Profiler keeps how many calls there were by name, with their total and maximum time and a sample of
+their durations for percentiles, so it takes the same memory however long it runs.
+
+instrument() replaces methods of one object (not of its class) with timed versions, so objects not being
+profiled run exactly the same code as before and pay nothing. Results can be saved as JSON stats (calls,
+total, mean, p50, p99, max) or as a Chrome trace, to be opened in chrome://tracing or https://ui.perfetto.dev.
+"""
+import contextlib
+import json
+import os
+import random
+import time
+import types
+
+perf_counter_ns = time.perf_counter_ns
+
+
+class Durations:
+    """
+    Running totals of the calls with one name, plus a uniform sample of their durations (reservoir
+    sampling), exact for percentiles until there are more calls than the sample holds.
+    """
+    __slots__ = ('calls', 'total', 'max', 'sample', 'sample_size', 'random')
+
+    def __init__(self, sample_size):
+        self.calls = 0
+        self.total = 0
+        self.max = 0
+        self.sample = []
+        self.sample_size = sample_size
+        # Seeded so the same run gives the same percentiles
+        self.random = random.Random(0)
+
+    def add(self, duration):
+        self.calls += 1
+        self.total += duration
+        if duration > self.max:
+            self.max = duration
+        if len(self.sample) < self.sample_size:
+            self.sample.append(duration)
+        else:
+            x = self.random.randrange(self.calls)
+            if x < self.sample_size:
+                self.sample[x] = duration
+
+
+class Profiler:
+    """
+    Durations of calls by name, plus the calls themselves as events for a trace.
+    """
+
+    def __init__(self, max_events=1000000, sample_size=10000):
+        """
+        :param max_events:
+        Number of events kept for the trace, later ones are only counted in stats. 0 to keep none.
+        :param sample_size:
+        Durations kept per name for the percentiles.
+        """
+        self.max_events = max_events
+        self.sample_size = sample_size
+        self.start = perf_counter_ns()
+
+        # Durations in nanoseconds, by name
+        self.durations = {}
+
+        # Events as tuples (name, category, start, duration), in nanoseconds
+        self.events = []
+        self.dropped_events = 0
+
+    def __str__(self):
+        return f'Profiler with {sum(d.calls for d in self.durations.values())} calls of {len(self.durations)} names'
+
+    def add(self, name, category, start, end):
+        duration = end - start
+        durations = self.durations.get(name)
+        if durations is None:
+            durations = self.durations[name] = Durations(self.sample_size)
+        durations.add(duration)
+
+        if len(self.events) < self.max_events:
+            self.events.append((name, category, start, duration))
+        else:
+            self.dropped_events += 1
+
+    @contextlib.contextmanager
+    def span(self, name, category='phase'):
+        """
+        Times a block of code:
+
+            with profiler.span('attack round'):
+                ...
+        """
+        start = perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.add(name, category, start, perf_counter_ns())
+
+    def stats(self):
+        """
+        :return:
+        A dictionary by name with the number of calls, and the total, mean, median (p50), 99th percentile and
+        maximum time in seconds. Percentiles come from the sample of durations.
+        """
+        stats = {}
+        for name, durations in self.durations.items():
+            ordered = sorted(durations.sample)
+            stats[name] = {
+                'calls': durations.calls,
+                'total': durations.total / 1e9,
+                'mean': durations.total / durations.calls / 1e9,
+                'p50': _percentile(ordered, 50) / 1e9,
+                'p99': _percentile(ordered, 99) / 1e9,
+                'max': durations.max / 1e9,
+            }
+        return stats
+
+    def report(self):
+        """
+        Stats as a text table, slowest in total first.
+        """
+        lines = [f'{"name":32} {"calls":>9} {"total s":>10} {"p50 us":>10} {"p99 us":>10}']
+        for name, s in sorted(self.stats().items(), key=lambda item: item[1]['total'], reverse=True):
+            lines.append(f'{name:32} {s["calls"]:>9} {s["total"]:>10.4f} {s["p50"] * 1e6:>10.1f}'
+                         f' {s["p99"] * 1e6:>10.1f}')
+        return '\n'.join(lines)
+
+    def save_json(self, file):
+        with open(file, 'w') as output_file:
+            json.dump({'stats': self.stats(), 'dropped_events': self.dropped_events}, output_file, indent=2)
+
+    def save_chrome_trace(self, file):
+        """
+        Writes the events in the Trace Event Format, as complete events in microseconds.
+        """
+        pid = os.getpid()
+        trace_events = [{'name': name, 'cat': category, 'ph': 'X', 'pid': pid, 'tid': 1,
+                         'ts': (start - self.start) / 1000, 'dur': duration / 1000}
+                        for name, category, start, duration in self.events]
+        with open(file, 'w') as output_file:
+            json.dump({'traceEvents': trace_events, 'displayTimeUnit': 'ms'}, output_file)
+
+
+def _percentile(ordered, percent):
+    # Nearest rank
+    rank = max(0, -(-len(ordered) * percent // 100) - 1)
+    return ordered[rank]
+
+
+def _timed(function, profiler, name, category):
+    def timed(self, *args, **kwargs):
+        start = perf_counter_ns()
+        try:
+            return function(self, *args, **kwargs)
+        finally:
+            profiler.add(name, category, start, perf_counter_ns())
+    timed.__name__ = function.__name__
+    timed.__doc__ = function.__doc__
+    return timed
+
+
+def instrument(obj, method_names, profiler, category='method'):
+    """
+    Times the calls to some methods of an object, recording them in a profiler as 'Class.method'.
+    The methods are replaced in the object only, other objects of the class are not affected.
+    """
+    class_name = type(obj).__name__
+    for method_name in method_names:
+        function = getattr(type(obj), method_name)
+        timed = _timed(function, profiler, f'{class_name}.{method_name}', category)
+        setattr(obj, method_name, types.MethodType(timed, obj))
+
+
+def uninstrument(obj, method_names):
+    """
+    Goes back to the methods of the class, undoing instrument().
+    """
+    for method_name in method_names:
+        obj.__dict__.pop(method_name, None)
@@ -0,0 +1,326 @@
+"""
+Replays of games played through the engine.
+
+A replay file holds the seed the game was set up with, followed by a compact binary stream of
+the actions played, including the dices thrown in every attack. Every few turns a keyframe with
+the whole state is added, so any turn can be rebuilt from the closest keyframe instead of from the
+beginning. Replaying does not throw dices nor asks bots anything, so it's much faster than playing.
+
+Run from the repository's root folder:
+
+    python replay.py record game.replay --players 3 --seed 7
+    python replay.py show game.replay --turn 5
+"""
+import argparse
+import array
+import struct
+
+import engine
+import bots
+
+MAGIC = b'GRPL'
+VERSION = 1
+
+# Magic, version, seed, number of players, max turns (0 for none), turns between keyframes
+HEADER_FORMAT = struct.Struct('<4sBqBHH')
+
+# Every record starts with one byte with its kind
+OPCODE_ATTACK = ord('A')
+OPCODE_RELOCATE = ord('R')
+OPCODE_DEPLOY = ord('D')
+OPCODE_END_PHASE = ord('E')
+OPCODE_KEYFRAME = ord('K')
+
+# Country from, country to, troops, three dices of each side (0 when not thrown)
+ATTACK_FORMAT = struct.Struct('<IIB3B3B')
+# Country from, country to, armies
+RELOCATE_FORMAT = struct.Struct('<III')
+# Country, armies
+DEPLOY_FORMAT = struct.Struct('<II')
+# Turn, phase, player position, armies to deploy, size of the rest of the keyframe
+KEYFRAME_FORMAT = struct.Struct('<IBbII')
+
+PHASES = [engine.PHASE_ATTACK, engine.PHASE_RELOCATE, engine.PHASE_DEPLOY, engine.PHASE_FINISHED, None]
+
+
+def _pack_ints(values):
+    values = array.array('i', values)
+    return struct.pack('<I', len(values)) + values.tobytes()
+
+
+def _unpack_ints(data, offset):
+    length, = struct.unpack_from('<I', data, offset)
+    offset += 4
+    values = array.array('i')
+    values.frombytes(data[offset:offset + 4 * length])
+    return tuple(values), offset + 4 * length
+
+
+def _padded_dices(dices):
+    dices = list(dices)[:3]
+    return dices + [0] * (3 - len(dices))
+
+
+def encode_keyframe(e):
+    """
+    Packs the state of an engine and its game.
+    """
+    owners, armies, current_player, times_traded, players_cards, deck, already_traded = e.game.snapshot()
+    relocation_sources = [c.id for c in e.relocation_sources] if e.relocation_sources is not None else []
+
+    data = b''.join([
+        _pack_ints(owners), _pack_ints(armies), _pack_ints([current_player]), _pack_ints(times_traded),
+        _pack_ints([len(players_cards)]), *[_pack_ints(cards) for cards in players_cards],
+        _pack_ints(deck), _pack_ints(already_traded), _pack_ints(relocation_sources)])
+
+    return KEYFRAME_FORMAT.pack(e.turn, PHASES.index(e.phase), e.player_position, e.armies_to_deploy,
+                                len(data)) + data
+
+
+def restore_keyframe(e, keyframe):
+    """
+    Puts an engine and its game in the state of a keyframe, as returned by encode_keyframe().
+    """
+    turn, phase, player_position, armies_to_deploy, size = KEYFRAME_FORMAT.unpack_from(keyframe)
+    offset = KEYFRAME_FORMAT.size
+
+    owners, offset = _unpack_ints(keyframe, offset)
+    armies, offset = _unpack_ints(keyframe, offset)
+    (current_player,), offset = _unpack_ints(keyframe, offset)
+    times_traded, offset = _unpack_ints(keyframe, offset)
+    (players_no,), offset = _unpack_ints(keyframe, offset)
+    players_cards = []
+    for x in range(players_no):
+        cards, offset = _unpack_ints(keyframe, offset)
+        players_cards.append(cards)
+    deck, offset = _unpack_ints(keyframe, offset)
+    already_traded, offset = _unpack_ints(keyframe, offset)
+    relocation_sources, offset = _unpack_ints(keyframe, offset)
+
+    e.game.restore((owners, armies, current_player, times_traded, tuple(players_cards), deck,
+                    tuple(bool(x) for x in already_traded)))
+    e.turn = turn
+    e.phase = PHASES[phase]
+    e.player_position = player_position
+    e.armies_to_deploy = armies_to_deploy
+    e.relocation_sources = [e.country(country_id) for country_id in relocation_sources]
+    e.winner = None
+    e.winning_objective = None
+
+
+class ReplayRecorder:
+    """
+    Plays actions on an engine and writes them to a replay file.
+    """
+
+    def __init__(self, file, e, seed, players_no, keyframe_every=10):
+        """
+        :param file:
+        Path of the replay file, it gets overwritten.
+        :param e:
+        An engine with a game just created by engine.new_game(players_no, seed).
+        :param seed:
+        The seed used to create the game.
+        :param players_no:
+        The number of players used to create the game.
+        :param keyframe_every:
+        Number of turns between keyframes.
+        """
+        if seed is None:
+            raise Exception('Games need a seed to be replayed.')
+
+        self.engine = e
+        self.keyframe_every = keyframe_every
+        self.file = open(file, 'wb')
+        self.file.write(HEADER_FORMAT.pack(MAGIC, VERSION, seed, players_no, e.max_turns or 0, keyframe_every))
+        self.last_turn = e.turn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def apply(self, action):
+        """
+        Applies an action to the engine, recording it.
+        """
+        battle = self.engine.apply(action)
+
+        if action.kind == engine.ATTACK:
+            self.file.write(bytes([OPCODE_ATTACK]) + ATTACK_FORMAT.pack(
+                action.country_from, action.country_to, action.armies,
+                *_padded_dices(battle.dices_attacker), *_padded_dices(battle.dices_defender)))
+        elif action.kind == engine.RELOCATE:
+            self.file.write(bytes([OPCODE_RELOCATE]) + RELOCATE_FORMAT.pack(
+                action.country_from, action.country_to, action.armies))
+        elif action.kind == engine.DEPLOY:
+            self.file.write(bytes([OPCODE_DEPLOY]) + DEPLOY_FORMAT.pack(action.country_to, action.armies))
+        else:
+            self.file.write(bytes([OPCODE_END_PHASE]))
+
+        # Keyframes go at the beginning of turns
+        if self.engine.turn != self.last_turn:
+            self.last_turn = self.engine.turn
+            if self.engine.turn % self.keyframe_every == 0 and not self.engine.finished:
+                self.file.write(bytes([OPCODE_KEYFRAME]) + encode_keyframe(self.engine))
+
+        return battle
+
+    def close(self):
+        self.file.close()
+
+
+class Replayer:
+    """
+    Rebuilds the game of a replay file at any turn.
+    """
+
+    def __init__(self, file):
+        with open(file, 'rb') as replay_file:
+            data = replay_file.read()
+
+        magic, version, self.seed, self.players_no, max_turns, self.keyframe_every = HEADER_FORMAT.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise Exception(f'{file} is not a replay file this version can read.')
+        self.max_turns = max_turns or None
+
+        # Each event is a tuple (action, dices), keyframes are kept by turn with the position of
+        # the next event to play
+        self.events = []
+        self.keyframes = {}
+
+        offset = HEADER_FORMAT.size
+        while offset < len(data):
+            opcode = data[offset]
+            offset += 1
+            if opcode == OPCODE_ATTACK:
+                country_from, country_to, troops_no, *dices = ATTACK_FORMAT.unpack_from(data, offset)
+                offset += ATTACK_FORMAT.size
+                self.events.append((engine.attack(country_from, country_to, troops_no),
+                                    ([d for d in dices[:3] if d], [d for d in dices[3:] if d])))
+            elif opcode == OPCODE_RELOCATE:
+                self.events.append((engine.relocate(*RELOCATE_FORMAT.unpack_from(data, offset)), None))
+                offset += RELOCATE_FORMAT.size
+            elif opcode == OPCODE_DEPLOY:
+                self.events.append((engine.deploy(*DEPLOY_FORMAT.unpack_from(data, offset)), None))
+                offset += DEPLOY_FORMAT.size
+            elif opcode == OPCODE_END_PHASE:
+                self.events.append((engine.END_PHASE_ACTION, None))
+            elif opcode == OPCODE_KEYFRAME:
+                turn, *rest, size = KEYFRAME_FORMAT.unpack_from(data, offset)
+                keyframe_size = KEYFRAME_FORMAT.size + size
+                self.keyframes[turn] = (len(self.events), data[offset:offset + keyframe_size])
+                offset += keyframe_size
+            else:
+                raise Exception(f'Unknown record {opcode} at byte {offset - 1} of {file}.')
+
+        self.engine = None
+        self.position = 0
+
+    def __str__(self):
+        return f'Replay of {len(self.events)} actions with {len(self.keyframes)} keyframes (seed {self.seed})'
+
+    def restart(self):
+        """
+        Sets up the game again from its seed.
+        """
+        self.engine = engine.Engine(engine.new_game(self.players_no, self.seed), self.max_turns)
+        self.position = 0
+        return self.engine
+
+    def step(self):
+        """
+        Plays the next action.
+
+        :return:
+        The action, or None if there are no more actions.
+        """
+        if self.engine is None:
+            self.restart()
+        if self.position >= len(self.events):
+            return None
+        action, dices = self.events[self.position]
+        self.engine.apply(action, dices)
+        self.position += 1
+        return action
+
+    def seek(self, turn):
+        """
+        Rebuilds the game as it was at the beginning of a turn, starting from the closest keyframe before it.
+
+        :return:
+        The engine, with its game.
+        """
+        keyframe_turn = self._keyframe_before(turn)
+
+        # Going on from where the replay is only makes sense if it's before the turn and after the keyframe
+        if self.engine is None or not keyframe_turn <= self.engine.turn < turn:
+            if keyframe_turn in self.keyframes:
+                if self.engine is None:
+                    self.restart()
+                self.position, keyframe = self.keyframes[keyframe_turn]
+                restore_keyframe(self.engine, keyframe)
+            else:
+                self.restart()
+
+        while self.engine.turn < turn and self.step():
+            pass
+        return self.engine
+
+    def play_to_end(self):
+        while self.step():
+            pass
+        return self.engine
+
+    def _keyframe_before(self, turn):
+        turns = [t for t in self.keyframes if t <= turn]
+        return max(turns) if turns else 1
+
+
+def record_game(file, players_no, seed, max_turns=None, keyframe_every=10, bot_class=bots.RandomBot):
+    """
+    Plays a game between bots, recording it.
+
+    :return:
+    The engine once the game finished.
+    """
+    e = engine.Engine(engine.new_game(players_no, seed), max_turns)
+    players_bots = {p: bot_class(seed + n) for n, p in enumerate(e.game.players)}
+    with ReplayRecorder(file, e, seed, players_no, keyframe_every) as recorder:
+        while not e.finished:
+            recorder.apply(players_bots[e.current_player].choose_action(e))
+    return e
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description='Records and shows replays of games between bots.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    record_parser = subparsers.add_parser('record', help='Plays a game between random bots, recording it.')
+    record_parser.add_argument('file')
+    record_parser.add_argument('--players', type=int, default=2)
+    record_parser.add_argument('--seed', type=int, default=1)
+    record_parser.add_argument('--max-turns', type=int, default=200)
+    record_parser.add_argument('--keyframe-every', type=int, default=10)
+
+    show_parser = subparsers.add_parser('show', help='Shows the board of a replay at the beginning of a turn.')
+    show_parser.add_argument('file')
+    show_parser.add_argument('--turn', type=int, default=None, help='By default, the end of the game.')
+
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        e = record_game(args.file, args.players, args.seed, args.max_turns, args.keyframe_every)
+        print(f'Recorded {e.turn} turns, {e.winner.name if e.winner else "no one"} won.')
+    else:
+        replayer = Replayer(args.file)
+        print(replayer)
+        e = replayer.seek(args.turn) if args.turn else replayer.play_to_end()
+        print(f'\n{e}\n')
+        for c in e.game.countries:
+            print(f' - {c}')
+
+
+if __name__ == '__main__':
+    main_cli()
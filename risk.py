@@ -2,6 +2,12 @@ import random
 import math
 import re
 import helpers
+import history
+import dice
+import mapbundle
+import profiling
+import odds
+import zobrist
 
 
 class Player:
@@ -27,8 +33,25 @@ class Player:
         # These get filled by methods after the game starts
         self.times_country_cards_traded = 0
         self.objectives = []
-        self.countries = []
-        self.cards = None
+        self.cards = []
+
+        # Countries owned by the player, kept up to date by the game every time a country changes hands
+        # or armies. These are dictionaries used as ordered sets, countries are in the order they were received.
+        self.countries = {}
+        self.countries_with_more_than_one = {}
+
+        # Number of countries owned in each continent, also kept up to date by the game
+        self.countries_per_continent = {}
+
+        # Groups of connected countries owned by the player (see Territory), also kept up to date by the game.
+        # A dictionary used as an ordered set.
+        self.territories = {}
+
+        # Own countries with enemy neighbours, each one with a dictionary of those neighbours (used as an
+        # ordered set), and the ones of them with more than one army, which can attack. Also kept up to date.
+        self.frontier = {}
+        self.countries_able_to_attack = {}
+
         self.world_objective = None
         #self.cards_deck = None
 
@@ -48,9 +71,12 @@ class Country:
         self.neighbours = []
         self.continent = None
 
+        # The game this country belongs to, it gets notified when the player or armies change
+        self.game = None
+
         # Gets assigned during the game
-        self.player = None
-        self.armies = 0
+        self._player = None
+        self._armies = 0
 
     def __str__(self):
 
@@ -90,6 +116,28 @@ class Country:
 
         return text
 
+    @property
+    def player(self):
+        return self._player
+
+    @player.setter
+    def player(self, pl):
+        previous_player = self._player
+        self._player = pl
+        if self.game is not None and previous_player is not pl:
+            self.game.country_player_changed(self, previous_player)
+
+    @property
+    def armies(self):
+        return self._armies
+
+    @armies.setter
+    def armies(self, armies):
+        previous_armies = self._armies
+        self._armies = armies
+        if self.game is not None and previous_armies != armies:
+            self.game.country_armies_changed(self, previous_armies)
+
     def add_neighbour(self,country):
         self.neighbours.append(country)
 
@@ -99,6 +147,25 @@ class Country:
         #print(f'{self.name} now owned by: {self.player}')
 
 
+class Territory:
+    """
+    Countries of one player connected to each other through the player's own countries, so troops can
+    travel between any two of them. Kept up to date by the game as countries change hands.
+    """
+
+    def __init__(self, player):
+        self.player = player
+
+        # A dictionary used as an ordered set
+        self.countries = {}
+
+    def __str__(self):
+        return f"Territory of {self.player.name} ({len(self.countries)} countries)"
+
+    def __len__(self):
+        return len(self.countries)
+
+
 class Continent:
     """
     A continent, which has a list of countries and a number of armies that it grants to its conqueror.
@@ -124,12 +191,7 @@ class Continent:
         self.countries.append(country)
 
     def conquered_by_player(self, player):
-        conquered_by_player = True
-        for c in self.countries:
-            if c.player != player:
-                conquered_by_player = False
-
-        return conquered_by_player
+        return player.countries_per_continent.get(self, 0) == len(self.countries)
 
 
 class Objective:
@@ -143,6 +205,12 @@ class Objective:
     def is_achieved(self, player):
         raise NotImplementedError('Subclass must implement this method.')
 
+    def progress(self, player):
+        """
+        How close a player is to achieve the objective, between 0 and 1 (achieved).
+        """
+        raise NotImplementedError('Subclass must implement this method.')
+
 
 class WorldDominationObjective(Objective):
     """
@@ -157,14 +225,10 @@ class WorldDominationObjective(Objective):
         return f'World domination - Conquer a total of {self.amount_countries} countries'
 
     def is_achieved(self, pl):
-        p_countries = []
-        for c in self.all_countries:
-            if c.player == pl:
-                p_countries.append(c)
-        if len(p_countries) >= self.amount_countries:
-            return True
-        else:
-            return False
+        return len(pl.countries) >= self.amount_countries
+
+    def progress(self, pl):
+        return min(1.0, len(pl.countries) / self.amount_countries)
 
 
 class AnnihilationObjetive:
@@ -188,6 +252,9 @@ class AnnihilationObjetive:
         else:
             return False
 
+    def progress(self, player):
+        return 1 / (1 + len(self.player.countries))
+
 
 class ConquestObjetive(Objective):
     """
@@ -233,29 +300,39 @@ class ConquestObjetive(Objective):
         The player who should be evaluated.
         :return:
         """
-        # We'll start from 'accomplished' and set it to false the first time we see something not fulfilled.
-        achieved = True
+        # Uses the number of countries per continent the game keeps for each player,
+        # so there's no need to go through the countries of each continent.
         if self.continents_to_conquer != None and len(self.continents_to_conquer) > 0:
             for cont in self.continents_to_conquer:
-                for c in cont.countries:
-                    if c.player != player:
-                        achieved = False
+                if not cont.conquered_by_player(player):
+                    return False
         if self.continents_and_number_countries != None and len(self.continents_and_number_countries) > 0:
             for (cont, num_required_countries) in self.continents_and_number_countries:
-                conquered_countries = 0
-                for c in cont.countries:
-                    if c.player == player:
-                        conquered_countries += 1
-                    if conquered_countries < num_required_countries:
-                        achieved = False
+                if player.countries_per_continent.get(cont, 0) < num_required_countries:
+                    return False
+        return True
+
+    def progress(self, player):
+        required_countries = 0
+        conquered_countries = 0
+        for cont in self.continents_to_conquer or []:
+            required_countries += len(cont.countries)
+            conquered_countries += player.countries_per_continent.get(cont, 0)
+        for (cont, num_required_countries) in self.continents_and_number_countries or []:
+            required_countries += num_required_countries
+            conquered_countries += min(player.countries_per_continent.get(cont, 0), num_required_countries)
+        return conquered_countries / required_countries
 
 
 class Battle:
 
-    def __init__(self, attacking_country, defending_country, attacker_troops_no):
+    def __init__(self, attacking_country, defending_country, attacker_troops_no, dice_source=None):
 
         max_troops = 3
 
+        # Where dices come from, see the dice module
+        self.dice_source = dice_source if dice_source is not None else dice.default_dice
+
         # Parameters required at creation
         self.attacking_country = attacking_country
         self.defending_country = defending_country
@@ -284,6 +361,9 @@ class Battle:
         # Whether the battle already took place
         self.is_decided = False
 
+        # The game this battle is part of, it gets notified once the battle is decided
+        self.game = None
+
         # Attributes related to results of the battle
         self.dices_attacker = None
         self.dices_defender = None
@@ -310,15 +390,11 @@ class Battle:
         return text
 
     def roll_dices_attacker(self):
-        self.dices_attacker = []
-        for x in range(self.attacker_troops_no):
-            self.dices_attacker.append(random.randint(1,6))
+        self.dices_attacker = self.dice_source.roll(self.attacker_troops_no)
         return self.dices_attacker
 
     def roll_dices_defender(self):
-        self.dices_defender = []
-        for x in range(self.defender_troops_no):
-            self.dices_defender.append(random.randint(1,6))
+        self.dices_defender = self.dice_source.roll(self.defender_troops_no)
         return self.dices_defender
 
     def calculate(self):
@@ -377,11 +453,91 @@ class Battle:
 
             self.is_decided = True
 
+            if self.game is not None:
+                self.game.battle_decided(self)
+
         else:
             raise Exception('You cannot decide a battle without throwing dices on both sides.'
                             'Call both RollDices...() functions first.')
 
 
+class Assault(Battle):
+    """
+    A continued attack from one country to another, battle after battle with as many dices as possible,
+    until conquering it or until the attacker is down to a number of armies. Only the final result is
+    drawn, from the exact distribution of odds.assault_outcomes(), so a long siege costs the same as a
+    single battle.
+
+    It's kept in a game's history like a battle, with no dices and the casualties of the whole assault.
+    """
+
+    def __init__(self, attacking_country, defending_country, stop_at=1, dice_source=None):
+        """
+        :param stop_at:
+        The attacker stops when having this many armies, 1 to attack until not possible anymore.
+        """
+        if attacking_country.armies <= stop_at:
+            raise Exception(f'{attacking_country.name} cannot attack with {attacking_country.armies} armies'
+                            f' and stopping at {stop_at}.')
+
+        super().__init__(attacking_country, defending_country, attacking_country.armies - 1, dice_source)
+        self.stop_at = stop_at
+
+        # Armies in each country when the assault started
+        self.attacker_armies = attacking_country.armies
+        self.defender_armies = defending_country.armies
+
+    def __str__(self):
+        text = (f'{self.attacking_country.name} ({self.attacking_player.name}) assaults with'
+                f' {self.attacker_armies} armies {self.defending_country.name}'
+                f' ({self.defending_player.name}, {self.defender_armies} armies)')
+
+        if self.is_decided:
+            text += f'; attacker lost {self.casualties_attacker}, defender lost {self.casualties_defender}'
+
+        if self.defender_lost_country:
+            text += ', attacker conquered country'
+
+        return text
+
+    def calculate(self, rng=None):
+        """
+        Decides the assault and updates both countries.
+
+        :param rng:
+        Where the random number comes from, anything with a random() method. By default the assault's
+        dice source, like the dices of a battle.
+        """
+        if self.is_decided:
+            raise Exception('This assault has already been decided.')
+
+        attacker_armies, defender_armies, conquered = odds.sample_assault(
+            self.attacker_armies, self.defender_armies, self.stop_at, rng if rng is not None else self.dice_source)
+        self.dices_attacker = []
+        self.dices_defender = []
+
+        if conquered:
+            # Same steps as a battle, the country is emptied before changing hands
+            self.casualties_attacker = self.attacker_armies - attacker_armies - defender_armies
+            self.casualties_defender = self.defender_armies
+            self.attacking_country.armies = attacker_armies
+            self.defending_country.armies = 0
+            self.defending_country.player = self.attacking_country.player
+            self.defending_country.armies = defender_armies
+            self.defender_lost_country = True
+        else:
+            self.casualties_attacker = self.attacker_armies - attacker_armies
+            self.casualties_defender = self.defender_armies - defender_armies
+            self.attacking_country.armies = attacker_armies
+            self.defending_country.armies = defender_armies
+            self.defender_lost_country = False
+
+        self.is_decided = True
+
+        if self.game is not None:
+            self.game.battle_decided(self)
+
+
 class CountryCard:
 
     def __init__(self, country, figure, already_traded=False):
@@ -409,7 +565,29 @@ class Game:
     It offers methods with the usual actions of a game.
     """
 
-    def __init__(self):
+    # Methods timed once profiling is enabled, see enable_profiling()
+    PROFILED_METHODS = ['call_attack', 'attack', 'blitz', 'get_countries', 'check_if_winner', 'advance_next_player',
+                        'deal_initial_countries_equally', 'load_map_from_file', 'load_cards', 'load_map_bundle',
+                        'load_world_domination_objective']
+
+    def __init__(self, battle_history=None, seed=None, dice_source=None):
+        """
+        :param battle_history:
+        Where battles are kept, a history.BattleHistory or a history.BattleRecordWriter.
+        By default the last thousand battles are kept in memory.
+        :param seed:
+        Seed for the game's own random generator, used to shuffle and deal, and for its dices.
+        The same seed gives the same game.
+        :param dice_source:
+        Where the game's dices come from, see the dice module. By default dices are thrown
+        with a generator seeded from the game's.
+        """
+        # Every game has its own generators, so games don't depend on each other
+        self.random = random.Random(seed)
+        if dice_source is None:
+            dice_source = dice.RandomDice(self.random.getrandbits(64))
+        self.dice = dice_source
+
         # Players of this game
         self.players = None
 
@@ -417,12 +595,24 @@ class Game:
         self.countries = None
         self.countries_by_id = None
 
+        # Countries without a player, as a dictionary used as an ordered set
+        self.unassigned_countries = {}
+
+        # The Territory of each country with a player
+        self.territory_of = {}
+
+        # Neighbours of each country in both directions, for territories, and the countries having each
+        # country as neighbour, for frontiers. Built when first needed, as a map may list a border only
+        # from one of the countries.
+        self.borders = None
+        self.incoming = None
+
         # Represent the deck with country cards
         self.country_card_deck = None
         self.country_cards = None
 
         # Keep track of battles in game
-        self.battles = []
+        self.battles = battle_history if battle_history is not None else history.BattleHistory()
 
         # Player gets a number of armies no matter how few countries she/he has
         self.min_armies_per_turn = 3
@@ -433,6 +623,22 @@ class Game:
         self.current_player = None
         self.player_conquered_territory = False
 
+        # The objective fulfilled by the winner, once there is one
+        self.winning_objective = None
+
+        # When not None, a list where every change to the game is recorded with a way to undo it,
+        # see start_journal() and rollback()
+        self.journal = None
+
+        # When not None, a profiling.Profiler timing the calls to PROFILED_METHODS
+        self.profiler = None
+
+        # When not None, the zobrist.ZobristKeys the hash of the board is kept up to date with, see enable_hashing()
+        self.hash_keys = None
+        self.board_hash = 0
+        self.hash_country_positions = None
+        self.hash_owners = None
+
     def initial_setup_ready(self):
         if self.players == None or len(self.players) < 2:
             return False
@@ -507,6 +713,8 @@ class Game:
                 continent_id = int(continent_id)
                 new_country = Country(country_name, country_id)
                 new_country.continent = continents_dict[continent_id]
+                new_country.game = self
+                self.unassigned_countries[new_country] = None
                 self.countries.append(new_country)
                 countries_dict[country_id] = new_country
                 continents_dict[continent_id].add_country(new_country)
@@ -548,6 +756,46 @@ class Game:
         except:
             raise Exception('There was a problem while reading the country card data.')
 
+    def load_map_bundle(self, bundle=None):
+        """
+        Does the same as load_map_from_file() and load_cards() together, from a compiled map bundle
+        instead of the text files, which saves parsing them for every new game.
+
+        :param bundle:
+        A mapbundle.MapBundle. By default the bundle of the files in game_data/, built if missing or stale.
+        """
+        if bundle is None:
+            bundle = mapbundle.compiled_map()
+
+        continent_bonus = bundle.continent_bonus
+        continents = [Continent(name, continent_bonus[i])
+                      for i, name in enumerate(bundle.strings('continent_names'))]
+        for cont in continents:
+            cont.countries = []
+
+        country_continent = bundle.country_continent
+        countries = []
+        for i, (country_id, country_name) in enumerate(zip(bundle.country_ids, bundle.strings('country_names'))):
+            new_country = Country(country_name, country_id)
+            new_country.continent = continents[country_continent[i]]
+            new_country.game = self
+            new_country.continent.countries.append(new_country)
+            countries.append(new_country)
+
+        indptr = bundle.indptr
+        indices = bundle.indices
+        for i, c in enumerate(countries):
+            c.neighbours = [countries[n] for n in indices[indptr[i]:indptr[i + 1]]]
+
+        self.continents = continents
+        self.countries = countries
+        self.countries_by_id = {c.id: c for c in countries}
+        self.unassigned_countries = dict.fromkeys(countries)
+
+        figure_names = bundle.strings('figure_names')
+        self.country_cards = [CountryCard(countries[country], figure_names[figure])
+                              for country, figure in zip(bundle.card_country, bundle.card_figure)]
+
     def assign_players(self, names_and_colors):
         """
         Load the players into the appropiate class.
@@ -566,31 +814,259 @@ class Game:
 
     def get_countries(self, a_player, only_countries_with_more_than_one=False):
         """
-        Returns a list with countries owned by a player.
+        Returns a list with countries owned by a player, in the order the player got them.
 
         :param a_player:
         One object of the class Player
+        :param only_countries_with_more_than_one:
+        Whether to return only the countries with more than one army, i.e. the ones that can attack.
         :return:
         List collection of objects from the class Country
         """
-        countries_from_this_player = []
-        for c in self.countries:
-            #print(f'c.player=[{c.player}]; a_player=[{a_player}]')
-            if c.player == a_player:
-                if only_countries_with_more_than_one:
-                    if c.armies > 1:
-                        countries_from_this_player.append(c)
-                else:
-                    countries_from_this_player.append(c)
-
-        return countries_from_this_player
+        if only_countries_with_more_than_one:
+            return list(a_player.countries_with_more_than_one)
+        else:
+            return list(a_player.countries)
 
     def get_unassigned_countries(self):
-        unassigned_countries = []
+        return list(self.unassigned_countries)
+
+    def get_countries_able_to_attack(self, a_player):
+        """
+        Returns a list with the countries of a player with more than one army and at least one enemy neighbour.
+        """
+        return list(a_player.countries_able_to_attack)
+
+    def get_enemy_neighbours(self, country):
+        """
+        Returns a list with the neighbours of a country owned by someone else, the ones it could attack.
+        """
+        if country.player is None:
+            return []
+        return list(country.player.frontier.get(country, ()))
+
+    def get_frontier(self, a_player, only_countries_able_to_attack=False):
+        """
+        Returns a list of tuples (own country, enemy neighbour) with every border of a player with enemies.
+
+        :param only_countries_able_to_attack:
+        Whether to return only the borders of countries with more than one army, i.e. the possible attacks.
+        """
+        if only_countries_able_to_attack:
+            frontier = a_player.frontier
+            return [(c, n) for c in a_player.countries_able_to_attack for n in frontier[c]]
+        return [(c, n) for c, enemies in a_player.frontier.items() for n in enemies]
+
+    def reachable(self, country_from, country_to):
+        """
+        Whether troops can travel from one country to another through countries of the same player.
+        """
+        territory = self.territory_of.get(country_from)
+        return territory is not None and territory is self.territory_of.get(country_to)
+
+    def get_reachable_countries(self, country):
+        """
+        Returns a list with the countries troops can travel to from a country, through countries of the same player.
+        """
+        territory = self.territory_of.get(country)
+        if territory is None:
+            return []
+        return [c for c in territory.countries if c is not country]
+
+    def country_player_changed(self, country, previous_player):
+        """
+        Keeps the countries owned by each player up to date. Called by a country when its player changes.
+        """
+        if self.journal is not None:
+            self.journal.append((setattr, (country, 'player', previous_player)))
+
+        if previous_player is None:
+            self.unassigned_countries.pop(country, None)
+        else:
+            previous_player.countries.pop(country, None)
+            previous_player.countries_with_more_than_one.pop(country, None)
+            previous_player.countries_per_continent[country.continent] -= 1
+
+        if country.player is None:
+            self.unassigned_countries[country] = None
+        else:
+            country.player.countries[country] = None
+            if country.armies > 1:
+                country.player.countries_with_more_than_one[country] = None
+            per_continent = country.player.countries_per_continent
+            per_continent[country.continent] = per_continent.get(country.continent, 0) + 1
+
+        if self.hash_keys is not None:
+            position = self.hash_country_positions[country]
+            self.board_hash ^= (self.hash_keys.country_key(position, self.hash_owners[previous_player], country.armies) ^
+                                self.hash_keys.country_key(position, self.hash_owners[country.player], country.armies))
+
+        if previous_player is not None:
+            self._leave_territory(country)
+        if country.player is not None:
+            self._join_territory(country)
+
+        self._update_frontier(country, previous_player)
+
+    def _build_borders(self):
+        self.borders = {c: list(c.neighbours) for c in self.countries}
+        self.incoming = {c: [] for c in self.countries}
         for c in self.countries:
-            if c.player == None:
-                unassigned_countries.append(c)
-        return unassigned_countries
+            for n in c.neighbours:
+                self.incoming[n].append(c)
+                if c not in n.neighbours:
+                    self.borders[n].append(c)
+
+    def _borders(self, country):
+        if self.borders is None:
+            self._build_borders()
+        return self.borders[country]
+
+    def _incoming(self, country):
+        if self.incoming is None:
+            self._build_borders()
+        return self.incoming[country]
+
+    def _update_frontier(self, country, previous_player):
+        """
+        Updates the frontiers around a country that changed hands: its own enemy neighbours, and whether
+        it's an enemy for the countries having it as neighbour.
+        """
+        player = country.player
+
+        if previous_player is not None:
+            previous_player.frontier.pop(country, None)
+            previous_player.countries_able_to_attack.pop(country, None)
+
+        if player is not None:
+            enemies = {n: None for n in country.neighbours if n.player is not player}
+            if enemies:
+                player.frontier[country] = enemies
+                if country.armies > 1:
+                    player.countries_able_to_attack[country] = None
+
+        for m in self._incoming(country):
+            owner = m.player
+            if owner is None:
+                continue
+            enemies = owner.frontier.get(m)
+            if owner is not player:
+                if enemies is None:
+                    enemies = owner.frontier[m] = {}
+                    if m.armies > 1:
+                        owner.countries_able_to_attack[m] = None
+                enemies[country] = None
+            elif enemies is not None:
+                enemies.pop(country, None)
+                if not enemies:
+                    del owner.frontier[m]
+                    owner.countries_able_to_attack.pop(m, None)
+
+    def _join_territory(self, country):
+        """
+        Adds a country to the territory of its player, joining all the territories it connects.
+        Smaller territories are moved into the biggest one.
+        """
+        player = country.player
+        territory_of = self.territory_of
+        joined = list(dict.fromkeys(territory_of[n] for n in self._borders(country)
+                                    if n in territory_of and n.player is player))
+
+        if not joined:
+            territory = Territory(player)
+            player.territories[territory] = None
+        else:
+            territory = max(joined, key=len)
+            for other in joined:
+                if other is not territory:
+                    for c in other.countries:
+                        territory_of[c] = territory
+                    territory.countries.update(other.countries)
+                    del player.territories[other]
+
+        territory.countries[country] = None
+        territory_of[country] = territory
+
+    def _leave_territory(self, country):
+        """
+        Takes a country out of its territory, which may split it in several.
+        """
+        territory_of = self.territory_of
+        territory = territory_of.pop(country)
+        del territory.countries[country]
+        if not territory.countries:
+            del territory.player.territories[territory]
+            return
+
+        borders = self.borders
+        same = [n for n in self._borders(country) if territory_of.get(n) is territory]
+        if len(same) <= 1:
+            return
+
+        # Usually the neighbours left are connected to each other around the country, which is checked
+        # first without going through the whole territory
+        around = set(same)
+        reached = {same[0]}
+        pending = [same[0]]
+        while pending:
+            for n in borders[pending.pop()]:
+                if n in around and n not in reached:
+                    reached.add(n)
+                    pending.append(n)
+        if len(reached) == len(around):
+            return
+
+        # Otherwise the territory is gone through again, and every piece not connected to the first one
+        # becomes a new territory
+        remaining = territory.countries
+        territory.countries = {}
+        player = territory.player
+        first = True
+        for start in same:
+            if start not in remaining:
+                continue
+            if first:
+                piece = territory
+                first = False
+            else:
+                piece = Territory(player)
+                player.territories[piece] = None
+            del remaining[start]
+            piece.countries[start] = None
+            territory_of[start] = piece
+            pending = [start]
+            while pending:
+                for n in borders[pending.pop()]:
+                    if n in remaining:
+                        del remaining[n]
+                        piece.countries[n] = None
+                        territory_of[n] = piece
+                        pending.append(n)
+
+    def country_armies_changed(self, country, previous_armies):
+        """
+        Keeps the countries with more than one army of each player, and the ones able to attack, up to date.
+        Called by a country when its armies change.
+        """
+        if self.journal is not None:
+            self.journal.append((setattr, (country, 'armies', previous_armies)))
+
+        player = country.player
+        if self.hash_keys is not None:
+            position = self.hash_country_positions[country]
+            owner = self.hash_owners[player]
+            self.board_hash ^= (self.hash_keys.country_key(position, owner, previous_armies) ^
+                                self.hash_keys.country_key(position, owner, country.armies))
+
+        if player is not None:
+            if country.armies > 1:
+                if previous_armies <= 1:
+                    player.countries_with_more_than_one[country] = None
+                    if country in player.frontier:
+                        player.countries_able_to_attack[country] = None
+            elif previous_armies > 1:
+                player.countries_with_more_than_one.pop(country, None)
+                player.countries_able_to_attack.pop(country, None)
 
     def initialize_countries_deck(self):
         """
@@ -600,7 +1076,7 @@ class Game:
         """
         if self.country_cards and len(self.country_cards) > 0:
             self.country_card_deck = self.country_cards.copy()
-            random.shuffle(self.country_card_deck)
+            self.random.shuffle(self.country_card_deck)
 
         #print('Initialized and shuffled country cards deck.')
 
@@ -620,10 +1096,33 @@ class Game:
 
     def call_attack(self, country_from, country_to, troops_no):
 
-        b = Battle(country_from, country_to, troops_no)
-        self.battles.append(b)
+        b = Battle(country_from, country_to, troops_no, self.dice)
+        b.game = self
         return b
 
+    def blitz(self, country_from, country_to, stop_at=1):
+        """
+        Attacks a country again and again until conquering it or until country_from is down to stop_at
+        armies, drawing only the final result (see Assault). It's kept in the history as one battle.
+
+        :return:
+        The decided Assault.
+        """
+        if country_to not in country_from.neighbours:
+            raise Exception(f'{country_to.name} is not a neighbour of {country_from.name}.')
+
+        assault = Assault(country_from, country_to, stop_at, self.dice)
+        assault.game = self
+        assault.calculate()
+        return assault
+
+    def battle_decided(self, battle):
+        """
+        Keeps a battle in the game's history. Called by the battle once decided.
+        """
+        pushed_out = self.battles.record(battle)
+        self._record(self.battles.unrecord, battle, pushed_out)
+
     def attack(self, country_from, country_to, dices_a, dices_d):
         """
         A player attacks a country and eventually conquers it.
@@ -686,7 +1185,7 @@ class Game:
         """
 
         countries_to_deal = self.countries.copy()
-        random.shuffle(countries_to_deal)
+        self.random.shuffle(countries_to_deal)
         countries_per_player = int(len(self.countries) / len(self.players))
         # So for each player in this game
         for p in self.players:
@@ -725,7 +1224,10 @@ class Game:
         Check if the game has a winner already, evaluating whether
         each player reached one of their objectives. Only the first
         match is returned, so this should be checked after each player
-        moves.
+        moves. The objective reached is kept in winning_objective.
+
+        Objectives are checked with the counters of countries kept for each
+        player, so this does not depend on the size of the map.
 
         :return:
         Returns an instance of the class Player, namely the winner.
@@ -736,6 +1238,8 @@ class Game:
                 #print(objective)
                 if objective.is_achieved(p):
                     #print(f'{p.name} achieved:\n{objective}')
+                    self._record(setattr, self, 'winning_objective', self.winning_objective)
+                    self.winning_objective = objective
                     return p
 
         return None
@@ -766,10 +1270,15 @@ class Game:
         return armies
 
     def update_player_countries(self, player):
-        player.countries = self.get_countries(player)
+        """
+        Nothing to do anymore, the countries of each player are updated as soon as they change hands.
+        Kept so that code calling it still works.
+        """
+        pass
 
     def trade_card_posessed_country(self, card):
         num_armies = 2
+        self._record(setattr, card, 'already_traded', card.already_traded)
         card.already_traded = True
         return num_armies
 
@@ -789,9 +1298,15 @@ class Game:
                 raise Exception(f'Player {player.name} traded cards {player.times_country_cards_traded} times?')
 
             for card in cards:
-                player.cards.pop(card)
+                self._record(list.insert, player.cards, player.cards.index(card), card)
+                player.cards.remove(card)
+                self._record(setattr, card, 'already_traded', card.already_traded)
                 card.already_traded = False
-                self.country_card_deck.add(card)
+                self.country_card_deck.append(card)
+                self._record(list.pop, self.country_card_deck)
+
+            self._record(setattr, player, 'times_country_cards_traded', player.times_country_cards_traded)
+            player.times_country_cards_traded += 1
 
             return num_armies_for_player
 
@@ -800,11 +1315,19 @@ class Game:
 
     def give_country_card_to_player(self, player):
         a_card = self.country_card_deck.pop()
+        self._record(list.append, self.country_card_deck, a_card)
+        self._record(setattr, a_card, 'already_traded', a_card.already_traded)
         a_card.already_traded = False
-        player.cards.add(a_card)
+        player.cards.append(a_card)
+        self._record(list.pop, player.cards)
+
+    def set_current_player(self, player):
+        self._record(setattr, self, 'current_player', self.current_player)
+        self.current_player = player
 
     def advance_next_player(self):
         if self.initial_setup_ready():
+            self._record(setattr, self, 'current_player', self.current_player)
             if self.current_player:
                 # Iterate through the list of players and get the next one,
                 # if we are at the last one then return the first one
@@ -817,6 +1340,176 @@ class Game:
                 # If current player has not been set yet then just assign the first one
                 self.current_player = self.players[0]
 
+    def _record(self, undo_function, *args):
+        """
+        Adds to the journal, if there's one, how to undo a change.
+        """
+        if self.journal is not None:
+            self.journal.append((undo_function, args))
+
+    def start_journal(self):
+        """
+        Starts recording every change to the game, so they can be undone with rollback().
+        Changes to countries are recorded by the countries themselves, the rest by the methods of this class.
+        """
+        if self.journal is None:
+            self.journal = []
+
+    def stop_journal(self):
+        self.journal = None
+
+    def checkpoint(self):
+        """
+        Returns a point of the journal the game can go back to with rollback().
+        """
+        if self.journal is None:
+            raise Exception('Call start_journal() before taking checkpoints.')
+        return len(self.journal)
+
+    def rollback(self, checkpoint=0):
+        """
+        Undoes every change recorded after a checkpoint, the cost depends only on the number of changes.
+
+        :param checkpoint:
+        A value returned by checkpoint(). By default everything since the journal started is undone.
+        """
+        journal = self.journal
+        if journal is None:
+            raise Exception('There is no journal to roll back.')
+
+        # Undoing changes countries again, which should not be recorded
+        self.journal = None
+        try:
+            while len(journal) > checkpoint:
+                undo_function, args = journal.pop()
+                undo_function(*args)
+        finally:
+            self.journal = journal
+
+    def snapshot(self):
+        """
+        Returns the state of the game (owners, armies, current player and cards) as a tuple of integers,
+        to be restored later with restore(). Players and cards are referenced by their position in
+        players and country_cards, countries by their position in countries.
+        """
+        player_position = {p: i for i, p in enumerate(self.players)}
+        player_position[None] = -1
+        card_position = {card: i for i, card in enumerate(self.country_cards or [])}
+
+        return (
+            tuple(player_position[c.player] for c in self.countries),
+            tuple(c.armies for c in self.countries),
+            player_position[self.current_player],
+            tuple(p.times_country_cards_traded for p in self.players),
+            tuple(tuple(card_position[card] for card in p.cards) for p in self.players),
+            tuple(card_position[card] for card in self.country_card_deck or []),
+            tuple(card.already_traded for card in self.country_cards or []),
+        )
+
+    def restore(self, snapshot):
+        """
+        Puts the game back in the state of a snapshot taken with snapshot().
+        Only the countries that changed since then are touched.
+        """
+        owners, armies, current_player, times_traded, players_cards, deck, already_traded = snapshot
+
+        for c, owner, c_armies in zip(self.countries, owners, armies):
+            pl = None if owner == -1 else self.players[owner]
+            if c.player is not pl:
+                c.player = pl
+            if c.armies != c_armies:
+                c.armies = c_armies
+
+        self._record(setattr, self, 'current_player', self.current_player)
+        self.current_player = None if current_player == -1 else self.players[current_player]
+
+        for p, times, cards in zip(self.players, times_traded, players_cards):
+            self._record(setattr, p, 'times_country_cards_traded', p.times_country_cards_traded)
+            p.times_country_cards_traded = times
+            self._record(setattr, p, 'cards', p.cards)
+            p.cards = [self.country_cards[i] for i in cards]
+
+        if self.country_cards:
+            self._record(setattr, self, 'country_card_deck', self.country_card_deck)
+            self.country_card_deck = [self.country_cards[i] for i in deck]
+            for card, traded in zip(self.country_cards, already_traded):
+                self._record(setattr, card, 'already_traded', card.already_traded)
+                card.already_traded = traded
+
+    def enable_hashing(self, keys=None):
+        """
+        Starts keeping a Zobrist hash of the board (owner and armies of every country) up to date, changed
+        in O(1) every time a country changes, also when rolling back. Games not hashing pay nothing.
+        Players and countries must be loaded first.
+
+        :param keys:
+        A zobrist.ZobristKeys for this map and number of players, e.g. to get the same hashes as other
+        games. By default keys with seed 0.
+        :return:
+        The hash of the board, also kept in self.board_hash.
+        """
+        if not self.players or not self.countries:
+            raise Exception('Load the map and assign players before enabling hashing.')
+        if keys is None:
+            keys = zobrist.ZobristKeys(len(self.countries), len(self.players))
+        elif keys.countries_no != len(self.countries) or keys.players_no != len(self.players):
+            raise Exception(f'{keys} cannot hash a game with {len(self.countries)} countries and'
+                            f' {len(self.players)} players.')
+
+        self.hash_keys = keys
+        self.hash_country_positions = {c: i for i, c in enumerate(self.countries)}
+        self.hash_owners = {p: i + 1 for i, p in enumerate(self.players)}
+        self.hash_owners[None] = 0
+        self.board_hash = self.compute_board_hash()
+        return self.board_hash
+
+    def disable_hashing(self):
+        self.hash_keys = None
+        self.hash_country_positions = None
+        self.hash_owners = None
+        self.board_hash = 0
+
+    def compute_board_hash(self):
+        """
+        The hash of the board computed from scratch, what board_hash should always be.
+        """
+        keys = self.hash_keys
+        board_hash = 0
+        for i, c in enumerate(self.countries):
+            board_hash ^= keys.country_key(i, self.hash_owners[c.player], c.armies)
+        return board_hash
+
+    def position_hash(self):
+        """
+        The hash of the board and the current player, in O(1). Hashing must be enabled.
+        """
+        return self.board_hash ^ self.hash_keys.player_keys[self.hash_owners[self.current_player]]
+
+    def enable_profiling(self, profiler=None):
+        """
+        Starts timing the calls to the methods in PROFILED_METHODS. Games not being profiled are not
+        slowed down at all, the timed methods are only set in this game.
+
+        :param profiler:
+        A profiling.Profiler, e.g. to share one between games. By default a new one.
+        :return:
+        The profiler, also kept in self.profiler.
+        """
+        if self.profiler is not None:
+            self.disable_profiling()
+        self.profiler = profiler if profiler is not None else profiling.Profiler()
+        profiling.instrument(self, self.PROFILED_METHODS, self.profiler)
+        return self.profiler
+
+    def disable_profiling(self):
+        """
+        Stops timing calls. The profiler is returned, with what it recorded so far.
+        """
+        profiler = self.profiler
+        profiling.uninstrument(self, self.PROFILED_METHODS)
+        self.profiler = None
+        return profiler
+
 
 class Army:
     """
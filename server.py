@@ -0,0 +1,514 @@
+"""
+Hosts many games at once in one process, played over TCP or Unix sockets.
+
+The protocol is line-delimited JSON: every request is one JSON object in one line, answered with one
+JSON object in one line. Requests have an "op" and, except for "new" and "stats", the "game" they are
+about. An "id" in a request is copied to its response, so a client can send several requests without
+waiting for each answer.
+
+    {"op": "new", "players": 3, "seed": 7, "max_turns": 100, "bots": [1, 2], "timeout": 60, "max_seconds": 600}
+    {"op": "state", "game": 1}
+    {"op": "actions", "game": 1}
+    {"op": "act", "game": 1, "action": ["attack", 4, 5, 3], "actions": true}
+    {"op": "close", "game": 1}
+    {"op": "stats"}
+
+Responses have "ok" true, or "ok" false and an "error". Actions go as [kind, country from, country to,
+armies] with the kinds and country IDs of the engine module. Players listed in "bots" (by position)
+are played by the server, the client plays the rest. A game nobody acts on for "timeout" seconds is
+closed, and so is any game still going "max_seconds" after it started. Games can ask for less time
+than the server's limits, not more.
+
+The server's bots play a few actions at a time and then let other connections go on, so a game
+played only by bots doesn't hold up the rest of the server, and it stops at its time limit.
+
+Run from the repository's root folder:
+
+    python server.py serve --port 8765
+    python server.py load --port 8765 --concurrency 10 50 100
+    python server.py load --unix /tmp/risk.sock --spawn
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+import bots
+import engine
+
+# Longest line accepted, lists of actions can be long on big maps
+LINE_LIMIT = 2 ** 24
+
+# Actions the server's bots play before letting other requests be answered
+BOT_ACTIONS_PER_STEP = 20
+
+
+def encode_action(action):
+    return [action.kind, action.country_from, action.country_to, action.armies]
+
+
+def decode_action(values):
+    kind, country_from, country_to, armies = values
+    if kind not in (engine.ATTACK, engine.RELOCATE, engine.DEPLOY, engine.END_PHASE):
+        raise Exception(f'Unknown kind of action {kind}.')
+    if kind == engine.END_PHASE:
+        return engine.END_PHASE_ACTION
+    return engine.Action(kind, country_from, country_to, int(armies))
+
+
+def encode_progress(e):
+    """
+    Where a game is at, without the board.
+    """
+    position = {p: i for i, p in enumerate(e.game.players)}
+    return {
+        'turn': e.turn,
+        'phase': e.phase,
+        'player': e.player_position,
+        'finished': e.finished,
+        'winner': position.get(e.winner),
+        'armies_to_deploy': e.armies_to_deploy,
+    }
+
+
+def encode_state(e):
+    """
+    Where a game is at, with the owner (player position, -1 for none) and armies of every country.
+    """
+    owners, armies, *rest = e.game.snapshot()
+    state = encode_progress(e)
+    state.update({
+        'players': [p.name for p in e.game.players],
+        'countries': [c.id for c in e.game.countries],
+        'owners': list(owners),
+        'armies': list(armies),
+    })
+    return state
+
+
+class HostedGame:
+    """
+    A game being played on the server.
+    """
+
+    def __init__(self, game_id, e, players_bots, timeout, max_seconds):
+        self.id = game_id
+        self.engine = e
+        self.bots = players_bots
+        self.timeout = timeout
+        self.last_activity = time.monotonic()
+        self.deadline = self.last_activity + max_seconds
+
+        # Whether the server's bots are playing, requests for the game wait for them to finish
+        self.busy = False
+
+    def __str__(self):
+        return f'Game {self.id}: {self.engine}'
+
+    def bots_turn(self):
+        e = self.engine
+        return not e.finished and e.current_player in self.bots
+
+    def play_bots(self, max_actions):
+        """
+        Plays for the server's bots until it's the turn of a player of the client, the game finishes, or
+        max_actions actions were played.
+
+        :return:
+        Whether it's still the turn of a bot.
+        """
+        e = self.engine
+        for x in range(max_actions):
+            if not self.bots_turn():
+                return False
+            e.apply(self.bots[e.current_player].choose_action(e))
+        return self.bots_turn()
+
+
+class GameServer:
+    """
+    Runs games for any number of connections, a connection can play several games.
+    """
+
+    def __init__(self, max_games=10000, timeout=60.0, max_seconds=3600.0):
+        """
+        :param max_games:
+        Games hosted at the same time, new ones are refused beyond this.
+        :param timeout:
+        Seconds a game can go without any request before being closed, unless a game asks for less.
+        :param max_seconds:
+        Seconds a game can last, however active, unless a game asks for less.
+        """
+        self.max_games = max_games
+        self.timeout = timeout
+        self.max_seconds = max_seconds
+        self.games = {}
+        self.next_game_id = 1
+
+        self.games_created = 0
+        self.games_finished = 0
+        self.games_timed_out = 0
+        self.games_over_time = 0
+        self.requests = 0
+
+        self.operations = {
+            'new': self.new_game,
+            'state': self.state,
+            'actions': self.actions,
+            'act': self.act,
+            'close': self.close,
+            'stats': self.stats,
+        }
+
+    def __str__(self):
+        return f'Game server with {len(self.games)} games'
+
+    async def handle(self, request):
+        """
+        Answers one request.
+
+        :return:
+        The response, a dictionary.
+        """
+        self.requests += 1
+        operation = self.operations.get(request.get('op'))
+        if operation is None:
+            raise Exception(f'Unknown operation {request.get("op")}.')
+        response = operation(request)
+        if asyncio.iscoroutine(response):
+            response = await response
+        response['ok'] = True
+        return response
+
+    def hosted_game(self, request):
+        hosted = self.games.get(request.get('game'))
+        if hosted is None:
+            raise Exception(f'There is no game {request.get("game")}, it may have finished or timed out.')
+        if hosted.busy:
+            raise Exception(f'The server is still playing the bots of game {hosted.id}.')
+        hosted.last_activity = time.monotonic()
+        return hosted
+
+    async def play_bots(self, hosted):
+        """
+        Plays for the server's bots a few actions at a time, letting other requests go on in between,
+        and closes the game if it goes over its time limit.
+        """
+        hosted.busy = True
+        try:
+            while hosted.play_bots(BOT_ACTIONS_PER_STEP):
+                if time.monotonic() > hosted.deadline:
+                    break
+                await asyncio.sleep(0)
+        finally:
+            hosted.busy = False
+            hosted.last_activity = time.monotonic()
+
+        if time.monotonic() > hosted.deadline and not hosted.engine.finished:
+            self.remove(hosted.id)
+            self.games_over_time += 1
+            raise Exception(f'Game {hosted.id} went over its time limit and was closed.')
+
+    async def new_game(self, request):
+        if len(self.games) >= self.max_games:
+            raise Exception(f'The server is full ({self.max_games} games).')
+
+        players_no = int(request.get('players', 2))
+        seed = request.get('seed')
+        game = engine.new_game(players_no, seed)
+        e = engine.Engine(game, request.get('max_turns'))
+        players_bots = {game.players[position]: bots.ScriptedBot(None if seed is None else seed + position)
+                        for position in request.get('bots', [])}
+
+        max_seconds = min(float(request.get('max_seconds', self.max_seconds)), self.max_seconds)
+        timeout = min(float(request.get('timeout', self.timeout)), self.timeout)
+        hosted = HostedGame(self.next_game_id, e, players_bots, timeout, max_seconds)
+        self.next_game_id += 1
+        self.games[hosted.id] = hosted
+        self.games_created += 1
+        await self.play_bots(hosted)
+        response = {'game': hosted.id, 'state': encode_state(e)}
+        if e.finished:
+            self.remove(hosted.id)
+            self.games_finished += 1
+        return response
+
+    def state(self, request):
+        return {'state': encode_state(self.hosted_game(request).engine)}
+
+    def actions(self, request):
+        return {'actions': [encode_action(a) for a in self.hosted_game(request).engine.legal_actions()]}
+
+    async def act(self, request):
+        hosted = self.hosted_game(request)
+        e = hosted.engine
+        if e.current_player in hosted.bots:
+            raise Exception('It is not the turn of a player of this client.')
+
+        battle = e.apply(decode_action(request['action']))
+        response = {}
+        if battle is not None:
+            response['battle'] = {
+                'dices_attacker': battle.dices_attacker,
+                'dices_defender': battle.dices_defender,
+                'casualties_attacker': battle.casualties_attacker,
+                'casualties_defender': battle.casualties_defender,
+                'conquered': battle.defender_lost_country,
+            }
+
+        await self.play_bots(hosted)
+        response['progress'] = encode_progress(e)
+        if e.finished:
+            self.remove(hosted.id)
+            self.games_finished += 1
+        elif request.get('actions'):
+            response['actions'] = [encode_action(a) for a in e.legal_actions()]
+        return response
+
+    def close(self, request):
+        self.remove(self.hosted_game(request).id)
+        return {}
+
+    def stats(self, request):
+        return {
+            'games': len(self.games),
+            'games_created': self.games_created,
+            'games_finished': self.games_finished,
+            'games_timed_out': self.games_timed_out,
+            'games_over_time': self.games_over_time,
+            'requests': self.requests,
+        }
+
+    def remove(self, game_id):
+        self.games.pop(game_id, None)
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                request = {}
+                try:
+                    request = json.loads(line)
+                    response = await self.handle(request)
+                except Exception as e:
+                    response = {'ok': False, 'error': str(e)}
+                if isinstance(request, dict) and 'id' in request:
+                    response['id'] = request['id']
+                writer.write(json.dumps(response).encode() + b'\n')
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def close_idle_games(self, every=1.0):
+        """
+        Closes the games that went over their timeout or their time limit, checking every few seconds.
+        Games whose bots are playing are closed by play_bots() instead.
+        """
+        while True:
+            await asyncio.sleep(every)
+            now = time.monotonic()
+            for hosted in [g for g in self.games.values() if not g.busy]:
+                if now > hosted.deadline:
+                    self.remove(hosted.id)
+                    self.games_over_time += 1
+                elif now - hosted.last_activity > hosted.timeout:
+                    self.remove(hosted.id)
+                    self.games_timed_out += 1
+
+    async def serve(self, host='127.0.0.1', port=8765, unix=None):
+        if unix:
+            server = await asyncio.start_unix_server(self.handle_connection, unix, limit=LINE_LIMIT)
+        else:
+            server = await asyncio.start_server(self.handle_connection, host, port, limit=LINE_LIMIT)
+        reaper = asyncio.create_task(self.close_idle_games())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            reaper.cancel()
+
+
+class Client:
+    """
+    A connection to a game server.
+    """
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def connect(cls, host='127.0.0.1', port=8765, unix=None):
+        if unix:
+            reader, writer = await asyncio.open_unix_connection(unix, limit=LINE_LIMIT)
+        else:
+            reader, writer = await asyncio.open_connection(host, port, limit=LINE_LIMIT)
+        return cls(reader, writer)
+
+    async def request(self, op, **arguments):
+        """
+        Sends a request and waits for its response.
+
+        :return:
+        The response, a dictionary. Raises an exception if the server answered with an error.
+        """
+        arguments['op'] = op
+        self.writer.write(json.dumps(arguments).encode() + b'\n')
+        await self.writer.drain()
+        line = await self.reader.readline()
+        if not line:
+            raise Exception('The server closed the connection.')
+        response = json.loads(line)
+        if not response['ok']:
+            raise Exception(response['error'])
+        return response
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+async def play_random_game(address, players_no, seed, max_turns, latencies, turn_times):
+    """
+    Plays one game with random legal actions for every player, timing each action.
+    """
+    rng = random.Random(seed)
+    client = await Client.connect(**address)
+    try:
+        response = await client.request('new', players=players_no, seed=seed, max_turns=max_turns)
+        game_id = response['game']
+        actions = (await client.request('actions', game=game_id))['actions']
+        turn = response['state']['turn']
+        turn_start = time.perf_counter()
+        while True:
+            start = time.perf_counter()
+            response = await client.request('act', game=game_id, action=rng.choice(actions), actions=True)
+            now = time.perf_counter()
+            latencies.append(now - start)
+
+            progress = response['progress']
+            if progress['turn'] != turn:
+                turn_times.append(now - turn_start)
+                turn = progress['turn']
+                turn_start = now
+            if progress['finished']:
+                break
+            actions = response['actions']
+    finally:
+        await client.close()
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    return ordered[max(0, -(-len(ordered) * percent // 100) - 1)] if ordered else 0.0
+
+
+async def load_test(address, concurrency_levels, games_no, players_no, max_turns, max_latency):
+    """
+    Plays games with a number of them going on at once, for each level of concurrency, and reports
+    throughput and latency. The capacity is the highest level with a p99 latency under max_latency.
+    """
+    capacity = None
+    seed = 0
+    print(f'{"games at once":>13} {"games/s":>9} {"actions/s":>10} {"p50 ms":>8} {"p99 ms":>8} {"turn p50 ms":>12}')
+    for concurrency in concurrency_levels:
+        latencies = []
+        turn_times = []
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def limited(game_seed):
+            async with semaphore:
+                await play_random_game(address, players_no, game_seed, max_turns, latencies, turn_times)
+
+        start = time.perf_counter()
+        await asyncio.gather(*[limited(seed + x) for x in range(max(games_no, concurrency))])
+        seconds = time.perf_counter() - start
+        seed += max(games_no, concurrency)
+
+        p99 = percentile(latencies, 99)
+        print(f'{concurrency:>13} {max(games_no, concurrency) / seconds:>9.1f} {len(latencies) / seconds:>10,.0f}'
+              f' {percentile(latencies, 50) * 1000:>8.2f} {p99 * 1000:>8.2f} {percentile(turn_times, 50) * 1000:>12.1f}')
+        if p99 * 1000 <= max_latency:
+            capacity = concurrency
+
+    if capacity is None:
+        print(f'\nNo level kept the p99 latency under {max_latency} ms.')
+    else:
+        print(f'\nCapacity: {capacity} games at once with a p99 latency under {max_latency} ms.')
+
+    client = await Client.connect(**address)
+    print(await client.request('stats'))
+    await client.close()
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description='Hosts games over sockets, or load tests a server.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    for name, help_text in (('serve', 'Runs the server.'), ('load', 'Plays random games against a server.')):
+        subparser = subparsers.add_parser(name, help=help_text)
+        subparser.add_argument('--host', default='127.0.0.1')
+        subparser.add_argument('--port', type=int, default=8765)
+        subparser.add_argument('--unix', default=None, help='Path of a Unix socket, instead of TCP.')
+
+    serve_parser = subparsers.choices['serve']
+    serve_parser.add_argument('--max-games', type=int, default=10000)
+    serve_parser.add_argument('--timeout', type=float, default=60.0, help='Seconds before an idle game is closed.')
+    serve_parser.add_argument('--max-seconds', type=float, default=3600.0, help='Seconds a game can last at most.')
+
+    load_parser = subparsers.choices['load']
+    load_parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 10, 50, 100])
+    load_parser.add_argument('--games', type=int, default=100, help='Games played at each level.')
+    load_parser.add_argument('--players', type=int, default=3)
+    load_parser.add_argument('--max-turns', type=int, default=30)
+    load_parser.add_argument('--max-latency', type=float, default=50.0, help='p99 latency in ms for the capacity.')
+    load_parser.add_argument('--spawn', action='store_true', help='Starts a server for the test and stops it after.')
+
+    args = parser.parse_args()
+    address = {'host': args.host, 'port': args.port, 'unix': args.unix}
+
+    if args.command == 'serve':
+        print(f'Serving on {args.unix or f"{args.host}:{args.port}"}')
+        try:
+            asyncio.run(GameServer(args.max_games, args.timeout, args.max_seconds).serve(**address))
+        except KeyboardInterrupt:
+            pass
+        return
+
+    server_process = None
+    if args.spawn:
+        listen = ['--unix', args.unix] if args.unix else ['--host', args.host, '--port', str(args.port)]
+        server_process = subprocess.Popen([sys.executable, os.path.abspath(__file__), 'serve'] + listen,
+                                          stdout=subprocess.DEVNULL)
+        # Waits for the server to accept connections
+        for x in range(100):
+            if args.unix and os.path.exists(args.unix):
+                break
+            if not args.unix:
+                try:
+                    socket.create_connection((args.host, args.port)).close()
+                    break
+                except OSError:
+                    pass
+            time.sleep(0.05)
+    try:
+        asyncio.run(load_test(address, args.concurrency, args.games, args.players, args.max_turns, args.max_latency))
+    finally:
+        if server_process is not None:
+            server_process.terminate()
+            server_process.wait()
+            if args.unix and os.path.exists(args.unix):
+                os.remove(args.unix)
+
+
+if __name__ == '__main__':
+    main_cli()
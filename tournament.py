@@ -0,0 +1,254 @@
+"""
+Tournaments between bots: plays many full games on all cores and rates the bots with Elo.
+
+Games are set up like any other (engine.new_game, with gamesetup.initialize_objectives dealing objectives)
+and played by bots picked at random for each game, in random seats. They are spread across a pool of
+processes in small batches, and results come back as batches finish: printed every few games, and
+written to a JSON lines file if asked, so a long run can be followed and stopped at any time.
+
+Ratings are fitted on every result so far (a Bradley-Terry model, in Elo points), with a 95%
+confidence interval for each bot. A game won counts as a win over every other bot in it, a game
+without a winner as a draw between all of them. With more than two players, the results of a game
+against each other bot are weighted so that every game counts once for each bot, as they all come
+from the same game and are not independent.
+
+Bots are given by name (random, scripted, mcts) or as module:Class for any class taking a seed,
+like bots.ScriptedBot.
+
+Run from the repository's root folder:
+
+    python tournament.py --bots random scripted mcts --games 2000 --players 3
+    python tournament.py --bots scripted my_bots:GreedyBot --games 100000 --output results.jsonl
+"""
+import argparse
+import concurrent.futures
+import importlib
+import json
+import math
+import os
+import random
+import time
+
+import bots
+import engine
+import mcts
+
+# Bots by name, each one a function taking a seed
+BOTS = {
+    'random': bots.RandomBot,
+    'scripted': bots.ScriptedBot,
+    'mcts': lambda seed: mcts.MCTSBot(0.05, seed),
+}
+
+# Worker processes keep their own random generator, for bots using the random module directly
+worker_random = None
+
+
+def make_bot(spec, seed):
+    """
+    Creates a bot from its name in BOTS, or from 'module:Class'.
+    """
+    if spec in BOTS:
+        return BOTS[spec](seed)
+    if ':' not in spec:
+        raise Exception(f'Unknown bot {spec}, use one of {", ".join(BOTS)} or module:Class.')
+    module_name, class_name = spec.split(':', 1)
+    return getattr(importlib.import_module(module_name), class_name)(seed)
+
+
+def init_worker(seed):
+    global worker_random
+    worker_random = random.Random(f'{seed}-{os.getpid()}')
+    random.seed(worker_random.random())
+
+
+def seats_for_game(specs, players_no, seed):
+    """
+    Picks the bots for a game, in seat order. A bot only plays itself when there are fewer bots than seats.
+    """
+    rng = random.Random(seed)
+    if len(specs) >= players_no:
+        return rng.sample(specs, players_no)
+    return [rng.choice(specs) for x in range(players_no)]
+
+
+def play_game(specs, players_no, seed, max_turns):
+    """
+    Plays one game.
+
+    :return:
+    A dictionary with the seed, the bots by seat, the winner's seat (None if nobody won), the
+    objective fulfilled and the turns played.
+    """
+    seats = seats_for_game(specs, players_no, seed)
+    game = engine.new_game(players_no, seed)
+    e = engine.Engine(game, max_turns)
+    players_bots = {p: make_bot(spec, seed * players_no + n) for n, (p, spec) in enumerate(zip(game.players, seats))}
+    winner = e.play(players_bots)
+    return {
+        'seed': seed,
+        'seats': seats,
+        'winner': game.players.index(winner) if winner else None,
+        'objective': type(e.winning_objective).__name__ if winner else None,
+        'turns': e.turn,
+    }
+
+
+def play_batch(specs, players_no, seeds, max_turns):
+    return [play_game(specs, players_no, seed, max_turns) for seed in seeds]
+
+
+class Ratings:
+    """
+    Elo ratings from game results, fitted with a Bradley-Terry model on the results of every pair of bots.
+    """
+
+    def __init__(self, names, prior_draws=1.0):
+        """
+        :param prior_draws:
+        Points every pair of bots starts with each way, as if they had drawn 2 * prior_draws games, so
+        ratings stay finite for a bot that never won or never lost.
+        """
+        self.names = list(names)
+        self.prior_draws = prior_draws
+        # Points (1 for a win, 0.5 for a draw) of the first bot of each pair against the second, divided by
+        # the other bots in the game, so the results of each game add up to one game per bot
+        self.points = {}
+        self.games = {name: 0 for name in self.names}
+        self.wins = {name: 0 for name in self.names}
+
+    def __str__(self):
+        return f'Ratings of {len(self.names)} bots after {sum(self.games.values())} seats played'
+
+    def add(self, seats, winner):
+        """
+        :param seats:
+        The bots of a game, in seat order.
+        :param winner:
+        The seat that won, None if nobody did.
+        """
+        for name in seats:
+            self.games[name] += 1
+        if winner is not None:
+            self.wins[seats[winner]] += 1
+
+        weight = 1 / (len(seats) - 1)
+        for i, a in enumerate(seats):
+            for j, b in enumerate(seats):
+                if i == j or a == b:
+                    continue
+                if winner is None:
+                    self.points[a, b] = self.points.get((a, b), 0.0) + 0.5 * weight
+                elif winner == i:
+                    self.points[a, b] = self.points.get((a, b), 0.0) + weight
+
+    def _pair_games(self, a, b):
+        return self.points.get((a, b), 0.0) + self.points.get((b, a), 0.0) + 2 * self.prior_draws
+
+    def fit(self, iterations=200):
+        """
+        :return:
+        A dictionary by bot name with (rating, half width of the 95% confidence interval), in Elo points
+        with an average rating of 1500.
+        """
+        names = self.names
+        strength = {name: 1.0 for name in names}
+        for x in range(iterations):
+            # Minorization-maximization updates of the Bradley-Terry strengths
+            for a in names:
+                points = sum(self.points.get((a, b), 0.0) + self.prior_draws for b in names if b != a)
+                expected = sum(self._pair_games(a, b) / (strength[a] + strength[b]) for b in names if b != a)
+                if expected:
+                    strength[a] = points / expected
+            mean_log = sum(math.log(s) for s in strength.values()) / len(names)
+            strength = {name: s / math.exp(mean_log) for name, s in strength.items()}
+
+        elo_per_log = 400 / math.log(10)
+        ratings = {}
+        for a in names:
+            # Fisher information of each bot's strength alone, ignoring the uncertainty of the others, so the
+            # interval is approximate
+            information = sum(self._pair_games(a, b) * strength[a] * strength[b] / (strength[a] + strength[b]) ** 2
+                              for b in names if b != a)
+            half_width = 1.96 * elo_per_log / math.sqrt(information) if information else float('inf')
+            ratings[a] = (1500 + elo_per_log * math.log(strength[a]), half_width)
+        return ratings
+
+    def report(self):
+        lines = [f'{"bot":28} {"Elo":>7} {"95% CI":>8} {"games":>7} {"wins":>7}']
+        for name, (rating, half_width) in sorted(self.fit().items(), key=lambda item: -item[1][0]):
+            lines.append(f'{name:28} {rating:>7.0f} {"±" + format(half_width, ".0f"):>8} {self.games[name]:>7} '
+                         f'{self.wins[name]:>7}')
+        return '\n'.join(lines)
+
+
+def run_tournament(specs, games_no, players_no=2, seed=1, max_turns=200, workers=None, batch_size=10,
+                   report_every=100, output_file=None):
+    """
+    Plays a tournament, printing the ratings as results come in.
+
+    :param workers:
+    Number of processes, by default one per core.
+    :param batch_size:
+    Games sent to a worker at a time, more games per batch send fewer messages between processes.
+    :return:
+    The Ratings.
+    """
+    ratings = Ratings(dict.fromkeys(specs))
+    workers = workers or os.cpu_count()
+    seeds = [seed * games_no + x for x in range(games_no)]
+    batches = [seeds[x:x + batch_size] for x in range(0, games_no, batch_size)]
+
+    start = time.perf_counter()
+    played = 0
+    next_report = report_every
+    output = open(output_file, 'w') if output_file else None
+    try:
+        with concurrent.futures.ProcessPoolExecutor(workers, initializer=init_worker, initargs=(seed,)) as executor:
+            futures = [executor.submit(play_batch, specs, players_no, batch, max_turns) for batch in batches]
+            for future in concurrent.futures.as_completed(futures):
+                results = future.result()
+                for result in results:
+                    ratings.add(result['seats'], result['winner'])
+                    if output:
+                        output.write(json.dumps(result) + '\n')
+                played += len(results)
+
+                if played >= next_report or played == games_no:
+                    next_report += report_every
+                    seconds = time.perf_counter() - start
+                    print(f'\n{played} of {games_no} games, {played / seconds:.1f} games/s on {workers} processes')
+                    print(ratings.report())
+                    if output:
+                        output.flush()
+    finally:
+        if output:
+            output.close()
+    return ratings
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description='Plays games between bots on all cores and rates them with Elo.')
+    parser.add_argument('--bots', nargs='+', default=['random', 'scripted'],
+                        help=f'Bots by name ({", ".join(BOTS)}) or as module:Class.')
+    parser.add_argument('--games', type=int, default=1000)
+    parser.add_argument('--players', type=int, default=2, help='Players per game (2-6).')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--max-turns', type=int, default=200,
+                        help='Games finish without a winner (a draw) after this number of turns.')
+    parser.add_argument('--workers', type=int, default=None, help='Processes, by default one per core.')
+    parser.add_argument('--batch-size', type=int, default=10, help='Games sent to a process at a time.')
+    parser.add_argument('--report-every', type=int, default=100, help='Games between printing the ratings.')
+    parser.add_argument('--output', default=None, help='JSON lines file to write every game result to.')
+    args = parser.parse_args()
+
+    # Checks the bots before starting any process
+    for spec in args.bots:
+        make_bot(spec, 0)
+
+    run_tournament(args.bots, args.games, args.players, args.seed, args.max_turns, args.workers, args.batch_size,
+                   args.report_every, args.output)
+
+
+if __name__ == '__main__':
+    main_cli()
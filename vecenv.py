@@ -0,0 +1,430 @@
+"""
+Many games played in lock-step, for reinforcement learning: one step() applies one action in each game.
+
+The state of every game is kept in batched arrays, one row per game (owners, armies, current player,
+phase...), and steps are done with numpy on all games at once, without a risk.Country object per country.
+Games are set up like any other, with engine.new_game and gamesetup.initialize_objectives, and then follow
+the same rules as engine.Engine.
+
+Actions are integers, the same for every game of a map:
+
+    0                              end the phase (attack or relocation)
+    1 + 3 * e + (troops - 1)       attack along border e with 1 to 3 troops
+    1 + 3 * E + 2 * e + k          relocate along border e one army (k = 0) or all but one (k = 1)
+    1 + 5 * E + 2 * c + k          deploy into country c one army (k = 0) or all left (k = 1)
+
+where borders are the neighbours of the map in CSR order (board.Board.edge_from and indices) and E is
+their number. action_mask() tells which ones are legal in each game.
+
+Rewards are for every player, from their objectives: how much closer each player got to its best
+objective (see Objective.progress()), plus one for the winner. Finished games start again right away,
+step() reports them as done.
+
+    env = VectorEnv(256, players_no=3, seed=1)
+    observation = env.reset()
+    while training:
+        observation, rewards, dones, info = env.step(policy(observation))
+
+Run from the repository's root folder to measure steps per second with random legal actions:
+
+    python vecenv.py --envs 256 --steps 2000
+"""
+import argparse
+import time
+
+import numpy as np
+
+import battle_batch
+import board
+import engine
+import mapbundle
+import winprob
+
+# Phases as integers, in the order they are played
+PHASE_ATTACK = 0
+PHASE_RELOCATE = 1
+PHASE_DEPLOY = 2
+# The names of the engine module for each phase
+PHASES = [engine.PHASE_ATTACK, engine.PHASE_RELOCATE, engine.PHASE_DEPLOY]
+
+
+class VectorEnv:
+    """
+    A batch of games on the same map and with the same number of players, stepped together.
+    """
+
+    def __init__(self, envs_no, players_no=2, max_turns=100, seed=None, bundle=None):
+        """
+        :param envs_no:
+        Number of games.
+        :param max_turns:
+        Games finish without a winner after this number of turns.
+        :param seed:
+        Seed for the games set up and the dices.
+        :param bundle:
+        The map, a mapbundle.MapBundle. By default the map in game_data/.
+        """
+        if bundle is None:
+            bundle = mapbundle.compiled_map()
+        self.bundle = bundle
+        self.map = board.Board.from_bundle(bundle)
+        self.envs_no = envs_no
+        self.players_no = players_no
+        self.max_turns = max_turns
+        self.seed = 0 if seed is None else seed
+        self.rng = np.random.default_rng(seed)
+        self.games_started = 0
+
+        countries_no = len(self.map)
+        self.continents_no = len(self.map.continent_names)
+        self.continent_sizes = np.bincount(self.map.continent, minlength=self.continents_no)
+        self.edge_from = self.map.edge_from
+        self.edge_to = self.map.indices
+        self.borders_no = len(self.edge_to)
+
+        # Where each kind of action starts, see the module's docstring
+        self.attack_start = 1
+        self.relocate_start = self.attack_start + 3 * self.borders_no
+        self.deploy_start = self.relocate_start + 2 * self.borders_no
+        self.actions_no = self.deploy_start + 2 * countries_no
+
+        # State of the games
+        self.owner = np.zeros((envs_no, countries_no), dtype=np.int8)
+        self.armies = np.zeros((envs_no, countries_no), dtype=np.int32)
+        self.current_player = np.zeros(envs_no, dtype=np.int64)
+        self.phase = np.zeros(envs_no, dtype=np.int8)
+        self.turn = np.ones(envs_no, dtype=np.int32)
+        self.armies_to_deploy = np.zeros(envs_no, dtype=np.int32)
+        self.relocation_sources = np.zeros((envs_no, countries_no), dtype=bool)
+        self.winner = np.full(envs_no, -1, dtype=np.int64)
+        self.finished = np.zeros(envs_no, dtype=bool)
+
+        # Objectives of every player: countries for world domination, the player to eliminate (-1 for
+        # none), and the countries required in each continent for conquest (all zeros for none)
+        self.world_countries = np.zeros(envs_no, dtype=np.int32)
+        self.annihilation_target = np.full((envs_no, players_no), -1, dtype=np.int64)
+        self.conquest_required = np.zeros((envs_no, players_no, self.continents_no), dtype=np.int32)
+
+        # The action mask of the last observation, to check actions without building it again
+        self.last_mask = None
+
+    def __str__(self):
+        return (f'{self.envs_no} games of {self.players_no} players on {len(self.map)} countries,'
+                f' {self.actions_no} actions')
+
+    def reset(self, envs=None):
+        """
+        Starts new games.
+
+        :param envs:
+        The games to start again, all of them by default.
+        :return:
+        The observation, see observation().
+        """
+        self._start_games(np.arange(self.envs_no) if envs is None else np.asarray(envs))
+        return self.observation()
+
+    def _start_games(self, envs):
+        for b in envs:
+            self._load_game(b, engine.new_game(self.players_no, self.seed + self.games_started, bundle=self.bundle))
+            self.games_started += 1
+
+    def _load_game(self, b, game):
+        owners, armies, current_player, *rest = game.snapshot()
+        self.owner[b] = owners
+        self.armies[b] = armies
+        self.turn[b] = 1
+        self.winner[b] = -1
+        self.finished[b] = False
+
+        self.annihilation_target[b] = -1
+        self.conquest_required[b] = 0
+        for p, objectives in enumerate(winprob.encode_objectives(game)):
+            for kind, *values in objectives:
+                if kind == 'world':
+                    self.world_countries[b] = values[0]
+                elif kind == 'annihilation':
+                    self.annihilation_target[b, p] = values[0]
+                else:
+                    continents, continents_and_number = values
+                    for cont in continents:
+                        self.conquest_required[b, p, cont] = self.continent_sizes[cont]
+                    for cont, n in continents_and_number:
+                        self.conquest_required[b, p, cont] = max(self.conquest_required[b, p, cont], n)
+
+        # Same as an engine starting a game, with the attack phase of the first player
+        self.current_player[b] = -1
+        self._next_player(np.array([b]), PHASE_ATTACK)
+
+    def observation(self):
+        """
+        :return:
+        A dictionary of arrays with one row per game: owner and armies of each country, current player,
+        phase, armies left to deploy, turn, the action mask and the current player's objectives (the
+        player to annihilate or -1, the countries required in each continent, and the countries needed
+        to dominate the world or 0). The arrays are copies.
+        """
+        self.last_mask = self.action_mask()
+        rows = np.arange(self.envs_no)
+        return {
+            'owner': self.owner.copy(),
+            'armies': self.armies.copy(),
+            'current_player': self.current_player.copy(),
+            'phase': self.phase.copy(),
+            'armies_to_deploy': self.armies_to_deploy.copy(),
+            'turn': self.turn.copy(),
+            'action_mask': self.last_mask.copy(),
+            'annihilation_target': self.annihilation_target[rows, self.current_player],
+            'conquest_required': self.conquest_required[rows, self.current_player],
+            'world_countries': self.world_countries.copy(),
+        }
+
+    def action_mask(self):
+        """
+        :return:
+        A boolean array of shape (games, actions), True for the legal actions of each game's current player.
+        """
+        current = self.current_player[:, None]
+        own = self.owner == current
+        armies_from = self.armies[:, self.edge_from]
+        own_from = own[:, self.edge_from]
+        own_to = own[:, self.edge_to]
+        attacking = self.phase == PHASE_ATTACK
+        relocating = self.phase == PHASE_RELOCATE
+        deploying = self.phase == PHASE_DEPLOY
+
+        mask = np.zeros((self.envs_no, self.actions_no), dtype=bool)
+        mask[:, 0] = attacking | relocating
+
+        # You cannot attack with more than three armies no matter how many the country has.
+        can_attack = (own_from & ~own_to & (self.owner[:, self.edge_to] != board.NO_PLAYER) &
+                      attacking[:, None])
+        troops = np.arange(1, 4)
+        mask[:, self.attack_start:self.relocate_start] = \
+            (can_attack[:, :, None] & (armies_from[:, :, None] > troops)).reshape(self.envs_no, -1)
+
+        can_relocate = (self.relocation_sources[:, self.edge_from] & (armies_from > 1) & own_to &
+                        relocating[:, None])
+        mask[:, self.relocate_start:self.deploy_start] = np.repeat(can_relocate, 2, axis=1)
+
+        mask[:, self.deploy_start:] = np.repeat(own & deploying[:, None], 2, axis=1)
+        return mask
+
+    def countries_per_player(self):
+        """
+        :return:
+        An array of shape (games, players) with the number of countries of each player.
+        """
+        flat = self.owner + (np.arange(self.envs_no) * self.players_no)[:, None]
+        return np.bincount(flat[self.owner != board.NO_PLAYER],
+                           minlength=self.envs_no * self.players_no).reshape(self.envs_no, self.players_no)
+
+    def countries_per_continent(self):
+        """
+        :return:
+        An array of shape (games, players, continents) with the countries of each player in each continent.
+        """
+        flat = (np.arange(self.envs_no)[:, None] * self.players_no + self.owner) * self.continents_no + \
+            self.map.continent
+        counts = np.bincount(flat[self.owner != board.NO_PLAYER],
+                             minlength=self.envs_no * self.players_no * self.continents_no)
+        return counts.reshape(self.envs_no, self.players_no, self.continents_no)
+
+    def _objectives(self):
+        """
+        :return:
+        A tuple with two arrays of shape (games, players): whether each player achieved an objective, and
+        the progress towards its best objective, as in Objective.is_achieved() and progress().
+        """
+        countries = self.countries_per_player()
+        per_continent = self.countries_per_continent()
+        rows = np.arange(self.envs_no)[:, None]
+
+        world_countries = self.world_countries[:, None]
+        achieved = countries >= world_countries
+        progress = np.minimum(1.0, countries / world_countries)
+
+        has_target = self.annihilation_target >= 0
+        target_countries = countries[rows, np.maximum(self.annihilation_target, 0)]
+        achieved |= has_target & (target_countries == 0)
+        progress = np.maximum(progress, np.where(has_target, 1 / (1 + target_countries), 0.0))
+
+        required = self.conquest_required
+        has_conquest = required.sum(axis=2) > 0
+        achieved |= has_conquest & (per_continent >= required).all(axis=2)
+        conquered = np.minimum(per_continent, required).sum(axis=2)
+        progress = np.maximum(progress, np.where(has_conquest, conquered / np.maximum(required.sum(axis=2), 1), 0.0))
+
+        return achieved, progress
+
+    def _check_winner(self, envs):
+        """
+        Finishes the games of envs where a player achieved an objective, the first player in order wins.
+        """
+        if len(envs) == 0:
+            return envs
+        achieved = self._objectives()[0][envs]
+        won = achieved.any(axis=1)
+        won_envs = envs[won]
+        self.winner[won_envs] = achieved[won].argmax(axis=1)
+        self.finished[won_envs] = True
+        return won_envs
+
+    def _start_phase(self, envs, phase):
+        self.phase[envs] = phase
+        if phase == PHASE_RELOCATE:
+            # Only countries with armies to spare when the phase starts can move troops
+            self.relocation_sources[envs] = (self.owner[envs] == self.current_player[envs, None]) & \
+                (self.armies[envs] > 1)
+        elif phase == PHASE_DEPLOY:
+            countries = self.countries_per_player()[envs, self.current_player[envs]]
+            armies = np.ceil(countries / 2).astype(np.int32)
+            armies[armies < 3] = self.map.min_armies_per_turn
+            self.armies_to_deploy[envs] = armies
+
+    def _next_player(self, envs, phase):
+        """
+        Passes the phase to the next player still in the game, like engine.Engine._next_player().
+        """
+        if len(envs) == 0:
+            return
+        countries = self.countries_per_player()[envs]
+        position = self.current_player[envs] + 1
+        for x in range(self.players_no):
+            eliminated = (position < self.players_no) & \
+                (countries[np.arange(len(envs)), np.minimum(position, self.players_no - 1)] == 0)
+            position += eliminated
+
+        has_next = position < self.players_no
+        self.current_player[envs[has_next]] = position[has_next]
+        self._start_phase(envs[has_next], phase)
+
+        rest = envs[~has_next]
+        self.current_player[rest] = -1
+        if phase == PHASE_ATTACK:
+            self._next_player(rest, PHASE_DEPLOY)
+        else:
+            self.turn[rest] += 1
+            over = self.turn[rest] > self.max_turns
+            self.finished[rest[over]] = True
+            self._next_player(rest[~over], PHASE_ATTACK)
+
+    def step(self, actions):
+        """
+        Applies one action in every game.
+
+        :param actions:
+        An array with one legal action per game.
+        :return:
+        A tuple (observation, rewards, dones, info). Rewards have shape (games, players). Games done are
+        started again, their winner (-1 for none) and turns played are in info['winner'] and info['turns'].
+        """
+        actions = np.asarray(actions, dtype=np.int64)
+        envs = np.arange(self.envs_no)
+        mask = self.last_mask if self.last_mask is not None else self.action_mask()
+        legal = mask[envs, actions]
+        if not legal.all():
+            raise Exception(f'Illegal actions in games {np.flatnonzero(~legal)[:10].tolist()}.')
+
+        self.last_mask = None
+        progress_before = self._objectives()[1]
+
+        # Ending the attack phase starts the relocation, ending the relocation passes to the next player
+        ending = envs[actions == 0]
+        ending_relocation = ending[self.phase[ending] == PHASE_RELOCATE]
+        self._start_phase(ending[self.phase[ending] == PHASE_ATTACK], PHASE_RELOCATE)
+        won = self._check_winner(ending_relocation)
+        self._next_player(np.setdiff1d(ending_relocation, won), PHASE_ATTACK)
+
+        attacking = envs[(actions >= self.attack_start) & (actions < self.relocate_start)]
+        if len(attacking):
+            self._attack(attacking, actions[attacking] - self.attack_start)
+
+        relocating = envs[(actions >= self.relocate_start) & (actions < self.deploy_start)]
+        if len(relocating):
+            k = actions[relocating] - self.relocate_start
+            country_from = self.edge_from[k // 2]
+            country_to = self.edge_to[k // 2]
+            armies = np.where(k % 2 == 0, 1, self.armies[relocating, country_from] - 1)
+            self.armies[relocating, country_from] -= armies
+            self.armies[relocating, country_to] += armies
+
+        deploying = envs[actions >= self.deploy_start]
+        if len(deploying):
+            k = actions[deploying] - self.deploy_start
+            armies = np.where(k % 2 == 0, 1, self.armies_to_deploy[deploying])
+            self.armies[deploying, k // 2] += armies
+            self.armies_to_deploy[deploying] -= armies
+            done_deploying = deploying[self.armies_to_deploy[deploying] == 0]
+            self._next_player(done_deploying, PHASE_DEPLOY)
+
+        rewards = self._objectives()[1] - progress_before
+        dones = self.finished.copy()
+        winner = self.winner.copy()
+        won = np.flatnonzero(dones & (winner >= 0))
+        rewards[won, winner[won]] += 1.0
+        info = {'winner': winner, 'turns': self.turn.copy()}
+
+        if dones.any():
+            self._start_games(np.flatnonzero(dones))
+        return self.observation(), rewards, dones, info
+
+    def _attack(self, envs, k):
+        country_from = self.edge_from[k // 3]
+        country_to = self.edge_to[k // 3]
+        troops = k % 3 + 1
+
+        battles = battle_batch.resolve_battles(troops, self.armies[envs, country_to], self.rng)
+        self.armies[envs, country_from] -= battles.casualties_attacker
+        self.armies[envs, country_to] -= battles.casualties_defender
+
+        # The attacker moves the troops left from the attack into the country conquered
+        conquered = battles.defender_lost_country
+        envs, country_from, country_to = envs[conquered], country_from[conquered], country_to[conquered]
+        moving = (troops - battles.casualties_attacker)[conquered]
+        self.owner[envs, country_to] = self.current_player[envs]
+        self.armies[envs, country_from] -= moving
+        self.armies[envs, country_to] += moving
+        self._check_winner(envs)
+
+    def random_actions(self, mask=None):
+        """
+        A random legal action for each game, all legal actions with the same chances.
+        """
+        if mask is None:
+            mask = self.action_mask()
+        scores = self.rng.random(mask.shape)
+        scores[~mask] = -1.0
+        return scores.argmax(axis=1)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description='Steps games in lock-step with random legal actions.')
+    parser.add_argument('--envs', type=int, default=256, help='Games stepped together.')
+    parser.add_argument('--players', type=int, default=3)
+    parser.add_argument('--steps', type=int, default=1000)
+    parser.add_argument('--max-turns', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    env = VectorEnv(args.envs, args.players, args.max_turns, args.seed)
+    start = time.perf_counter()
+    observation = env.reset()
+    reset_seconds = time.perf_counter() - start
+
+    games_done = 0
+    start = time.perf_counter()
+    for x in range(args.steps):
+        observation, rewards, dones, info = env.step(env.random_actions(observation['action_mask']))
+        games_done += int(dones.sum())
+    seconds = time.perf_counter() - start
+
+    transitions = args.envs * args.steps
+    print(f'{env}')
+    print(f'Reset {args.envs} games in {reset_seconds:.2f}s')
+    print(f'{transitions:,} transitions in {seconds:.2f}s: {transitions / seconds:,.0f}/s, '
+          f'{transitions / seconds * 3600 / 1e6:,.0f} million/hour, {games_done} games finished')
+
+
+if __name__ == '__main__':
+    main_cli()
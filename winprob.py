@@ -0,0 +1,322 @@
+"""
+Estimates the chances each player has of winning a game going on, by playing it to the end many times
+(rollouts) with light bots on a pool of processes.
+
+The map never changes during a game, so workers get it once: its bundle is copied into a block of
+shared memory that every worker reads in place. For each estimate, workers only get the state of the
+game, a few tuples of integers (owners, armies, cards and objectives), and send back how many rollouts
+each player won. Estimates come with their standard error, and stop early once every player's is small
+enough. Batches still being played when an estimate stops are told so through a number kept in the
+same shared memory, and stop after the rollout they are playing, leaving the workers free for the next
+estimate.
+
+    with WinProbabilityEstimator(workers=4) as estimator:
+        estimate = estimator.estimate(game, rollouts=2000, target_standard_error=0.01)
+        print(estimate)
+
+Run from the repository's root folder, to try it on a game after a few turns:
+
+    python winprob.py --players 3 --turns 3 --rollouts 2000 --target-standard-error 0.01
+"""
+import argparse
+import concurrent.futures
+import math
+import os
+import random
+import struct
+import time
+from multiprocessing import shared_memory
+
+import bots
+import dice
+import engine
+import mapbundle
+import risk
+
+# Bots playing the rollouts, by name, each one a function taking a seed
+POLICIES = {
+    'scripted': bots.ScriptedBot,
+    'random': bots.RandomBot,
+}
+
+# Number of the estimate going on, kept in the shared memory after the map, 0 when none is
+CONTROL_FORMAT = struct.Struct('<q')
+
+# What each worker process keeps between estimates: the shared memory with the map, the bundle read
+# from it, the number of the estimate going on and a game for each number of players to play rollouts on
+_worker_memory = None
+_worker_bundle = None
+_worker_control = None
+_worker_games = {}
+
+
+def encode_objectives(game):
+    """
+    The objectives of every player as tuples of integers, players and continents by position:
+    ('world', countries), ('annihilation', player) or ('conquest', continents, ((continent, countries), ...)).
+    """
+    player_position = {p: i for i, p in enumerate(game.players)}
+    continent_position = {cont: i for i, cont in enumerate(game.continents)}
+
+    players_objectives = []
+    for p in game.players:
+        objectives = []
+        for objective in p.objectives:
+            if isinstance(objective, risk.WorldDominationObjective):
+                objectives.append(('world', objective.amount_countries))
+            elif isinstance(objective, risk.AnnihilationObjetive):
+                objectives.append(('annihilation', player_position[objective.player]))
+            elif isinstance(objective, risk.ConquestObjetive):
+                objectives.append((
+                    'conquest',
+                    tuple(continent_position[cont] for cont in objective.continents_to_conquer or []),
+                    tuple((continent_position[cont], n) for cont, n in objective.continents_and_number_countries or []),
+                ))
+            else:
+                raise Exception(f'Objectives of type {type(objective).__name__} cannot be estimated.')
+        players_objectives.append(tuple(objectives))
+    return tuple(players_objectives)
+
+
+def decode_objectives(game, players_objectives):
+    world_objectives = {}
+    for p, objectives in zip(game.players, players_objectives):
+        p.objectives = []
+        for kind, *values in objectives:
+            if kind == 'world':
+                if values[0] not in world_objectives:
+                    world_objectives[values[0]] = risk.WorldDominationObjective(values[0], game.countries)
+                p.objectives.append(world_objectives[values[0]])
+            elif kind == 'annihilation':
+                p.objectives.append(risk.AnnihilationObjetive(game.players[values[0]]))
+            else:
+                continents, continents_and_number = values
+                p.objectives.append(risk.ConquestObjetive(
+                    [game.continents[x] for x in continents] or None,
+                    [(game.continents[x], n) for x, n in continents_and_number] or None))
+
+
+def _control_offset(size):
+    return size + -size % CONTROL_FORMAT.size
+
+
+def _init_worker(memory_name, size):
+    global _worker_memory, _worker_bundle, _worker_control
+    _worker_memory = shared_memory.SharedMemory(memory_name)
+    _worker_bundle = mapbundle.MapBundle(buffer=_worker_memory.buf[:size])
+    offset = _control_offset(size)
+    _worker_control = _worker_memory.buf[offset:offset + CONTROL_FORMAT.size]
+
+
+def _worker_game(players_no):
+    game = _worker_games.get(players_no)
+    if game is None:
+        game = risk.Game()
+        game.load_map_bundle(_worker_bundle)
+        game.assign_players([(f'Player {x + 1}', None) for x in range(players_no)])
+        _worker_games[players_no] = game
+    return game
+
+
+def play_rollouts(state, seed, rollouts_no, phase, max_turns, policy, estimate_no):
+    """
+    Plays rollouts in a worker, stopping early if the estimate they are for is not going on anymore.
+
+    :param state:
+    The game's snapshot() and its encoded objectives.
+    :return:
+    A list with the rollouts won by each player, plus the rollouts nobody won at the end.
+    """
+    snapshot, players_objectives = state
+    game = _worker_game(len(players_objectives))
+
+    # Only the rollouts are undone, the journal starts again after restoring the state
+    game.stop_journal()
+    game.restore(snapshot)
+    decode_objectives(game, players_objectives)
+    game.start_journal()
+
+    rng = random.Random(seed)
+    wins = [0] * (len(game.players) + 1)
+    for x in range(rollouts_no):
+        if CONTROL_FORMAT.unpack_from(_worker_control)[0] != estimate_no:
+            break
+        rollout_seed = rng.getrandbits(64)
+        game.dice = dice.RandomDice(rollout_seed)
+        checkpoint = game.checkpoint()
+        e = engine.Engine(game, max_turns, phase=phase)
+        winner = e.play({p: POLICIES[policy](rollout_seed + n) for n, p in enumerate(game.players)})
+        wins[game.players.index(winner) if winner else -1] += 1
+        game.rollback(checkpoint)
+    return wins
+
+
+class WinProbabilities:
+    """
+    The chances of each player, from the rollouts won by each one.
+    """
+
+    def __init__(self, names, wins, seconds):
+        self.names = names
+        # Rollouts won by each player, plus the ones nobody won
+        self.wins = wins
+        self.rollouts = sum(wins)
+        self.seconds = seconds
+
+    def __str__(self):
+        lines = [f'{self.rollouts} rollouts in {self.seconds:.2f}s']
+        for name, p, se in zip(self.names + ['Nobody'], self.probabilities(), self.standard_errors()):
+            lines.append(f' - {name}: {p:.1%} ± {se:.1%}')
+        return '\n'.join(lines)
+
+    def probabilities(self):
+        """
+        :return:
+        A list with the chances of each player, plus the chances of nobody winning before the rollouts end.
+        """
+        return [w / self.rollouts for w in self.wins]
+
+    def standard_errors(self):
+        """
+        Standard errors of the probabilities, Agresti-Coull style: as if two more rollouts had been won
+        and two more lost. Unlike the plain p * (1 - p) / n, a player who won no rollout doesn't get a
+        standard error of 0 that would stop an estimate after a few rollouts.
+        """
+        rollouts = self.rollouts + 4
+        errors = []
+        for w in self.wins:
+            p = (w + 2) / rollouts
+            errors.append(math.sqrt(p * (1 - p) / rollouts))
+        return errors
+
+
+class WinProbabilityEstimator:
+    """
+    A pool of processes sharing a map, ready to estimate games played on it. Starting it takes a
+    while, so one is meant to be kept for many estimates. Call close() when done, or use it in a with.
+    """
+
+    def __init__(self, bundle=None, workers=None, policy='scripted', max_turns=20):
+        """
+        :param bundle:
+        The map the games are played on, a mapbundle.MapBundle. By default the map in game_data/.
+        :param workers:
+        Number of processes, by default one per core.
+        :param policy:
+        The bots playing the rollouts, one of POLICIES.
+        :param max_turns:
+        Turns played in each rollout, rollouts going longer count as nobody winning.
+        """
+        if policy not in POLICIES:
+            raise Exception(f'Unknown policy {policy}, use one of {", ".join(POLICIES)}.')
+        if bundle is None:
+            bundle = mapbundle.compiled_map()
+        self.policy = policy
+        self.max_turns = max_turns
+        self.country_ids = list(bundle.country_ids)
+
+        size = len(bundle.buffer)
+        offset = _control_offset(size)
+        self.memory = shared_memory.SharedMemory(create=True, size=offset + CONTROL_FORMAT.size)
+        self.memory.buf[:size] = bundle.buffer
+        self.control = self.memory.buf[offset:offset + CONTROL_FORMAT.size]
+        CONTROL_FORMAT.pack_into(self.control, 0, 0)
+        self.estimates_no = 0
+        self.workers = workers or os.cpu_count()
+        self.executor = concurrent.futures.ProcessPoolExecutor(self.workers, initializer=_init_worker,
+                                                               initargs=(self.memory.name, size))
+
+    def __str__(self):
+        return f'Win probability estimator with {self.workers} processes'
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        CONTROL_FORMAT.pack_into(self.control, 0, 0)
+        self.executor.shutdown(cancel_futures=True)
+        self.control.release()
+        self.memory.close()
+        self.memory.unlink()
+
+    def estimate(self, game, rollouts=1000, phase=engine.PHASE_ATTACK, target_standard_error=None,
+                 min_rollouts=200, batch_size=50, seed=None):
+        """
+        Estimates the chances of each player of a game, from the current player in a phase.
+
+        :param game:
+        A risk.Game on the estimator's map, with players and objectives dealt. It is not changed.
+        :param rollouts:
+        Most rollouts to play.
+        :param target_standard_error:
+        If given, stops once at least min_rollouts were played and every standard error is this or less.
+        :param batch_size:
+        Rollouts sent to a process at a time, and how often the standard errors are checked.
+        :return:
+        An object of the class WinProbabilities.
+        """
+        if [c.id for c in game.countries] != self.country_ids:
+            raise Exception('The game is not played on the map of this estimator.')
+
+        start = time.perf_counter()
+        self.estimates_no += 1
+        CONTROL_FORMAT.pack_into(self.control, 0, self.estimates_no)
+        state = (game.snapshot(), encode_objectives(game))
+        rng = random.Random(seed)
+        wins = [0] * (len(game.players) + 1)
+        batches = [min(batch_size, rollouts - x) for x in range(0, rollouts, batch_size)]
+
+        pending = set()
+        while batches or pending:
+            # Keeps two batches per process going, so none waits while results are counted
+            while batches and len(pending) < 2 * self.workers:
+                pending.add(self.executor.submit(play_rollouts, state, rng.getrandbits(64), batches.pop(),
+                                                 phase, self.max_turns, self.policy, self.estimates_no))
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                wins = [a + b for a, b in zip(wins, future.result())]
+
+            estimate = WinProbabilities([p.name for p in game.players], wins, time.perf_counter() - start)
+            if target_standard_error is not None and estimate.rollouts >= min_rollouts and \
+                    max(estimate.standard_errors()) <= target_standard_error:
+                # Batches not started are cancelled, the ones being played stop after their current rollout
+                CONTROL_FORMAT.pack_into(self.control, 0, 0)
+                for future in pending:
+                    future.cancel()
+                break
+
+        return WinProbabilities([p.name for p in game.players], wins, time.perf_counter() - start)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description='Estimates the chances of each player of a game after a few turns.')
+    parser.add_argument('--players', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--turns', type=int, default=2, help='Turns played by scripted bots before estimating.')
+    parser.add_argument('--rollouts', type=int, default=2000)
+    parser.add_argument('--target-standard-error', type=float, default=None)
+    parser.add_argument('--max-turns', type=int, default=20, help='Turns played in each rollout.')
+    parser.add_argument('--policy', choices=list(POLICIES), default='scripted')
+    parser.add_argument('--workers', type=int, default=None, help='Processes, by default one per core.')
+    args = parser.parse_args()
+
+    game = engine.new_game(args.players, args.seed)
+    e = engine.Engine(game, args.turns)
+    e.play({p: bots.ScriptedBot(args.seed + n) for n, p in enumerate(game.players)})
+    if e.winner:
+        print(f'{e.winner.name} already won, try fewer turns.')
+        return
+    game.set_current_player(game.players[0])
+
+    with WinProbabilityEstimator(workers=args.workers, policy=args.policy, max_turns=args.max_turns) as estimator:
+        # The first estimate also starts the processes
+        estimator.estimate(game, estimator.workers, seed=args.seed)
+        print(estimator.estimate(game, args.rollouts, target_standard_error=args.target_standard_error,
+                                 seed=args.seed))
+
+
+if __name__ == '__main__':
+    main_cli()
@@ -0,0 +1,177 @@
+"""
+Zobrist hashing of a game's position, and a transposition table to remember what a search found
+about positions it has already seen.
+
+Every (country, owner, army bucket) gets a random 64 bit key, and the hash of the board is the XOR
+of the keys of every country. Changing a country's owner or armies only takes XORing out its old key
+and in its new one, so a game with hashing enabled (risk.Game.enable_hashing()) keeps the hash up to
+date in O(1) on every change, whether it comes from a battle, a deployment, a relocation or a
+rollback. The current player and the phase get keys of their own, added when the hash is read, and
+so do what else tells positions of the engine apart: the armies left to deploy in the deployment
+phase, and the countries that can move troops in the relocation phase.
+
+Armies are hashed in buckets (by default 1, 2, 3, 4-5, 6-8, 9-12, 13-19 and 20 or more), so
+positions that only differ in the exact size of big armies are taken as the same one.
+
+    game.enable_hashing()
+    table = TranspositionTable(2 ** 16)
+    key = engine.position_hash()
+    entry = table.get(key)
+
+benchmarks/hashing.py checks incremental hashes against hashes computed from scratch, and measures
+what hashing costs.
+"""
+import hashlib
+import random
+
+# Lowest number of armies of each bucket
+ARMY_BUCKETS = (0, 1, 2, 3, 4, 6, 9, 13, 20)
+
+
+class ZobristKeys:
+    """
+    The random keys for a map and a number of players. Keys only depend on the seed, so games on the
+    same map get the same hashes for the same positions.
+    """
+
+    def __init__(self, countries_no, players_no, seed=0, buckets=ARMY_BUCKETS):
+        """
+        :param buckets:
+        Lowest number of armies of each bucket, in increasing order and starting with 0.
+        """
+        self.countries_no = countries_no
+        self.players_no = players_no
+        self.seed = seed
+        self.buckets = tuple(buckets)
+
+        # Bucket of each number of armies up to the last bucket, so finding one is a single lookup
+        self.bucket_of = []
+        for b, (low, high) in enumerate(zip(self.buckets, self.buckets[1:] + (self.buckets[-1] + 1,))):
+            self.bucket_of.extend([b] * (high - low))
+
+        # Keys by country, then owner (0 for no owner, then players by position), then bucket
+        rng = random.Random(seed)
+        self.owners_no = players_no + 1
+        self.country_keys = [rng.getrandbits(64) for x in range(countries_no * self.owners_no * len(self.buckets))]
+        self.player_keys = [0] + [rng.getrandbits(64) for x in range(players_no)]
+        self.source_keys = [rng.getrandbits(64) for x in range(countries_no)]
+        self.phase_keys = {None: 0}
+        self.deploy_keys = {}
+
+    def __str__(self):
+        return f'Zobrist keys for {self.countries_no} countries and {self.players_no} players'
+
+    def country_key(self, country_position, owner, armies):
+        """
+        :param owner:
+        0 for no owner, otherwise the player's position plus one.
+        """
+        bucket_of = self.bucket_of
+        bucket = bucket_of[armies] if armies < len(bucket_of) else len(self.buckets) - 1
+        return self.country_keys[(country_position * self.owners_no + owner) * len(self.buckets) + bucket]
+
+    def _made_key(self, name):
+        digest = hashlib.blake2b(f'{self.seed}:{name}'.encode(), digest_size=8).digest()
+        return int.from_bytes(digest, 'little')
+
+    def phase_key(self, phase):
+        """
+        Key of a phase of engine.Engine, made from its name the first time it's needed.
+        """
+        key = self.phase_keys.get(phase)
+        if key is None:
+            key = self.phase_keys[phase] = self._made_key(phase)
+        return key
+
+    def deploy_key(self, armies):
+        """
+        Key of a number of armies left to deploy, made the first time it's needed.
+        """
+        key = self.deploy_keys.get(armies)
+        if key is None:
+            key = self.deploy_keys[armies] = self._made_key(f'deploy {armies}')
+        return key
+
+
+class TranspositionTable:
+    """
+    A fixed number of entries, each one a position's hash with a value and a weight (e.g. how many
+    rollouts the value is the average of). Positions go to the slot given by their hash, and a new
+    position takes an occupied slot only if the entry there is from an older search (see new_search())
+    or weighs no more than the new one, so well established values are kept over one-offs.
+    """
+
+    def __init__(self, size=2 ** 16):
+        self.size = size
+        self.keys = [None] * size
+        self.values = [None] * size
+        self.weights = [0] * size
+        self.searches = [0] * size
+        self.search = 0
+        self.entries_no = 0
+
+        # Statistics
+        self.hits = 0
+        self.misses = 0
+        self.replacements = 0
+        self.rejections = 0
+
+    def __str__(self):
+        return (f'Transposition table with {self.entries_no} of {self.size} entries, {self.hits} hits,'
+                f' {self.misses} misses, {self.replacements} replaced, {self.rejections} not stored')
+
+    def __len__(self):
+        return self.entries_no
+
+    def __contains__(self, key):
+        return self.keys[key % self.size] == key
+
+    def get(self, key):
+        """
+        :return:
+        A tuple (value, weight), or None if the position is not in the table.
+        """
+        slot = key % self.size
+        if self.keys[slot] != key:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.searches[slot] = self.search
+        return self.values[slot], self.weights[slot]
+
+    def put(self, key, value, weight=1):
+        """
+        Stores a position's value, unless its slot has a heavier entry of another position from this search.
+
+        :return:
+        Whether it was stored.
+        """
+        slot = key % self.size
+        previous_key = self.keys[slot]
+        if previous_key is None:
+            self.entries_no += 1
+        elif previous_key != key:
+            if self.searches[slot] == self.search and self.weights[slot] > weight:
+                self.rejections += 1
+                return False
+            self.replacements += 1
+
+        self.keys[slot] = key
+        self.values[slot] = value
+        self.weights[slot] = weight
+        self.searches[slot] = self.search
+        return True
+
+    def new_search(self):
+        """
+        Marks every entry as old, so any entry can be replaced by positions of the next search.
+        Entries are still found until they are replaced.
+        """
+        self.search += 1
+
+    def clear(self):
+        self.keys = [None] * self.size
+        self.values = [None] * self.size
+        self.weights = [0] * self.size
+        self.searches = [0] * self.size
+        self.entries_no = 0